@@ -6,35 +6,46 @@ import os
 
 os.environ["DO_NOT_TRACK"] = "1"
 
+import asyncio
 import html
 import json
 import logging
 import re
-import shutil
 import subprocess
-import tempfile
-import zipfile
+import threading
+import uuid
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
+from typing import Callable
 
-from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from nicegui import app, ui
 
 from config import get_config
+from file_serving import serve_file
 from models import (
     User,
     DownloadTask,
+    task_change_feed,
     init_users,
     get_user,
-    get_user_tasks,
-    get_all_tasks,
+    query_tasks,
     create_tasks_if_new,
     format_size,
     clear_tasks,
+    move_to_trash,
+    get_task_store,
+    close_task_store,
+    load_search_index,
 )
 import downloader
+import feishu_notify
+import metrics
+import timings
+from scheduler import PRIORITY_LABELS
+from zip_stream import iter_zip
 
 
 # ============ 日志配置 ============
@@ -123,7 +134,7 @@ def _download_all_url() -> str:
 
 
 @app.get("/download/{task_id}")
-def download_by_task_id(task_id: str):
+def download_by_task_id(task_id: str, request: Request):
     task = downloader.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -140,17 +151,67 @@ def download_by_task_id(task_id: str):
     if not fp.exists() or not fp.is_file():
         raise HTTPException(status_code=404, detail="文件不存在，可能已被移动或删除")
 
-    return FileResponse(path=str(fp), filename=_build_safe_download_name(task))
+    # 支持断点续传（Range/多段）、强 ETag 与 304 条件请求
+    return serve_file(request, fp, _build_safe_download_name(task))
 
 
 @app.get("/download-all")
 def download_all_completed_files():
     user, _ = get_runtime_user_from_headers()
-    zip_path = build_zip_path(user)
-    if not zip_path:
+    tasks = _completed_tasks_for(user)
+    if not tasks:
         raise HTTPException(status_code=404, detail="暂无已完成文件")
     filename = f"videos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-    return FileResponse(path=zip_path, filename=filename)
+    # 直接从源文件边读边发（STORED + ZIP64），不落临时文件，首字节立即返回
+    return StreamingResponse(
+        iter_zip(_zip_entries(tasks)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/upload/stream")
+async def upload_stream_to_oss(request: Request, name: str):
+    """浏览器直接 POST 文件内容，边接收边分片推送 OSS，不落本地磁盘"""
+    from oss_uploader import oss_enabled, stream_to_oss
+
+    get_runtime_user_from_headers()
+    if not oss_enabled():
+        raise HTTPException(status_code=503, detail="未配置 OSS")
+    size = int(request.headers.get("content-length") or 0)
+    task_id = uuid.uuid4().hex[:8]
+    oss_url = await stream_to_oss(task_id, name, request.stream(), size=size)
+    if not oss_url:
+        raise HTTPException(status_code=502, detail="OSS 上传失败")
+    feishu_notify.send_download_complete(
+        task_id=task_id, title=name, url="",
+        oss_url=oss_url, file_size=size, duration=0,
+    )
+    return {"task_id": task_id, "oss_url": oss_url, "size": size}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus 抓取端点：下载 / 预览 / 上传 / 通知的计数、耗时分布与队列状态"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+_TIMINGS_EXPORT_LIMIT = 500
+
+
+@app.get("/timings.json")
+def export_task_timings(limit: int = _TIMINGS_EXPORT_LIMIT):
+    """导出最近任务的分阶段耗时与各阶段分位数（JSON，供离线分析）"""
+    user, _ = get_runtime_user_from_headers()
+    tasks = _recent_tasks_for(user, limit)
+    payload = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "stages": list(timings.STAGES),
+        "percentiles": timings.stage_percentiles(tasks),
+        "tasks": timings.export(tasks),
+    }
+    filename = f"timings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    return JSONResponse(payload, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 
 # ============ 列表 HTML 生成 ============
@@ -165,6 +226,7 @@ def generate_task_list_html(tasks: list[DownloadTask]) -> str:
         status_map = {
             DownloadTask.STATUS_PENDING: ("等待中", "#FF9800"),
             DownloadTask.STATUS_DOWNLOADING: ("下载中", "#2196F3"),
+            DownloadTask.STATUS_UPLOADING: ("上传中", "#009688"),
             DownloadTask.STATUS_COMPLETED: ("已完成", "#4CAF50"),
             DownloadTask.STATUS_FAILED: ("失败", "#f44336"),
         }
@@ -178,8 +240,8 @@ def generate_task_list_html(tasks: list[DownloadTask]) -> str:
             progress_text = "-"
         speed_eta_html = ""
         if t.status == DownloadTask.STATUS_DOWNLOADING and (t.speed or t.eta):
-            speed = t.speed or "-"
-            eta = t.eta or "-"
+            speed = _format_speed(t.speed)
+            eta = _format_duration(t.eta)
             speed_eta_html = (
                 f'<div style="font-size:11px;color:#666;margin-top:2px;">'
                 f'速度: {speed} · 剩余: {eta}</div>'
@@ -254,6 +316,68 @@ def generate_completed_info_html(tasks: list[DownloadTask]) -> str:
     """
 
 
+_STAGE_LABELS = {
+    "prepare": "准备",
+    "extract": "解析信息",
+    "cookie_fallback": "Cookie 回退",
+    "transfer": "下载传输",
+    "merge": "ffmpeg 合并",
+    "postprocess": "后处理",
+    "link": "复用已存媒体",
+    "xattr": "写入来源属性",
+    "upload": "OSS 上传",
+    "notify": "飞书通知",
+}
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    return _format_duration(int(seconds))
+
+
+def generate_timings_html(task: DownloadTask) -> str:
+    """生成任务分阶段耗时瀑布图 HTML"""
+    spans = timings.waterfall(task.timings)
+    if not spans:
+        return '<div style="text-align:center;padding:20px;color:#999;">暂无耗时记录</div>'
+    end = max(s["offset"] + s["seconds"] for s in spans) or 1
+    rows = []
+    for s in spans:
+        left = s["offset"] / end * 100
+        width = max(s["seconds"] / end * 100, 0.5)
+        label = html.escape(_STAGE_LABELS.get(s["stage"], s["stage"]))
+        rows.append(f"""
+        <tr>
+            <td style="padding:4px 8px;white-space:nowrap;">{label}</td>
+            <td style="padding:4px 8px;width:100%;">
+                <div style="position:relative;height:14px;background:#f5f5f5;">
+                    <div style="position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:100%;background:#2196F3;"></div>
+                </div>
+            </td>
+            <td style="padding:4px 8px;text-align:right;white-space:nowrap;color:#888;">+{_format_seconds(s["offset"])}</td>
+            <td style="padding:4px 8px;text-align:right;white-space:nowrap;">{_format_seconds(s["seconds"])}</td>
+        </tr>
+        """)
+    return f"""
+    <table style="width:100%;border-collapse:collapse;font-size:13px;">
+        <thead>
+            <tr style="background:#f5f5f5;border-bottom:1px solid #ddd;">
+                <th style="padding:6px 8px;text-align:left;">阶段</th>
+                <th style="padding:6px 8px;text-align:left;">时间线（共 {_format_seconds(end)}）</th>
+                <th style="padding:6px 8px;text-align:right;">开始</th>
+                <th style="padding:6px 8px;text-align:right;">耗时</th>
+            </tr>
+        </thead>
+        <tbody>
+            {''.join(rows)}
+        </tbody>
+    </table>
+    """
+
+
 # ============ 业务逻辑（纯函数，无 UI） ============
 
 def do_download(url: str, quality: str, user: User | None, options: dict | None = None) -> str:
@@ -276,8 +400,11 @@ def do_download(url: str, quality: str, user: User | None, options: dict | None
         created_tasks, skipped_count = create_tasks_if_new(user.username, normalized_urls)
         if not created_tasks:
             return f"所有链接已在下载任务中（跳过 {skipped_count} 个重复链接）"
+        # 单条链接优先于批量导入排队
+        bulk = len(created_tasks) >= get_config().download.bulk_threshold
+        priority = downloader.PRIORITY_BULK if bulk else downloader.PRIORITY_NORMAL
         for task in created_tasks:
-            downloader.start_download_for_task(task, quality, options or {})
+            downloader.start_download_for_task(task, quality, options or {}, priority=priority)
         msg = f"已创建 {len(created_tasks)} 个下载任务"
         if skipped_count > 0:
             msg += f"（跳过 {skipped_count} 个重复链接）"
@@ -304,6 +431,115 @@ def _copy_js(text: str) -> str:
     )
 
 
+# 表头列名 -> query_tasks 的排序字段；不在其中的列不支持排序
+_SORT_COLUMNS = {"created_at": "created_at", "status": "status", "size": "file_size"}
+
+
+class _LiveTable:
+    """服务端分页的任务表，并把任务变更增量同步到当前页
+
+    筛选、排序、分页都交给 models.query_tasks，只物化并下发当前页。
+    任务变更时，当前页内的行只通过 JS 打补丁（服务端行列表原地同步，不调用 table.update()），
+    进度变化不会重发整页；只有可能改变分页归属的变更（新建/删除/状态等）才重新查询当前页。
+    """
+
+    def __init__(
+        self,
+        columns: list[dict],
+        build_row: Callable[[DownloadTask], dict | None],
+        query: Callable[..., tuple[list[DownloadTask], int]],
+        rows_per_page: int,
+        sort_by: str = "created_at",
+        descending: bool = False,
+        no_data_label: str = "",
+    ):
+        self.build_row = build_row
+        self.query = query
+        self.table = ui.table(
+            columns=columns,
+            rows=[],
+            row_key="task_id",
+            pagination={
+                "rowsPerPage": rows_per_page,
+                "page": 1,
+                "sortBy": sort_by,
+                "descending": descending,
+                "rowsNumber": 0,
+            },
+        ).props(f'no-data-label="{no_data_label}" :rows-per-page-options="[{rows_per_page}, 20, 50, 100]"')
+        self.table.on("request", self._on_request)
+        self._rows: dict[str, dict] = {}
+        self.reload()
+
+    def rows(self) -> list[dict]:
+        return self.table.rows
+
+    def _on_request(self, e) -> None:
+        self.table.pagination = e.args["pagination"]
+        self.reload()
+
+    def reload(self) -> None:
+        """重新查询并下发当前页"""
+        pagination = dict(self.table.pagination)
+        per_page = pagination.get("rowsPerPage") or 20
+        page = max(1, pagination.get("page") or 1)
+        sort = _SORT_COLUMNS.get(pagination.get("sortBy") or "", "created_at")
+        descending = bool(pagination.get("descending"))
+        tasks, total = self.query(sort=sort, descending=descending, offset=(page - 1) * per_page, limit=per_page)
+        if not tasks and page > 1:
+            # 当前页已被删空，退回最后一页
+            page = max(1, -(-total // per_page))
+            tasks, total = self.query(sort=sort, descending=descending, offset=(page - 1) * per_page, limit=per_page)
+        self.table.rows = [row for row in map(self.build_row, tasks) if row is not None]
+        self.table.pagination = {**pagination, "page": page, "rowsNumber": total}
+        self._rows = {row["task_id"]: row for row in self.table.rows}
+
+    def apply(self, tasks: dict[str, DownloadTask], changed_ids: list[str], removed_ids: list[str],
+              reshaped_ids: list[str]) -> bool:
+        """同步一批任务变更，返回当前页是否有变化"""
+        if removed_ids or any(
+            task_id in self._rows or (task_id in tasks and self.build_row(tasks[task_id]) is not None)
+            for task_id in reshaped_ids
+        ):
+            self.reload()
+            return True
+        upserts: list[dict] = []
+        # 行是可观察对象，任何修改都会触发整表 update()；这里只改服务端副本，前端由下面的 JS 打补丁
+        with self.table.props.suspend_updates():
+            for task_id in changed_ids:
+                current = self._rows.get(task_id)
+                task = tasks.get(task_id)
+                if current is None or task is None:
+                    continue
+                row = self.build_row(task)
+                if row is not None and row != current:
+                    current.update(row)
+                    upserts.append(row)
+        if not upserts:
+            return False
+        self.table.client.run_javascript(f"splazdlPatchRows({self.table.id}, \"task_id\", {json.dumps(upserts)})")
+        return True
+
+    def repatch(self) -> bool:
+        """重建当前页的行，只下发有变化的（行内容取决于任务之外的状态时用，如排队名次）"""
+        tasks = {t.task_id: t for t in map(downloader.get_task, self._rows) if t is not None}
+        return self.apply(tasks, list(self._rows), [], [])
+
+    def set_column(self, name: str, **values) -> None:
+        """修改列定义中的附加字段（供单元格插槽读取），只下发这一列，不重发行"""
+        for column in self.table.columns:
+            if column["name"] != name:
+                continue
+            if all(column.get(k) == v for k, v in values.items()):
+                return
+            with self.table.props.suspend_updates():
+                column.update(values)
+            self.table.client.run_javascript(
+                f"splazdlSetColumn({self.table.id}, {json.dumps(name)}, {json.dumps(values)})"
+            )
+            return
+
+
 def _format_duration(seconds: int | float | None) -> str:
     if not seconds:
         return "-"
@@ -316,6 +552,12 @@ def _format_duration(seconds: int | float | None) -> str:
     return f"{m:d}:{sec:02d}"
 
 
+def _format_speed(bytes_per_second: float) -> str:
+    if bytes_per_second <= 0:
+        return "-"
+    return f"{format_size(int(bytes_per_second))}/s"
+
+
 def _format_dt(dt: datetime | None) -> str:
     if not dt:
         return "-"
@@ -339,15 +581,7 @@ def _build_safe_download_name(task: DownloadTask) -> str:
 
 def get_completed_file_paths(user: User | None) -> list[str]:
     """获取当前用户已完成且存在的文件路径列表"""
-    if not user:
-        return []
-    tasks = get_all_tasks() if user.is_admin else get_user_tasks(user.username)
-    return [
-        t.file_path for t in tasks
-        if t.status == DownloadTask.STATUS_COMPLETED
-        and t.file_path
-        and Path(t.file_path).exists()
-    ]
+    return [t.file_path for t in _completed_tasks_for(user)]
 
 
 def _format_duration(seconds: int) -> str:
@@ -376,85 +610,76 @@ def _build_readme_content(tasks: list[DownloadTask]) -> str:
     return "\n".join(lines)
 
 
-def build_zip_path(user: User | None) -> str | None:
-    """将所有已完成文件打包成 zip，返回临时 zip 路径；无文件则返回 None"""
+def _completed_tasks_for(user: User | None) -> list[DownloadTask]:
+    """当前用户已完成且文件仍存在的任务"""
     if not user:
-        return None
-    config = get_config()
-    tasks = get_all_tasks() if user.is_admin else get_user_tasks(user.username)
-    completed_tasks = [
-        t for t in tasks
-        if t.status == DownloadTask.STATUS_COMPLETED
-        and t.file_path
-        and Path(t.file_path).exists()
-    ]
-    if not completed_tasks:
-        return None
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    temp_dir = Path(tempfile.gettempdir()) / f"videos_{timestamp}"
-    temp_dir.mkdir(parents=True, exist_ok=True)
-    for t in completed_tasks:
+        return []
+    tasks, _ = query_tasks(
+        username=None if user.is_admin else user.username, status=DownloadTask.STATUS_COMPLETED,
+    )
+    return [t for t in tasks if t.file_path and Path(t.file_path).exists()]
+
+
+def _recent_tasks_for(user: User, limit: int = _TIMINGS_EXPORT_LIMIT) -> list[DownloadTask]:
+    """当前用户最近创建的、已有耗时记录的任务（管理员为全部用户）"""
+    tasks, _ = query_tasks(
+        username=None if user.is_admin else user.username,
+        sort="created_at", descending=True, limit=max(1, min(limit, 5000)),
+    )
+    return [t for t in tasks if t.timings]
+
+
+def _zip_entries(tasks: list[DownloadTask]) -> list[tuple[str, Path | bytes]]:
+    """打包条目：各任务文件（重名时追加任务ID）+ README.txt"""
+    entries: list[tuple[str, Path | bytes]] = []
+    used = {"README.txt"}
+    for t in tasks:
         fp = Path(t.file_path)
-        dest = temp_dir / fp.name
-        shutil.copy2(fp, dest)
-        try:
-            subprocess.run(["xattr", "-r", "-c", str(dest)], check=False, capture_output=True)
-            for attr in ["kMDItemWhereFroms", "kMDItemFinderComment"]:
-                result = subprocess.run(
-                    ["xattr", "-px", f"com.apple.metadata:{attr}", str(fp)],
-                    capture_output=True, text=True,
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    subprocess.run(
-                        ["xattr", "-wx", f"com.apple.metadata:{attr}",
-                         result.stdout.strip().replace("\n", "").replace(" ", ""), str(dest)],
-                        check=False, capture_output=True,
-                    )
-        except Exception:
-            pass
-    readme_path = temp_dir / "README.txt"
-    readme_path.write_text(_build_readme_content(completed_tasks), encoding="utf-8")
-    zip_path = Path(tempfile.gettempdir()) / f"videos_{timestamp}.zip"
-    try:
-        subprocess.run(
-            ["ditto", "-c", "-k", "--keepParent", "--rsrc", str(temp_dir), str(zip_path)],
-            check=True, capture_output=True,
-        )
-    except Exception:
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            for t in completed_tasks:
-                fp = Path(t.file_path)
-                zf.write(fp, fp.name)
-            zf.write(readme_path, "README.txt")
-    shutil.rmtree(temp_dir, ignore_errors=True)
-    return str(zip_path)
+        name = fp.name
+        if name in used:
+            name = f"{fp.stem}_{t.task_id}{fp.suffix}"
+        used.add(name)
+        entries.append((name, fp))
+    entries.append(("README.txt", _build_readme_content(tasks).encode("utf-8")))
+    return entries
 
 
 def do_clear_all(user: User | None) -> None:
     """清空任务并将目录移动到 .trash"""
     if not user:
         return
-    config = get_config()
     username = None if user.is_admin else user.username
     task_dirs = clear_tasks(username)
-    trash_base = Path(config.download.base_dir) / ".trash"
     for task_dir_path in task_dirs:
         try:
             task_dir = Path(task_dir_path)
             if task_dir.exists():
-                task_username = task_dir.parent.name
-                user_trash_dir = trash_base / task_username
-                user_trash_dir.mkdir(parents=True, exist_ok=True)
-                dest = user_trash_dir / task_dir.name
-                if dest.exists():
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    dest = user_trash_dir / f"{task_dir.name}_{timestamp}"
-                shutil.move(str(task_dir), str(dest))
+                move_to_trash(task_dir)
         except Exception as e:
             logger.warning("移动目录到回收站失败: %s, 错误: %s", task_dir_path, e)
+    downloader.collect_media_garbage()
     logger.info("用户 %s 清空了 %s 个任务", user.username, len(task_dirs))
 
 
+async def _probe_in_pool(loop, executor, url: str, opts: dict, timeout: float, stale: Callable[[], bool]) -> dict | None:
+    """在共享探测线程池中预览一条链接；排到时已过期（stale）则跳过并返回 None
+
+    超时从线程开始探测时起算，不含在共享池里排队的时间（并发上限由线程池本身保证）。
+    超时后不再等待结果，占用的线程由 yt-dlp 的 socket_timeout 释放。
+    """
+    started = asyncio.Event()
+
+    def _run():
+        loop.call_soon_threadsafe(started.set)
+        if stale():
+            return None
+        return downloader.probe_info(url, opts)
+
+    future = loop.run_in_executor(executor, _run)
+    await started.wait()
+    return await asyncio.wait_for(future, timeout)
+
+
 # ============ 页面 ============
 
 @ui.page("/")
@@ -462,10 +687,10 @@ def main_page() -> None:
     """主页面：新建下载、任务列表、已完成文件、打包/清空（增强版）"""
     config = get_config()
     user, access_email = get_runtime_user_from_headers()
-    preview_state = {"items": [], "error": ""}
+    preview_state = {"items": [], "error": "", "generation": 0}
     task_filter_state = {"status": "all", "keyword": ""}
     task_column_state = {
-        "visible": ["task_id", "title", "status", "progress", "speed", "eta", "action"],
+        "visible": ["task_id", "title", "status", "progress", "speed", "eta", "queue", "upload", "action"],
     }
 
     with ui.column().classes("w-full max-w-[1400px] mx-auto p-3 gap-3"):
@@ -561,8 +786,10 @@ def main_page() -> None:
                     ui.label(f"预览失败: {error}").classes("text-negative")
                     return
                 if not items:
-                    ui.label("预览区：点击“批量预览链接”逐条探测可下载性、标题和清晰度").classes("text-grey-7")
+                    ui.label("预览区：点击“批量预览链接”并发探测可下载性、标题和清晰度").classes("text-grey-7")
                     return
+                done = sum(1 for item in items if not item.get("pending"))
+                ui.label(f"已完成 {done}/{len(items)}").classes("text-caption text-grey-7")
 
                 columns = [
                     {"name": "idx", "label": "#", "field": "idx", "sortable": True},
@@ -575,9 +802,13 @@ def main_page() -> None:
                 ]
                 rows = []
                 for i, item in enumerate(items, start=1):
+                    if item.get("pending"):
+                        status_text = "探测中"
+                    else:
+                        status_text = "可下载" if item["ok"] else "失败"
                     rows.append({
                         "idx": i,
-                        "status": "可下载" if item["ok"] else "失败",
+                        "status": status_text,
                         "title": item.get("title", "-"),
                         "duration": _format_duration(item.get("duration")),
                         "uploader": item.get("uploader", "-"),
@@ -588,34 +819,69 @@ def main_page() -> None:
 
             preview_ui()
 
-    def get_scoped_tasks() -> list[DownloadTask]:
-        return get_all_tasks() if user.is_admin else get_user_tasks(user.username)
+    def scope_username() -> str | None:
+        return None if user.is_admin else user.username
+
+    def in_scope(task: DownloadTask) -> bool:
+        return user.is_admin or task.username == user.username
 
-    def get_filtered_tasks() -> list[DownloadTask]:
-        tasks = get_scoped_tasks()
+    def matches_filter(task: DownloadTask) -> bool:
         status = task_filter_state["status"]
-        keyword = (task_filter_state["keyword"] or "").strip().lower()
-        if status != "all":
-            tasks = [t for t in tasks if t.status == status]
+        keyword = (task_filter_state["keyword"] or "").strip().casefold()
+        if status != "all" and task.status != status:
+            return False
         if keyword:
-            tasks = [
-                t for t in tasks
-                if keyword in (t.title or "").lower() or keyword in (t.url or "").lower() or keyword in t.task_id.lower()
-            ]
-        return tasks
+            return (
+                keyword in (task.title or "").casefold()
+                or keyword in (task.url or "").casefold()
+                or keyword in task.task_id.casefold()
+            )
+        return True
+
+    def query_filtered_tasks(**page) -> tuple[list[DownloadTask], int]:
+        status = task_filter_state["status"]
+        return query_tasks(
+            username=scope_username(),
+            status=None if status == "all" else status,
+            keyword=(task_filter_state["keyword"] or "").strip(),
+            **page,
+        )
+
+    def query_completed_tasks(**page) -> tuple[list[DownloadTask], int]:
+        return query_tasks(username=scope_username(), status=DownloadTask.STATUS_COMPLETED, **page)
+
+    def query_history_tasks(**page) -> tuple[list[DownloadTask], int]:
+        return query_tasks(username=scope_username(), **page)
 
     def _status_text(status: str) -> str:
         return {
             DownloadTask.STATUS_PENDING: "等待中",
             DownloadTask.STATUS_DOWNLOADING: "下载中",
+            DownloadTask.STATUS_UPLOADING: "上传中",
             DownloadTask.STATUS_COMPLETED: "已完成",
             DownloadTask.STATUS_FAILED: "失败",
             DownloadTask.STATUS_PAUSED: "已暂停",
         }.get(status, status)
 
+    def _upload_text(task: DownloadTask) -> str:
+        if task.oss_url:
+            return "已上传"
+        if task.upload_speed:
+            return f"{task.upload_progress:.1f}% · {_format_speed(task.upload_speed)}"
+        return "-"
+
+    def _queue_rank(task: DownloadTask) -> int:
+        # 排队名次按需从调度器读取（同一版本的结果各页面共用），不写回任务；
+        # 队首按顺序派发时名次不变，页面只更新“已派发数”，位置 = 名次 - 已派发数（见排队列插槽）
+        if task.status != DownloadTask.STATUS_PENDING:
+            return 0
+        return downloader.queue_ranks().get(task.task_id, 0)
+
     def _task_row(task: DownloadTask) -> dict:
-        if task.status == DownloadTask.STATUS_COMPLETED:
+        if task.status in (DownloadTask.STATUS_COMPLETED, DownloadTask.STATUS_UPLOADING):
             progress = format_size(task.file_size) if task.file_size > 0 else "已完成"
+        elif task.status == DownloadTask.STATUS_DOWNLOADING and task.total_bytes:
+            progress = f"{task.progress:.1f}% · {format_size(task.downloaded_bytes)}/{format_size(task.total_bytes)}"
         elif task.status == DownloadTask.STATUS_DOWNLOADING:
             progress = f"{task.progress:.1f}%"
         else:
@@ -626,8 +892,12 @@ def main_page() -> None:
             "status": _status_text(task.status),
             "status_raw": task.status,
             "progress": progress,
-            "speed": task.speed or "-",
-            "eta": task.eta or "-",
+            "speed": _format_speed(task.speed),
+            "eta": _format_duration(task.eta),
+            "extract_calls": task.extract_calls,
+            "upload": _upload_text(task),
+            "queue_rank": _queue_rank(task),
+            "queue_label": PRIORITY_LABELS.get(task.priority, str(task.priority)),
             "url": task.url,
             "error": task.error_msg or "",
         }
@@ -653,6 +923,12 @@ def main_page() -> None:
         elif action == "cancel":
             ok = downloader.cancel_task(task.task_id)
             ui.notify("已取消任务" if ok else "任务取消失败", color="warning" if ok else "negative")
+        elif action == "resume":
+            ok = downloader.resume_task(task.task_id)
+            ui.notify(
+                "已继续下载，将从已下载部分接着下载" if ok else "仅已暂停或失败（未取消）的任务可继续",
+                color="positive" if ok else "warning",
+            )
         elif action == "retry":
             downloader.start_download(
                 user,
@@ -661,6 +937,12 @@ def main_page() -> None:
                 collect_download_options(),
             )
             ui.notify("已重新创建下载任务", color="positive")
+        elif action == "prioritize":
+            if not user.is_admin:
+                ui.notify("仅管理员可调整优先级", color="negative")
+            else:
+                ok = downloader.set_task_priority(task.task_id, downloader.PRIORITY_URGENT)
+                ui.notify("已加急，任务将优先开始" if ok else "任务已不在队列中", color="positive" if ok else "warning")
         elif action == "copy_oss":
             if task.status != DownloadTask.STATUS_COMPLETED:
                 ui.notify("任务未完成，暂无OSS链接", color="warning")
@@ -669,6 +951,8 @@ def main_page() -> None:
             else:
                 ui.run_javascript(_copy_js(task.oss_url))
                 ui.notify("OSS链接已复制到剪贴板", color="positive")
+        elif action == "timings":
+            show_timings(task)
         elif action == "copy_error":
             if not task.error_msg:
                 ui.notify("该任务暂无错误信息", color="warning")
@@ -676,30 +960,127 @@ def main_page() -> None:
                 ui.run_javascript(_copy_js(task.error_msg))
                 ui.notify("错误信息已复制到剪贴板", color="positive")
 
-        task_table_ui.refresh()
-        completed_ui.refresh()
-        history_ui.refresh()
+        sync_tables()
+
+    def show_timings(task: DownloadTask) -> None:
+        with ui.dialog() as dialog, ui.card().classes("w-full").style("max-width: 760px"):
+            ui.label(f"阶段耗时 · {task.title or task.task_id}").classes("text-subtitle1")
+            # 标签已转义，其余均为数字
+            ui.html(generate_timings_html(task), sanitize=False).classes("w-full")
+            with ui.row().classes("w-full justify-end"):
+                ui.button("关闭", on_click=dialog.close).props("flat")
+        dialog.on("hide", dialog.delete)
+        dialog.open()
+
+    timing_stats_state = {"open": False}
 
     @ui.refreshable
-    def task_table_ui():
-        tasks = get_filtered_tasks()
-        if not tasks:
-            ui.label("暂无下载任务").classes("text-grey-7 q-mt-sm")
+    def timing_stats_ui():
+        if not timing_stats_state["open"]:
+            return
+        recent = _recent_tasks_for(user)
+        stats = timings.stage_percentiles(recent)
+        if not stats:
+            ui.label("暂无耗时记录").classes("text-caption text-grey-7")
             return
+        columns = [{"name": "stage", "label": "阶段", "field": "stage", "align": "left"}]
+        headers = {"count": "任务数", "max": "最大"}
+        columns += [
+            {"name": key, "label": headers.get(key, key.upper()), "field": key}
+            for key in next(iter(stats.values()))
+        ]
+        rows = [
+            {"stage": _STAGE_LABELS.get(stage, stage), "count": row["count"],
+             **{k: _format_seconds(v) for k, v in row.items() if k != "count"}}
+            for stage, row in stats.items()
+        ]
+        ui.table(columns=columns, rows=rows, row_key="stage").props("dense flat").classes("w-full")
+        ui.label(f"统计最近 {len(recent)} 个有耗时记录的任务，每个任务按阶段累计").classes("text-caption text-grey-7")
+
+    # 已渲染的表，由 sync_tables 增量更新
+    live_tables: dict[str, _LiveTable | None] = {"tasks": None, "completed": None, "history": None}
+    seen_version = {"value": task_change_feed.version}
+    seen_queue_version = {"value": downloader.queue_version()}
+
+    def _visible_task_row(task: DownloadTask) -> dict | None:
+        return _task_row(task) if in_scope(task) and matches_filter(task) else None
+
+    def _completed_row(task: DownloadTask) -> dict | None:
+        if not in_scope(task) or task.status != DownloadTask.STATUS_COMPLETED:
+            return None
+        # 文件丢失的任务仍占一行（标记为丢失），行数与分页总数保持一致
+        missing = not task.file_path or not Path(task.file_path).exists()
+        return {
+            "task_id": task.task_id,
+            "title": task.title or "未知",
+            "size": "文件已丢失" if missing else format_size(task.file_size),
+            "missing": missing,
+            "created_at": _format_dt(task.created_at),
+            "file_path": task.file_path,
+            "oss_url": task.oss_url or "",
+            "dedup_bytes": task.dedup_bytes,
+        }
 
+    def _history_row(task: DownloadTask) -> dict | None:
+        if not in_scope(task):
+            return None
+        return {
+            "task_id": task.task_id,
+            "title": task.title or "获取中...",
+            "status": _status_text(task.status),
+            "created_at": _format_dt(task.created_at),
+            "error": task.error_msg or "",
+        }
+
+    def sync_tables() -> None:
+        """按变更流增量更新三张表；没有任何任务变化时什么也不做"""
+        if live_tables["tasks"] is not None:
+            if downloader.queue_version() != seen_queue_version["value"]:
+                seen_queue_version["value"] = downloader.queue_version()
+                live_tables["tasks"].repatch()
+            live_tables["tasks"].set_column("queue", offset=downloader.queue_dispatched())
+        if task_change_feed.version == seen_version["value"]:
+            return
+        changes = task_change_feed.changes_since(seen_version["value"])
+        if changes is None:
+            seen_version["value"] = task_change_feed.version
+            task_table_ui.refresh()
+            completed_ui.refresh()
+            history_ui.refresh()
+            return
+        seen_version["value"] = changes.version
+        tasks = {t.task_id: t for t in map(downloader.get_task, changes.changed) if t is not None}
+        for name, live in live_tables.items():
+            if live is None:
+                continue
+            if live.apply(tasks, changes.changed, changes.removed, changes.reshaped) and name == "completed":
+                update_saved_label()
+
+    @ui.refreshable
+    def task_table_ui():
         all_columns = [
-            {"name": "task_id", "label": "任务ID", "field": "task_id", "sortable": True},
+            {"name": "task_id", "label": "任务ID", "field": "task_id"},
             {"name": "title", "label": "标题", "field": "title"},
             {"name": "status", "label": "状态", "field": "status", "sortable": True},
-            {"name": "progress", "label": "进度/大小", "field": "progress", "sortable": True},
+            {"name": "progress", "label": "进度/大小", "field": "progress"},
             {"name": "speed", "label": "速度", "field": "speed"},
             {"name": "eta", "label": "剩余", "field": "eta"},
+            {"name": "queue", "label": "排队", "field": "queue_rank", "offset": downloader.queue_dispatched()},
+            {"name": "upload", "label": "上传", "field": "upload"},
+            {"name": "extract_calls", "label": "提取次数", "field": "extract_calls"},
             {"name": "action", "label": "操作", "field": "action"},
         ]
         visible = set(task_column_state["visible"])
         columns = [c for c in all_columns if c["name"] in visible]
-        rows = [_task_row(t) for t in tasks]
-        table = ui.table(columns=columns, rows=rows, row_key="task_id", pagination=8).classes("w-full")
+        live = _LiveTable(columns, _visible_task_row, query_filtered_tasks, 8, no_data_label="暂无下载任务")
+        live_tables["tasks"] = live
+        table = live.table.classes("w-full")
+        table.add_slot("body-cell-queue", """
+            <q-td key="queue" :props="props">
+              {{ props.row.queue_rank > props.col.offset
+                 ? '#' + (props.row.queue_rank - props.col.offset) + ' · ' + props.row.queue_label : '-' }}
+            </q-td>
+        """)
         if "action" in visible:
             with table.add_slot("body-cell-action"):
                 with table.cell("action"):
@@ -719,6 +1100,11 @@ def main_page() -> None:
                             js_handler='() => emit(["pause", props.row.task_id])',
                             handler=lambda e: handle_task_action(e.args[0], e.args[1]),
                         )
+                        ui.button("继续").props("flat dense size=sm color=primary").on(
+                            "click",
+                            js_handler='() => emit(["resume", props.row.task_id])',
+                            handler=lambda e: handle_task_action(e.args[0], e.args[1]),
+                        )
                         ui.button("取消").props("flat dense size=sm color=negative").on(
                             "click",
                             js_handler='() => emit(["cancel", props.row.task_id])',
@@ -734,41 +1120,52 @@ def main_page() -> None:
                             js_handler='() => emit(["copy_error", props.row.task_id])',
                             handler=lambda e: handle_task_action(e.args[0], e.args[1]),
                         )
+                        ui.button("耗时").props("flat dense size=sm color=grey-8").on(
+                            "click",
+                            js_handler='() => emit(["timings", props.row.task_id])',
+                            handler=lambda e: handle_task_action(e.args[0], e.args[1]),
+                        )
+                        if user.is_admin:
+                            ui.button("加急").props("flat dense size=sm color=orange").on(
+                                "click",
+                                js_handler='() => emit(["prioritize", props.row.task_id])',
+                                handler=lambda e: handle_task_action(e.args[0], e.args[1]),
+                            )
+
+    saved_label: dict[str, ui.label | None] = {"label": None}
+
+    def update_saved_label() -> None:
+        label = saved_label["label"]
+        live = live_tables["completed"]
+        if label is None or live is None:
+            return
+        reused = [row for row in live.rows() if row["dedup_bytes"] > 0]
+        text = (
+            f"其中 {len(reused)} 个文件复用了已下载的相同媒体，节省下载 {format_size(sum(r['dedup_bytes'] for r in reused))}"
+            if reused else ""
+        )
+        if label.text != text:
+            label.set_text(text)
 
     @ui.refreshable
     def completed_ui():
         def trigger_file_download(task_id: str):
             ui.run_javascript(f"window.open({json.dumps(_download_url(task_id))}, '_blank')")
 
-        tasks = get_scoped_tasks()
-        completed = [
-            t for t in tasks
-            if t.status == DownloadTask.STATUS_COMPLETED and t.file_path and Path(t.file_path).exists()
-        ]
-        if not completed:
-            ui.label("暂无已完成文件").classes("text-grey-7")
-            return
-
-        rows = [
-            {
-                "task_id": t.task_id,
-                "title": t.title or "未知",
-                "size": format_size(t.file_size),
-                "created_at": _format_dt(t.created_at),
-                "file_path": t.file_path,
-                "oss_url": t.oss_url or "",
-            }
-            for t in sorted(completed, key=lambda x: x.created_at, reverse=True)
-        ]
+        saved_label["label"] = None
         columns = [
-            {"name": "task_id", "label": "任务ID", "field": "task_id", "sortable": True},
+            {"name": "task_id", "label": "任务ID", "field": "task_id"},
             {"name": "title", "label": "标题", "field": "title"},
             {"name": "size", "label": "大小", "field": "size", "sortable": True},
             {"name": "created_at", "label": "完成时间", "field": "created_at", "sortable": True},
             {"name": "oss_url", "label": "OSS链接", "field": "oss_url"},
             {"name": "action", "label": "操作", "field": "action"},
         ]
-        table = ui.table(columns=columns, rows=rows, row_key="task_id", pagination=8).classes("w-full")
+        live = _LiveTable(
+            columns, _completed_row, query_completed_tasks, 8, descending=True, no_data_label="暂无已完成文件",
+        )
+        live_tables["completed"] = live
+        table = live.table.classes("w-full")
         table.add_slot("body-cell-oss_url", """
             <q-td key="oss_url" :props="props">
               <a v-if="props.row.oss_url" :href="props.row.oss_url" target="_blank"
@@ -780,36 +1177,27 @@ def main_page() -> None:
         """)
         with table.add_slot("body-cell-action"):
             with table.cell("action"):
-                ui.button("下载").props("flat dense size=sm color=primary").on(
+                ui.button("下载").props('flat dense size=sm color=primary :disable="props.row.missing"').on(
                     "click",
                     js_handler='() => emit(props.row.task_id)',
                     handler=lambda e: trigger_file_download(e.args),
                 )
+        saved_label["label"] = ui.label("").classes("text-caption text-grey-7")
+        update_saved_label()
 
     @ui.refreshable
     def history_ui():
-        tasks = sorted(get_scoped_tasks(), key=lambda x: x.created_at, reverse=True)
-        if not tasks:
-            ui.label("暂无历史任务").classes("text-grey-7")
-            return
-        rows = [
-            {
-                "task_id": t.task_id,
-                "title": t.title or "获取中...",
-                "status": _status_text(t.status),
-                "created_at": _format_dt(t.created_at),
-                "error": t.error_msg or "",
-            }
-            for t in tasks
-        ]
         columns = [
-            {"name": "task_id", "label": "任务ID", "field": "task_id", "sortable": True},
+            {"name": "task_id", "label": "任务ID", "field": "task_id"},
             {"name": "title", "label": "标题", "field": "title"},
             {"name": "status", "label": "状态", "field": "status", "sortable": True},
             {"name": "created_at", "label": "创建时间", "field": "created_at", "sortable": True},
             {"name": "error", "label": "失败原因", "field": "error"},
         ]
-        ui.table(columns=columns, rows=rows, row_key="task_id", pagination=10).classes("w-full")
+        live_tables["history"] = _LiveTable(
+            columns, _history_row, query_history_tasks, 10, descending=True, no_data_label="暂无历史任务",
+        )
+        live_tables["history"].table.classes("w-full")
 
     def collect_download_options() -> dict:
         cookie_file_value = (cookie_file.value or "").strip()
@@ -1091,50 +1479,75 @@ def main_page() -> None:
             collect_download_options(),
         )
         ui.notify(msg, color="positive" if msg.startswith("已创建") else None)
-        task_table_ui.refresh()
-        completed_ui.refresh()
-        history_ui.refresh()
+        sync_tables()
         save_ui_prefs()
 
     download_btn.on("click", on_download_click)
 
-    def on_preview_click():
+    def _preview_item(u: str, *, pending: bool = False, error: str = "") -> dict:
+        return {
+            "ok": False,
+            "pending": pending,
+            "url": u,
+            "title": "-",
+            "uploader": "-",
+            "duration": 0,
+            "available_heights": [],
+            "video_exts": [],
+            "audio_exts": [],
+            "webpage_url": u,
+            "error": error,
+        }
+
+    async def on_preview_click():
         lines = [line.strip() for line in (url_input.value or "").split("\n") if line.strip()]
         if not lines:
             ui.notify("请先输入至少一个链接", color="warning")
             return
-        dedup_urls = list(dict.fromkeys(lines))[:10]
-        if len(lines) > 10:
-            ui.notify("仅预览前 10 条链接（其余请分批）", color="warning")
-
-        preview_state["items"] = []
+        dedup_urls = list(dict.fromkeys(lines))
+        max_urls = config.download.preview_max_urls
+        if len(dedup_urls) > max_urls:
+            ui.notify(f"仅预览前 {max_urls} 条链接（其余请分批）", color="warning")
+            dedup_urls = dedup_urls[:max_urls]
+
+        # 新一轮预览开始后，旧一轮尚未返回的结果直接丢弃
+        preview_state["generation"] = generation = preview_state.get("generation", 0) + 1
+        preview_state["items"] = [_preview_item(u, pending=True) for u in dedup_urls]
         preview_state["error"] = ""
+        preview_ui.refresh()
+
         opts = collect_download_options()
+        loop = asyncio.get_running_loop()
+        executor = downloader.get_probe_executor()
+        timeout = config.download.preview_timeout
+        last_refresh = [loop.time()]
+
+        async def probe_one(idx: int, u: str):
+            try:
+                info = await _probe_in_pool(
+                    loop, executor, u, opts, timeout, lambda: preview_state["generation"] != generation,
+                )
+                if info is None:
+                    return
+                item = {"ok": True, "pending": False, "url": u, **info}
+            except asyncio.TimeoutError:
+                item = _preview_item(u, error=f"探测超时（>{timeout}s）")
+            except Exception as e:
+                item = _preview_item(u, error=str(e))
+            if preview_state["generation"] != generation:
+                return
+            preview_state["items"][idx] = item
+            # 结果逐条流入预览表，刷新频率做合并，避免数百条链接时反复重建表格
+            if loop.time() - last_refresh[0] >= 0.5:
+                last_refresh[0] = loop.time()
+                preview_ui.refresh()
+
         try:
-            for u in dedup_urls:
-                try:
-                    info = downloader.probe_info(u, opts)
-                    preview_state["items"].append({
-                        "ok": True,
-                        "url": u,
-                        **info,
-                    })
-                except Exception as e:
-                    preview_state["items"].append({
-                        "ok": False,
-                        "url": u,
-                        "title": "-",
-                        "uploader": "-",
-                        "duration": 0,
-                        "available_heights": [],
-                        "video_exts": [],
-                        "audio_exts": [],
-                        "webpage_url": u,
-                        "error": str(e),
-                    })
+            await asyncio.gather(*(probe_one(i, u) for i, u in enumerate(dedup_urls)))
         except Exception as e:
             preview_state["error"] = str(e)
-        preview_ui.refresh()
+        if preview_state["generation"] == generation:
+            preview_ui.refresh()
 
     preview_btn.on("click", on_preview_click)
     apply_preset_btn.on("click", apply_preset)
@@ -1160,6 +1573,7 @@ def main_page() -> None:
                         "all": "全部",
                         DownloadTask.STATUS_PENDING: "等待中",
                         DownloadTask.STATUS_DOWNLOADING: "下载中",
+                        DownloadTask.STATUS_UPLOADING: "上传中",
                         DownloadTask.STATUS_COMPLETED: "已完成",
                         DownloadTask.STATUS_FAILED: "失败",
                     },
@@ -1190,6 +1604,9 @@ def main_page() -> None:
                         ("progress", "进度/大小"),
                         ("speed", "速度"),
                         ("eta", "剩余"),
+                        ("queue", "排队"),
+                        ("upload", "上传"),
+                        ("extract_calls", "提取次数"),
                         ("action", "操作"),
                     ]:
                         ui.switch(
@@ -1199,7 +1616,7 @@ def main_page() -> None:
                         )
             with ui.row().classes("q-gutter-sm q-mb-sm"):
                 def on_retry_failed_all():
-                    failed = [t for t in get_scoped_tasks() if t.status == DownloadTask.STATUS_FAILED]
+                    failed, _ = query_tasks(username=scope_username(), status=DownloadTask.STATUS_FAILED)
                     if not failed:
                         ui.notify("暂无失败任务", color="warning")
                         return
@@ -1211,11 +1628,34 @@ def main_page() -> None:
                             collect_download_options(),
                         )
                     ui.notify(f"已重新创建 {len(failed)} 个失败任务", color="positive")
-                    task_table_ui.refresh()
-                    history_ui.refresh()
+                    sync_tables()
                 ui.button("重试全部失败", on_click=on_retry_failed_all).props("outline")
+
+                def on_cancel_pending_all():
+                    count = downloader.cancel_pending_tasks(None if user.is_admin else user.username)
+                    if not count:
+                        ui.notify("暂无等待中的任务", color="warning")
+                        return
+                    ui.notify(f"已取消 {count} 个等待中的任务", color="warning")
+                    sync_tables()
+                ui.button("取消全部等待", on_click=on_cancel_pending_all).props("outline color=negative")
             task_table_ui()
 
+            def on_timing_stats_toggle(e):
+                timing_stats_state["open"] = bool(e.value)
+                timing_stats_ui.refresh()
+
+            with ui.expansion(
+                "阶段耗时统计（P50 / P90 / P99）", value=False, on_value_change=on_timing_stats_toggle,
+            ).classes("w-full q-mt-sm"):
+                with ui.row().classes("q-gutter-sm q-mb-sm"):
+                    ui.button("刷新", on_click=timing_stats_ui.refresh).props("outline dense")
+                    ui.button(
+                        "导出 JSON",
+                        on_click=lambda: ui.run_javascript("window.open('/timings.json', '_blank')"),
+                    ).props("outline dense")
+                timing_stats_ui()
+
         with ui.card().classes("w-full p-4"):
             ui.label("已完成文件").classes("text-subtitle1")
             completed_ui()
@@ -1230,8 +1670,7 @@ def main_page() -> None:
 
                 def on_clear_all():
                     do_clear_all(user)
-                    task_table_ui.refresh()
-                    completed_ui.refresh()
+                    sync_tables()
                     ui.notify("已清空", color="warning")
 
                 ui.button("打包下载全部", on_click=on_download_all).props("outline")
@@ -1241,20 +1680,50 @@ def main_page() -> None:
             ui.label("历史任务（分页）").classes("text-subtitle1")
             history_ui()
 
-    ui.timer(2.0, lambda: (task_table_ui.refresh(), completed_ui.refresh(), history_ui.refresh()))
+    # 只推送变更过的行；空闲时每次只比较一次版本号
+    ui.timer(2.0, sync_tables)
+
+
+_UPLOAD_ACCEPT = "video/*,audio/*,.mp4,.mkv,.webm,.mov,.avi,.m4a,.mp3,.flac,.opus,.aac,.wav"
+
+# 用 XHR 发送 File 本身：浏览器从磁盘流式读取，服务端边收边传 OSS；进度经 emitEvent 回传
+_STREAM_UPLOAD_JS = """
+<script>
+window.splazdlStreamUpload = function (files) {
+  for (const file of files) {
+    const id = Math.random().toString(36).slice(2);
+    emitEvent("splazdl_upload", {id, phase: "start", name: file.name, size: file.size});
+    const xhr = new XMLHttpRequest();
+    let last = 0;
+    xhr.upload.onprogress = (ev) => {
+      const now = Date.now();
+      if (now - last < 500) return;
+      last = now;
+      emitEvent("splazdl_upload", {id, phase: "progress", loaded: ev.loaded});
+    };
+    xhr.onload = () => {
+      let body = {};
+      try { body = JSON.parse(xhr.responseText); } catch (e) {}
+      const ok = xhr.status === 200;
+      emitEvent("splazdl_upload", {id, phase: "done", oss_url: ok ? body.oss_url : "", error: ok ? "" : (body.detail || xhr.statusText)});
+    };
+    xhr.onerror = () => emitEvent("splazdl_upload", {id, phase: "done", oss_url: "", error: "网络错误"});
+    xhr.open("POST", "/upload/stream?name=" + encodeURIComponent(file.name));
+    xhr.setRequestHeader("Content-Type", file.type || "application/octet-stream");
+    xhr.send(file);
+  }
+};
+</script>
+"""
 
 
 @ui.page("/upload")
 def upload_page() -> None:
     """手动上传视频文件到 OSS"""
-    import uuid
-    from nicegui import run as ng_run
-    from oss_uploader import upload_to_oss
-    from feishu_notify import send_download_complete
-
     get_runtime_user_from_headers()
 
     upload_records: list[dict] = []
+    active_uploads: dict[str, dict] = {}
 
     with ui.column().classes("w-full max-w-[1000px] mx-auto p-3 gap-3"):
         with ui.row().classes("w-full items-center"):
@@ -1263,7 +1732,7 @@ def upload_page() -> None:
 
         with ui.card().classes("w-full p-4 gap-3"):
             ui.label("选择文件").classes("text-subtitle1")
-            ui.label("支持视频/音频格式，可多选，文件传输完成后自动推送到阿里云 OSS").classes("text-caption text-grey-7")
+            ui.label("支持视频/音频格式，可多选，边传边推送到阿里云 OSS（不经服务器磁盘）").classes("text-caption text-grey-7")
 
             with ui.row().classes("items-center gap-2"):
                 spinner = ui.spinner("dots", size="sm", color="teal")
@@ -1290,7 +1759,7 @@ def upload_page() -> None:
                                 ui.label(rec["filename"]).classes("text-body2 text-bold text-truncate")
                                 ui.label(rec["size"]).classes("text-caption text-grey-7")
                             if rec.get("uploading"):
-                                ui.label("正在推送 OSS…").classes("text-caption text-grey-7")
+                                ui.label(f"正在推送 OSS… {rec['progress']:.0f}%").classes("text-caption text-grey-7")
                             elif rec["oss_url"]:
                                 ui.label(rec["oss_url"]).classes("text-caption text-grey-8 text-truncate grow")
                                 ui.button("复制链接", on_click=lambda url=rec["oss_url"]: [
@@ -1300,50 +1769,51 @@ def upload_page() -> None:
                             else:
                                 ui.label("上传失败").classes("text-negative text-caption")
 
-            async def handle_upload(e):
-                filename = e.file.name
-                size = e.file.size()
-
-                # 先插入 loading 记录
-                record: dict = {"filename": filename, "size": format_size(size), "oss_url": "", "uploading": True}
-                upload_records.insert(0, record)
-                records_ui.refresh()
-                spinner.visible = True
-                status_label.set_text(f"正在推送 {filename} 到 OSS…")
-
-                # 保存临时文件，在线程中执行阻塞的 OSS 上传
-                tmp_path = Path(tempfile.gettempdir()) / f"splazdl_{uuid.uuid4().hex}_{filename}"
-                await e.file.save(tmp_path)
-                task_id = uuid.uuid4().hex[:8]
-
-                oss_url = await ng_run.io_bound(upload_to_oss, task_id, tmp_path)
-                tmp_path.unlink(missing_ok=True)
-
-                # 更新记录
-                record["oss_url"] = oss_url
-                record["uploading"] = False
+            def on_stream_upload(e) -> None:
+                # 浏览器直接把 File 作为请求体 POST 到 /upload/stream，这里只同步状态
+                event = e.args[0] if isinstance(e.args, list) else e.args
+                record = active_uploads.get(event["id"])
+                if event["phase"] == "start":
+                    record = {
+                        "filename": event["name"], "size": format_size(event["size"]), "bytes": event["size"],
+                        "oss_url": "", "uploading": True, "progress": 0.0,
+                    }
+                    active_uploads[event["id"]] = record
+                    upload_records.insert(0, record)
+                    status_label.set_text(f"正在推送 {event['name']} 到 OSS…")
+                elif record is None:
+                    return
+                elif event["phase"] == "progress":
+                    record["progress"] = event["loaded"] / record["bytes"] * 100 if record["bytes"] else 0.0
+                else:
+                    active_uploads.pop(event["id"], None)
+                    filename = record["filename"]
+                    record["oss_url"] = event.get("oss_url") or ""
+                    record["uploading"] = False
+                    if record["oss_url"]:
+                        status_label.set_text(f"✅ {filename} 已上传")
+                        ui.run_javascript(_copy_js(record["oss_url"]))
+                        ui.notify(f"{filename} 上传成功，链接已复制", color="positive")
+                    else:
+                        detail = event.get("error") or "请检查 OSS 配置"
+                        status_label.set_text(f"❌ {filename} 上传失败：{detail}")
+                        ui.notify(f"{filename} 上传失败", color="negative")
+                spinner.visible = bool(active_uploads)
                 records_ui.refresh()
-                spinner.visible = False
 
-                if oss_url:
-                    status_label.set_text(f"✅ {filename} 已上传")
-                    ui.run_javascript(_copy_js(oss_url))
-                    ui.notify(f"{filename} 上传成功，链接已复制", color="positive")
-                    await ng_run.io_bound(
-                        lambda: send_download_complete(
-                            task_id=task_id, title=filename, url="",
-                            oss_url=oss_url, file_size=size, duration=0,
-                        )
-                    )
-                else:
-                    status_label.set_text(f"❌ {filename} 上传失败，请检查 OSS 配置")
-                    ui.notify(f"{filename} 上传失败", color="negative")
+            ui.on("splazdl_upload", on_stream_upload)
+            ui.add_body_html(_STREAM_UPLOAD_JS)
 
-            ui.upload(
-                label="点击或拖拽文件到此处",
-                multiple=True,
-                on_upload=handle_upload,
-            ).props("accept='video/*,audio/*,.mp4,.mkv,.webm,.mov,.avi,.m4a,.mp3,.flac,.opus,.aac,.wav' color=teal").classes("w-full")
+            file_input = ui.element("input").props(f'type=file multiple accept="{_UPLOAD_ACCEPT}"').style("display:none")
+            file_input.on("change", js_handler="(e) => { splazdlStreamUpload(e.target.files); e.target.value = ''; }")
+            with ui.column().classes("w-full items-center q-pa-lg gap-1 cursor-pointer").style(
+                "border: 2px dashed #80cbc4; border-radius: 12px;"
+            ) as drop_zone:
+                ui.icon("cloud_upload", color="teal").classes("text-h4")
+                ui.label("点击或拖拽文件到此处").classes("text-body2 text-grey-8")
+            drop_zone.on("click", js_handler=f"() => getHtmlElement({file_input.id}).click()")
+            drop_zone.on("dragover", js_handler="(e) => e.preventDefault()")
+            drop_zone.on("drop", js_handler="(e) => { e.preventDefault(); splazdlStreamUpload(e.dataTransfer.files); }")
 
             records_ui()
 
@@ -1359,6 +1829,28 @@ body { background: #f7f8fa; }
 </style>
 """, shared=True)
 
+# _LiveTable 的前端补丁：按 row_key 替换当前页中变化的行、修改单列定义，不整页重发
+ui.add_head_html("""
+<script>
+window.splazdlPatchRows = function (id, key, upserts) {
+  const el = mounted_app.elements[id];
+  if (!el) return;
+  const rows = el.props.rows.slice();
+  const index = new Map(rows.map((r, i) => [r[key], i]));
+  for (const row of upserts) {
+    const i = index.get(row[key]);
+    if (i !== undefined) rows[i] = row;
+  }
+  el.props.rows = rows;
+};
+window.splazdlSetColumn = function (id, name, values) {
+  const el = mounted_app.elements[id];
+  if (!el) return;
+  el.props.columns = el.props.columns.map((c) => (c.name === name ? { ...c, ...values } : c));
+};
+</script>
+""", shared=True)
+
 
 # ============ 主入口 ============
 
@@ -1375,6 +1867,24 @@ def main() -> None:
 
     Path(config.download.base_dir).mkdir(parents=True, exist_ok=True)
 
+    get_task_store()
+    # 任务多时建索引要一两秒，提前在后台建好，避免第一次搜索卡住页面
+    threading.Thread(target=load_search_index, name="search-index", daemon=True).start()
+    app.on_shutdown(downloader.close_process_engine)
+    app.on_shutdown(close_task_store)
+    logger.info("任务存储: %s", config.storage.backend)
+    if downloader.get_process_engine() is not None:
+        logger.info("下载引擎: 子进程池（%s 个进程）", config.download.max_concurrent)
+    if feishu_notify.get_notifier() is not None:
+        app.on_shutdown(feishu_notify.close_notifier)
+        logger.info("飞书通知: 已启用（待发送 %s 条）", feishu_notify.get_notifier().pending())
+    blobs, freed = downloader.collect_media_garbage()
+    if blobs:
+        logger.info("已回收 %s 个不再被任务引用的媒体文件（%s）", blobs, format_size(freed))
+    requeued = downloader.requeue_uploads()
+    if requeued:
+        logger.info("已重新排队 %s 个待上传任务", requeued)
+
     storage_secret = (
         (config.storage_secret or "").strip()
         or os.environ.get("VIDEOFETCHER_STORAGE_SECRET", "")
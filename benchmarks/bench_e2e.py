@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+端到端下载吞吐基准：本地媒体服务器 + start_download / _download_worker 全流程，无需外网
+
+用法: python benchmarks/bench_e2e.py [--tasks 24] [--concurrency 4] [--kinds mp4,hls,dash] [--size-mb 4]
+                                     [--bandwidth 0] [--latency-ms 0] [--error-rate 0] [--engine thread]
+                                     [--json result.json] [--baseline previous.json]
+
+媒体由 benchmarks/media_server.py 生成并在本进程内提供，任务经 yt-dlp 通用解析器走完
+解析 → 下载 → 后处理 → 收尾（OSS 与飞书通知强制关闭）。每个任务的链接互不相同，不会命中
+元数据缓存；默认关闭去重存储，--dedup 可把入库哈希也算进来。
+
+报告 tasks/min、总吞吐（MiB/s）、任务延迟（提交到完成）与执行耗时（各阶段耗时之和）的
+P50/P99、峰值 RSS（主进程；--engine process 时另计子进程）以及各阶段 P50。
+--json 写出结果（含当前 commit 与全部参数），--baseline 读入另一次的结果并给出变化，
+参数相同的两次运行可以跨 commit 对比工作线程池、进度回调与后处理上的回退。
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# 先于 downloader（及其 load_dotenv）置空，保证基准不会连到 OSS / 飞书
+for _name in ("SPLAZDL_OSS_ENDPOINT", "SPLAZDL_FEISHU_WEBHOOK_URL"):
+    os.environ[_name] = ""
+
+import downloader  # noqa: E402
+import models  # noqa: E402
+import timings  # noqa: E402
+from config import AppConfig, DownloadConfig, StorageConfig, set_config  # noqa: E402
+from media_server import KINDS, MediaServer, generate_media, parse_bandwidth  # noqa: E402
+from task_store import MemoryTaskStore  # noqa: E402
+
+_MB = 1024 * 1024
+_DONE = ("completed", "failed")
+# --baseline 对比的指标：(键, 标签, 越大越好)
+_COMPARED = [
+    ("tasks_per_min", "tasks/min", True),
+    ("mib_per_s", "MiB/s", True),
+    ("latency_p50", "延迟 P50(s)", False),
+    ("latency_p99", "延迟 P99(s)", False),
+    ("run_p50", "执行 P50(s)", False),
+    ("run_p99", "执行 P99(s)", False),
+    ("peak_rss_mib", "峰值 RSS(MiB)", False),
+]
+
+
+def _percentile(values: list[float], p: float) -> float:
+    return timings.percentile(sorted(values), p) if values else 0.0
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+@contextmanager
+def _stdout_to(path: Path):
+    """把文件描述符 1 重定向到 path（yt-dlp 的进度输出，进程池子进程也会继承）"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(path, "ab") as log:
+        os.dup2(log.fileno(), 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def _configure(args: argparse.Namespace, base_dir: Path) -> None:
+    set_config(AppConfig(
+        download=DownloadConfig(
+            base_dir=str(base_dir),
+            max_concurrent=args.concurrency,
+            engine=args.engine,
+            dedup=args.dedup,
+            progress_interval=args.progress_interval,
+        ),
+        storage=StorageConfig(backend="memory"),
+    ))
+    models.set_task_store(MemoryTaskStore())
+
+
+def _run_batch(server: MediaServer, kinds: list[str], count: int, prefix: str, timeout: float) -> list[dict]:
+    """同时提交 count 个任务并等到全部结束；返回每个任务的结果"""
+    user = models.User("bench", "", "admin")
+    submitted = time.monotonic()
+    pending = {}
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        task_id = downloader.start_download(user, server.url(kind, f"{prefix}{i}"), "best", {})
+        pending[task_id] = kind
+
+    results = []
+    deadline = submitted + timeout
+    while pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+        for task_id in [t for t in pending if models.get_task(t).status in _DONE]:
+            task = models.get_task(task_id)
+            results.append({
+                "kind": pending.pop(task_id),
+                "status": task.status,
+                "error": task.error_msg,
+                "bytes": task.file_size,
+                "latency": time.monotonic() - submitted,
+                "run": sum(span["seconds"] for span in task.timings),
+                "task": task,
+            })
+    for task_id, kind in pending.items():
+        results.append({"kind": kind, "status": "timeout", "error": "", "bytes": 0, "latency": timeout, "run": 0.0})
+    return results
+
+
+def _summarize(results: list[dict], wall: float) -> dict:
+    ok = [r for r in results if r["status"] == "completed"]
+    latencies = [r["latency"] for r in ok]
+    runs = [r["run"] for r in ok]
+    summary = {
+        "tasks": len(results),
+        "completed": len(ok),
+        "failed": len(results) - len(ok),
+        "wall_s": round(wall, 3),
+        "tasks_per_min": round(len(ok) / wall * 60, 2) if wall else 0.0,
+        "mib_per_s": round(sum(r["bytes"] for r in ok) / _MB / wall, 2) if wall else 0.0,
+        "latency_p50": round(_percentile(latencies, 50), 3),
+        "latency_p99": round(_percentile(latencies, 99), 3),
+        "run_p50": round(_percentile(runs, 50), 3),
+        "run_p99": round(_percentile(runs, 99), 3),
+    }
+    stages = timings.stage_percentiles([r["task"] for r in ok], percentiles=(50, 99))
+    by_kind = {}
+    for kind in sorted({r["kind"] for r in results}):
+        mine = [r for r in ok if r["kind"] == kind]
+        by_kind[kind] = {
+            "completed": len(mine),
+            "run_p50": round(_percentile([r["run"] for r in mine], 50), 3),
+        }
+    return {"summary": summary, "stages": stages, "kinds": by_kind}
+
+
+def _peak_rss_mib(engine: str) -> tuple[float, float | None]:
+    """(主进程, 下载子进程) 的峰值 RSS；线程模式下子进程只有 fork 出的短命命令，不计"""
+    # Linux 上 ru_maxrss 单位为 KiB（macOS 为字节）
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / _MB
+    if engine != "process":
+        return round(own, 1), None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / _MB
+    return round(own, 1), round(children, 1)
+
+
+def _print_report(report: dict) -> None:
+    s = report["summary"]
+    p = report["params"]
+    print(f"commit {report['commit'] or '-'} · 媒体 {report['media']} · engine={p['engine']} "
+          f"· 并发 {p['concurrency']} · {p['tasks']} 个任务（{p['kinds']}，每个 {p['size_mb']} MiB）")
+    print(f"带宽 {p['bandwidth']}/连接 · 延迟 {p['latency_ms']} ms · 错误注入 {p['error_rate']:.1%} "
+          f"· 服务端 {report['server']}")
+    print()
+    print(f"{'完成/失败':<14}{s['completed']}/{s['failed']}   总耗时 {s['wall_s']:.2f} s")
+    print(f"{'tasks/min':<14}{s['tasks_per_min']:.1f}")
+    print(f"{'吞吐':<14}{s['mib_per_s']:.1f} MiB/s")
+    print(f"{'任务延迟':<14}P50 {s['latency_p50']:.2f} s · P99 {s['latency_p99']:.2f} s（含排队）")
+    print(f"{'执行耗时':<14}P50 {s['run_p50']:.2f} s · P99 {s['run_p99']:.2f} s")
+    children = s["children_peak_rss_mib"]
+    print(f"{'峰值 RSS':<14}{s['peak_rss_mib']:.0f} MiB" + (f"（下载子进程 {children:.0f} MiB）" if children else ""))
+    print()
+    print(f"{'阶段':<16}{'任务数':>8}{'P50(ms)':>10}{'P99(ms)':>10}")
+    for stage, row in report["stages"].items():
+        print(f"{stage:<16}{row['count']:>8}{row['p50'] * 1000:>10.1f}{row['p99'] * 1000:>10.1f}")
+    print()
+    for kind, row in report["kinds"].items():
+        print(f"{kind:<8}完成 {row['completed']:>4} · 执行 P50 {row['run_p50']:.2f} s")
+    for error in report["errors"]:
+        print(f"失败示例: {error}")
+
+
+def _print_comparison(report: dict, baseline: dict) -> None:
+    print()
+    print(f"对比 baseline（commit {baseline.get('commit') or '-'}）")
+    differing = sorted(k for k, v in report["params"].items() if baseline.get("params", {}).get(k) != v)
+    if baseline.get("media") != report["media"]:
+        differing.append("media")
+    if differing:
+        print(f"注意：参数不同，结果不可直接比较: {', '.join(differing)}")
+    for key, label, higher_is_better in _COMPARED:
+        old, new = baseline.get("summary", {}).get(key), report["summary"][key]
+        if not old:
+            continue
+        change = (new - old) / old * 100
+        worse = change < 0 if higher_is_better else change > 0
+        mark = "  ← 回退" if worse and abs(change) >= 5 else ""
+        print(f"{label:<16}{old:>10.2f} → {new:>10.2f} ({change:+.1f}%){mark}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="逗号分隔，mp4 / hls / dash 轮流分配")
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--duration", type=int, default=20, help="媒体时长（秒），决定 HLS / DASH 分片数")
+    parser.add_argument("--bandwidth", default="0", help="每个连接的带宽上限，如 20M，0 为不限")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--engine", choices=("thread", "process"), default="thread")
+    parser.add_argument("--progress-interval", type=float, default=0.5)
+    parser.add_argument("--dedup", action="store_true", help="开启去重存储（下载后入库计算 sha256）")
+    parser.add_argument("--warmup", type=int, default=1, help="每种媒体先跑几个不计时的任务（导入 / 进程池启动）")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="把结果写入该文件")
+    parser.add_argument("--baseline", help="与之前 --json 写出的结果对比")
+    args = parser.parse_args()
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    if not kinds or any(k not in KINDS for k in kinds):
+        parser.error(f"--kinds 只能取 {', '.join(KINDS)}")
+
+    with tempfile.TemporaryDirectory(prefix="splazdl-bench-") as tmp:
+        root = Path(tmp)
+        (root / "media").mkdir()
+        media = generate_media(root / "media", args.size_mb, args.duration, args.seed)
+        _configure(args, root / "downloads")
+
+        # 预热不注入错误、不限速
+        server = MediaServer(root / "media", seed=args.seed).start()
+        try:
+            with _stdout_to(root / "yt-dlp.log"):
+                if args.warmup:
+                    _run_batch(server, kinds, args.warmup * len(kinds), "warmup", args.timeout)
+                server.bandwidth = parse_bandwidth(args.bandwidth)
+                server.latency = args.latency_ms / 1000
+                server.error_rate = args.error_rate
+                for key in server.stats:
+                    server.stats[key] = 0
+
+                results = _run_batch(server, kinds, args.tasks, "task", args.timeout)
+                wall = max(r["latency"] for r in results)
+        finally:
+            downloader.close_process_engine()
+            server.close()
+
+    report = {
+        "commit": _git_commit(),
+        "media": media,
+        "params": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "server": dict(server.stats),
+        **_summarize(results, wall),
+        "errors": sorted({f"[{r['kind']}] {r['error'][:200]}" for r in results if r["status"] != "completed"})[:5],
+    }
+    report["summary"]["peak_rss_mib"], report["summary"]["children_peak_rss_mib"] = _peak_rss_mib(args.engine)
+
+    _print_report(report)
+    if args.baseline:
+        _print_comparison(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0 if report["summary"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+/download/{task_id} 文件下发基准：吞吐量与每 GB 服务端 CPU 时间
+
+用法: python benchmarks/bench_file_serving.py [--size-mb 512] [--repeat 3]
+
+在本进程内用 uvicorn 起一个只含下载路由的服务，客户端用 curl 子进程拉取，
+因此本进程的 CPU 时间即服务端开销。对比 Starlette 默认 FileResponse（64 KiB 分块）
+与 file_serving.serve_file（1 MiB 分块、ETag/304、Range），并测量 304 与 Range 请求。
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import uvicorn  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import FileResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from file_serving import serve_file  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(path: Path) -> tuple[uvicorn.Server, int]:
+    app = Starlette(routes=[
+        Route("/baseline", lambda request: FileResponse(str(path), filename=path.name)),
+        Route("/download", lambda request: serve_file(request, path, path.name)),
+    ])
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, port
+
+
+def _curl(url: str, *headers: str) -> str:
+    args = ["curl", "-s", "-o", os.devnull, "-w", "%{http_code} %{size_download}", url]
+    for h in headers:
+        args += ["-H", h]
+    return subprocess.run(args, check=True, capture_output=True, text=True).stdout
+
+
+def _measure(url: str, repeat: int, *headers: str) -> tuple[float, float, str]:
+    wall = cpu = 0.0
+    result = ""
+    for _ in range(repeat):
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        result = _curl(url, *headers)
+        wall += time.perf_counter() - t0
+        cpu += time.process_time() - cpu0
+    return wall / repeat, cpu / repeat, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "media.mp4"
+        block = os.urandom(1024 * 1024)
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(block)
+        gb = args.size_mb / 1024
+
+        server, port = _start_server(path)
+        base = f"http://127.0.0.1:{port}"
+        etag = subprocess.run(
+            ["curl", "-sI", f"{base}/download"], capture_output=True, text=True, check=True,
+        ).stdout.lower().split("etag: ", 1)[1].split()[0]
+
+        print(f"文件 {args.size_mb} MiB，每项取 {args.repeat} 次平均")
+        print(f"{'场景':<28}{'耗时(s)':>10}{'吞吐(MB/s)':>14}{'CPU(s)/GB':>12}  结果")
+        for label, url, headers, size_gb in [
+            ("FileResponse 64KiB (基线)", f"{base}/baseline", (), gb),
+            ("serve_file 1MiB", f"{base}/download", (), gb),
+            ("serve_file Range 后半段", f"{base}/download", (f"Range: bytes={args.size_mb * 512 * 1024}-",), gb / 2),
+            ("serve_file If-None-Match", f"{base}/download", (f"If-None-Match: {etag}",), 0),
+        ]:
+            wall, cpu, result = _measure(url, args.repeat, *headers)
+            throughput = f"{size_gb * 1024 / wall:.0f}" if size_gb else "-"
+            cpu_per_gb = f"{cpu / size_gb:.2f}" if size_gb else f"{cpu * 1000:.2f}ms"
+            print(f"{label:<28}{wall:>10.3f}{throughput:>14}{cpu_per_gb:>12}  {result}")
+
+        server.should_exit = True
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
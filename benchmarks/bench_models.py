@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+models 查询微基准：线性扫描 vs 二级索引
+
+用法: python benchmarks/bench_models.py [--tasks 100000] [--users 50]
+
+线性扫描基线复刻了加索引之前 models 的实现（持锁遍历全部任务），
+索引版本直接使用 MemoryTaskStore，两者在同一批任务上对比页面定时器的三类查询。
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import DownloadTask  # noqa: E402
+from task_store import MemoryTaskStore  # noqa: E402
+
+
+class ScanBaseline:
+    """加索引之前的查询实现"""
+
+    def __init__(self, tasks: dict[str, DownloadTask]):
+        self._tasks = tasks
+        self._lock = threading.Lock()
+
+    def list_tasks(self, username=None, status=None):
+        with self._lock:
+            tasks = self._tasks.values()
+            if username:
+                tasks = [t for t in tasks if t.username == username]
+            if status:
+                tasks = [t for t in tasks if t.status == status]
+            return list(tasks)
+
+    def existing_urls(self, username=None):
+        with self._lock:
+            if username:
+                return {t.url for t in self._tasks.values() if t.username == username}
+            return {t.url for t in self._tasks.values()}
+
+
+def _timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    statuses = [
+        DownloadTask.STATUS_COMPLETED,
+        DownloadTask.STATUS_COMPLETED,
+        DownloadTask.STATUS_COMPLETED,
+        DownloadTask.STATUS_FAILED,
+        DownloadTask.STATUS_PENDING,
+    ]
+    store = MemoryTaskStore()
+    for i in range(args.tasks):
+        username = f"user{rng.randrange(args.users)}"
+        task = store.add(DownloadTask(task_id=f"{i:08x}", username=username, url=f"https://example.com/v/{i}"))
+        task.status = rng.choice(statuses)
+        store.on_task_changed(task, "status", DownloadTask.STATUS_PENDING)
+    baseline = ScanBaseline(store._tasks)
+
+    target = "user7"
+    cases = [
+        ("get_user_tasks(user)", lambda s: s.list_tasks(username=target)),
+        ("get_completed_tasks(user)", lambda s: s.list_tasks(username=target, status=DownloadTask.STATUS_COMPLETED)),
+        ("get_existing_urls(user)", lambda s: s.existing_urls(target)),
+        ("list pending (all users)", lambda s: s.list_tasks(status=DownloadTask.STATUS_PENDING)),
+    ]
+
+    print(f"tasks={args.tasks} users={args.users} repeat={args.repeat} (best of, ms)")
+    print(f"{'query':<30}{'scan':>10}{'indexed':>10}{'speedup':>10}{'rows':>8}")
+    for name, query in cases:
+        rows = query(store)
+        rows_len = len(rows)
+        assert rows_len == len(query(baseline))
+        scan = _timeit(lambda query=query: query(baseline), args.repeat) * 1000
+        indexed = _timeit(lambda query=query: query(store), args.repeat) * 1000
+        print(f"{name:<30}{scan:>10.3f}{indexed:>10.3f}{scan / indexed:>9.1f}x{rows_len:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
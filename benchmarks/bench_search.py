@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+任务关键词搜索基准：逐个任务子串扫描 vs TaskSearchIndex
+
+用法: python benchmarks/bench_search.py [--tasks 50000] [--repeat 20]
+
+扫描基线复刻了原先页面筛选的做法（对每个任务的 标题 / 链接 / 任务 ID 做 lower() 后子串匹配），
+索引版本使用 models.TaskSearchIndex，两者在同一批中英文混合标题上对比结果与耗时。
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import DownloadTask, TaskSearchIndex  # noqa: E402
+
+_WORDS = ["猫咪", "小狗", "日常", "教程", "合集", "旅行", "美食", "音乐", "直播", "回放", "新闻", "体育",
+          "vlog", "tutorial", "music", "live", "highlights", "python", "review", "trailer"]
+
+
+def _scan(tasks: list[DownloadTask], keyword: str, status: str | None) -> set[str]:
+    keyword = keyword.lower()
+    return {
+        t.task_id for t in tasks
+        if (status is None or t.status == status)
+        and (keyword in (t.title or "").lower() or keyword in (t.url or "").lower() or keyword in t.task_id.lower())
+    }
+
+
+def _timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # 汉字按齐夫分布取，模拟真实标题里常用字反复出现、生僻字少见
+    chars = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(chars))))
+    statuses = [DownloadTask.STATUS_COMPLETED] * 3 + [DownloadTask.STATUS_FAILED, DownloadTask.STATUS_PENDING]
+    tasks = []
+    for i in range(args.tasks):
+        title = "".join(
+            rng.choice(_WORDS) if rng.random() < 0.3 else "".join(rng.choices(chars, cum_weights=cum_weights, k=2))
+            for _ in range(rng.randint(3, 8))
+        )
+        tasks.append(DownloadTask(
+            task_id=f"{rng.getrandbits(32):08x}",
+            username=f"user{i % 20}",
+            url=f"https://www.douyin.com/video/{rng.getrandbits(60)}",
+            title=title,
+            status=rng.choice(statuses),
+        ))
+
+    index = TaskSearchIndex()
+    start = time.perf_counter()
+    index.ensure(lambda: [(t.task_id, t.username, t.status, t.title, t.url) for t in tasks])
+    build = time.perf_counter() - start
+
+    cases = [
+        ("猫咪", None),
+        ("教程", DownloadTask.STATUS_COMPLETED),
+        ("vlog", None),
+        ("Python", DownloadTask.STATUS_FAILED),
+        ("highlights", None),
+        (tasks[123].task_id, None),
+        ("video/12345", None),
+        (tasks[7].title[:3], None),
+    ]
+
+    print(f"tasks={args.tasks} repeat={args.repeat} (best of, ms); index build {build * 1000:.0f} ms, "
+          f"{len(index._postings)} bigrams, {index._entries} postings")
+    print(f"{'keyword':<20}{'status':<12}{'scan':>10}{'indexed':>10}{'speedup':>10}{'rows':>8}")
+    for keyword, status in cases:
+        rows = index.search(keyword, status=status)
+        assert rows == _scan(tasks, keyword, status)
+        scan = _timeit(lambda keyword=keyword, status=status: _scan(tasks, keyword, status), args.repeat) * 1000
+        indexed = _timeit(
+            lambda keyword=keyword, status=status: index.search(keyword, status=status), args.repeat,
+        ) * 1000
+        print(f"{keyword:<20}{status or '-':<12}{scan:>10.3f}{indexed:>10.3f}{scan / indexed:>9.1f}x{len(rows):>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+页面负载测试：大量模拟浏览器同时打开 / 与 /upload，测服务端在页面定时刷新下的开销
+
+用法: python benchmarks/bench_ui_load.py [--clients 50] [--upload-share 0.2] [--tasks 5000] [--store memory]
+                                         [--duration 20] [--touch-interval 3] [--live 8]
+                                         [--json result.json] [--baseline previous.json]
+
+服务端由 benchmarks/ui_server.py 在子进程中启动（预置任务库，不下载）。每个模拟客户端与浏览器
+走同一条路：GET 页面拿到 NiceGUI 的 client_id，再以 websocket 连上 /_nicegui_ws/socket.io
+（隐式握手），之后定时回 ack；不执行页面里的 JS。
+
+预热后进入统计窗口：每 --touch-interval 秒推进一次下载中任务的进度（任务表首页的那些行），
+各主页客户端记录此后收到第一条 update / run_javascript 的时刻，作为刷新延迟（页面定时器
+间隔 2 秒，延迟上限约为 2 秒加推送耗时）。
+
+报告：建连耗时（页面 GET / websocket 握手）、服务端 CPU（单核 = 100%）与 RSS、事件循环延迟
+（服务端每 50 ms 采样一次的唤醒误差）、websocket 下行（socket.io 事件载荷的 JSON 字节数，
+不含帧头）、刷新延迟 P50/P99。模拟客户端都在本进程的一个事件循环里，客户端很多时本进程
+自身也会变慢，刷新延迟会偏大；--json / --baseline 与 bench_e2e.py 相同，用于跨 commit 对比。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import aiohttp
+import socketio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import timings  # noqa: E402
+
+_SERVER = Path(__file__).resolve().parent / "ui_server.py"
+# 页面里 socket.io 的连接参数
+_CLIENT_ID = re.compile(r"""["']client_id["']\s*:\s*["']([0-9a-f-]+)["']""")
+_NEXT_MESSAGE_ID = re.compile(r"""["']next_message_id["']\s*:\s*(\d+)""")
+_REFRESH_EVENTS = ("update", "run_javascript")
+_ACK_INTERVAL = 3.0  # 与 nicegui.js 一致
+# --baseline 对比的指标：(键, 标签, 越大越好)
+_COMPARED = [
+    ("server_cpu_pct", "服务端 CPU(%)", False),
+    ("loop_lag_p99_ms", "循环延迟 P99(ms)", False),
+    ("ws_kib_per_s", "下行(KiB/s)", False),
+    ("refresh_p50_ms", "刷新 P50(ms)", False),
+    ("refresh_p99_ms", "刷新 P99(ms)", False),
+    ("page_p99_ms", "页面 GET P99(ms)", False),
+    ("server_rss_mib", "服务端 RSS(MiB)", False),
+]
+
+
+def _percentile(values: list[float], p: float) -> float:
+    return timings.percentile(sorted(values), p) if values else 0.0
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SimClient:
+    """一个模拟浏览器标签页"""
+
+    def __init__(self, base_url: str, path: str):
+        self.base_url = base_url
+        self.path = path
+        self.client_id = ""
+        self.next_message_id = 0
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on("*", self._on_event)
+        self.page_ms = 0.0
+        self.connect_ms = 0.0
+        self.error = ""
+        self.bytes = 0
+        self.messages = 0
+        self.refreshed_at = 0.0  # 最近一次 touch 之后第一次收到刷新的时刻
+        self._ack_task: asyncio.Task | None = None
+
+    async def _on_event(self, event: str, data=None) -> None:
+        self.bytes += len(event) + len(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode())
+        self.messages += 1
+        if isinstance(data, dict) and "_id" in data:
+            self.next_message_id = data["_id"] + 1
+        if event in _REFRESH_EVENTS and not self.refreshed_at:
+            self.refreshed_at = time.time()
+
+    async def open(self, session: aiohttp.ClientSession) -> None:
+        try:
+            start = time.perf_counter()
+            async with session.get(self.base_url + self.path) as resp:
+                page = await resp.text()
+                resp.raise_for_status()
+            self.page_ms = (time.perf_counter() - start) * 1000
+            match = _CLIENT_ID.search(page)
+            if not match:
+                raise RuntimeError("页面中没有 client_id")
+            self.client_id = match.group(1)
+            next_id = _NEXT_MESSAGE_ID.search(page)
+            self.next_message_id = int(next_id.group(1)) if next_id else 0
+            query = (
+                f"client_id={self.client_id}&next_message_id={self.next_message_id}&implicit_handshake=true"
+                f"&tab_id={uuid.uuid4()}&document_id={uuid.uuid4()}"
+            )
+            start = time.perf_counter()
+            await self.sio.connect(
+                f"{self.base_url}?{query}", socketio_path="/_nicegui_ws/socket.io",
+                transports=["websocket"], wait_timeout=30,
+            )
+            self.connect_ms = (time.perf_counter() - start) * 1000
+            self._ack_task = asyncio.create_task(self._ack_loop())
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"[:200]
+
+    async def _ack_loop(self) -> None:
+        while self.sio.connected:
+            await asyncio.sleep(_ACK_INTERVAL)
+            if self.sio.connected:
+                await self.sio.emit("ack", {"client_id": self.client_id, "next_message_id": self.next_message_id})
+
+    async def close(self) -> None:
+        if self._ack_task:
+            self._ack_task.cancel()
+        if self.sio.connected:
+            await self.sio.disconnect()
+
+
+def _start_server(args: argparse.Namespace, port: int, log_path: Path) -> subprocess.Popen:
+    cmd = [
+        sys.executable, str(_SERVER), "--port", str(port), "--tasks", str(args.tasks), "--users", str(args.users),
+        "--store", args.store, "--live", str(args.live), "--seed", str(args.seed),
+    ]
+    with open(log_path, "ab") as log:
+        return subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(session: aiohttp.ClientSession, base_url: str, server: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"页面服务已退出（返回码 {server.returncode}）")
+        try:
+            async with session.get(f"{base_url}/_bench/stats") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("页面服务启动超时")
+
+
+async def _stats(session: aiohttp.ClientSession, base_url: str) -> dict:
+    async with session.get(f"{base_url}/_bench/stats") as resp:
+        return await resp.json()
+
+
+async def _run(args: argparse.Namespace, base_url: str, server: subprocess.Popen) -> dict:
+    rng = random.Random(args.seed)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await _wait_ready(session, base_url, server, args.startup_timeout)
+
+        upload_count = round(args.clients * args.upload_share)
+        paths = ["/upload"] * upload_count + ["/"] * (args.clients - upload_count)
+        rng.shuffle(paths)
+        clients = [SimClient(base_url, path) for path in paths]
+        gate = asyncio.Semaphore(args.connect_concurrency)
+
+        async def open_client(client: SimClient) -> None:
+            async with gate:
+                await client.open(session)
+
+        ramp_start = time.perf_counter()
+        await asyncio.gather(*(open_client(c) for c in clients))
+        ramp_s = time.perf_counter() - ramp_start
+        connected = [c for c in clients if not c.error]
+        main_clients = [c for c in connected if c.path == "/"]
+
+        # 等首屏推送与连接处理平息后再开始计数
+        await asyncio.sleep(args.settle)
+        for client in connected:
+            client.bytes = client.messages = 0
+        async with session.post(f"{base_url}/_bench/reset"):
+            pass
+        before = await _stats(session, base_url)
+        window_start = time.perf_counter()
+
+        refresh_ms: list[float] = []
+        missed = 0
+        touches = 0
+        while time.perf_counter() - window_start < args.duration:
+            for client in main_clients:
+                client.refreshed_at = 0.0
+            async with session.post(f"{base_url}/_bench/touch") as resp:
+                changed_at = (await resp.json())["changed_at"]
+            touches += 1
+            await asyncio.sleep(args.touch_interval)
+            for client in main_clients:
+                if client.refreshed_at >= changed_at:
+                    refresh_ms.append((client.refreshed_at - changed_at) * 1000)
+                else:
+                    missed += 1
+
+        window_s = time.perf_counter() - window_start
+        after = await _stats(session, base_url)
+        await asyncio.gather(*(c.close() for c in clients))
+
+    ws_bytes = sum(c.bytes for c in connected)
+    cpu_s = after["cpu_s"] - before["cpu_s"]
+    wall_s = after["monotonic"] - before["monotonic"]
+    lag = after["loop_lag_ms"]
+    page_ms = [c.page_ms for c in connected]
+    connect_ms = [c.connect_ms for c in connected]
+    return {
+        "summary": {
+            "clients": len(clients),
+            "connected": len(connected),
+            "failed": len(clients) - len(connected),
+            "main_clients": len(main_clients),
+            "server_sockets": after["clients"],
+            "ramp_s": round(ramp_s, 3),
+            "page_p50_ms": round(_percentile(page_ms, 50), 1),
+            "page_p99_ms": round(_percentile(page_ms, 99), 1),
+            "connect_p50_ms": round(_percentile(connect_ms, 50), 1),
+            "connect_p99_ms": round(_percentile(connect_ms, 99), 1),
+            "window_s": round(window_s, 3),
+            "server_cpu_pct": round(cpu_s / wall_s * 100, 1) if wall_s else 0.0,
+            "server_rss_mib": after["rss_mib"],
+            "loop_lag_p50_ms": lag["p50"],
+            "loop_lag_p99_ms": lag["p99"],
+            "loop_lag_max_ms": lag["max"],
+            "ws_kib_per_s": round(ws_bytes / 1024 / window_s, 2) if window_s else 0.0,
+            "ws_bytes_per_client_s": round(ws_bytes / len(connected) / window_s, 1) if connected and window_s else 0.0,
+            "ws_msgs_per_s": round(sum(c.messages for c in connected) / window_s, 1) if window_s else 0.0,
+            "touches": touches,
+            "refresh_p50_ms": round(_percentile(refresh_ms, 50), 1),
+            "refresh_p99_ms": round(_percentile(refresh_ms, 99), 1),
+            "refresh_max_ms": round(max(refresh_ms, default=0.0), 1),
+            "refresh_missed": missed,
+        },
+        "errors": sorted({c.error for c in clients if c.error})[:5],
+    }
+
+
+def _print_report(report: dict) -> None:
+    s = report["summary"]
+    p = report["params"]
+    print(f"commit {report['commit'] or '-'} · {p['clients']} 个客户端（/upload 占 {p['upload_share']:.0%}）"
+          f" · {p['tasks']} 个任务（{p['store']}）· 统计窗口 {s['window_s']:.1f} s")
+    print()
+    print(f"{'已连接/失败':<14}{s['connected']}/{s['failed']}   服务端在线 {s['server_sockets']} · 建连总耗时 {s['ramp_s']:.2f} s")
+    print(f"{'页面 GET':<14}P50 {s['page_p50_ms']:.1f} ms · P99 {s['page_p99_ms']:.1f} ms")
+    print(f"{'websocket 握手':<14}P50 {s['connect_p50_ms']:.1f} ms · P99 {s['connect_p99_ms']:.1f} ms")
+    print(f"{'服务端 CPU':<14}{s['server_cpu_pct']:.1f}%（单核 = 100%）· RSS {s['server_rss_mib']:.0f} MiB")
+    print(f"{'事件循环延迟':<14}P50 {s['loop_lag_p50_ms']:.2f} ms · P99 {s['loop_lag_p99_ms']:.2f} ms"
+          f" · 最大 {s['loop_lag_max_ms']:.1f} ms")
+    print(f"{'websocket 下行':<14}{s['ws_kib_per_s']:.1f} KiB/s · 每客户端 {s['ws_bytes_per_client_s']:.0f} B/s"
+          f" · {s['ws_msgs_per_s']:.1f} 条/s")
+    print(f"{'刷新延迟':<14}P50 {s['refresh_p50_ms']:.0f} ms · P99 {s['refresh_p99_ms']:.0f} ms"
+          f" · 最大 {s['refresh_max_ms']:.0f} ms（{s['touches']} 次变更 × {s['main_clients']} 个主页，"
+          f"未收到 {s['refresh_missed']}）")
+    for error in report["errors"]:
+        print(f"失败示例: {error}")
+
+
+def _print_comparison(report: dict, baseline: dict) -> None:
+    print()
+    print(f"对比 baseline（commit {baseline.get('commit') or '-'}）")
+    differing = sorted(k for k, v in report["params"].items() if baseline.get("params", {}).get(k) != v)
+    if differing:
+        print(f"注意：参数不同，结果不可直接比较: {', '.join(differing)}")
+    for key, label, higher_is_better in _COMPARED:
+        old, new = baseline.get("summary", {}).get(key), report["summary"][key]
+        if not old:
+            continue
+        change = (new - old) / old * 100
+        worse = change < 0 if higher_is_better else change > 0
+        mark = "  ← 回退" if worse and abs(change) >= 5 else ""
+        print(f"{label:<18}{old:>10.2f} → {new:>10.2f} ({change:+.1f}%){mark}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--upload-share", type=float, default=0.2, help="打开 /upload 的客户端比例，其余打开 /")
+    parser.add_argument("--tasks", type=int, default=5000, help="预置任务数")
+    parser.add_argument("--users", type=int, default=5, help="任务分属的用户数")
+    parser.add_argument("--store", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--live", type=int, default=8, help="每次变更推进的下载中任务数（任务表首页）")
+    parser.add_argument("--duration", type=float, default=20, help="统计窗口（秒）")
+    parser.add_argument("--touch-interval", type=float, default=3.0, help="两次变更的间隔（秒），应大于页面定时器的 2 秒")
+    parser.add_argument("--connect-concurrency", type=int, default=20, help="同时建连的客户端数")
+    parser.add_argument("--settle", type=float, default=3.0, help="全部连上后等待多久再开始统计（秒）")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="把结果写入该文件")
+    parser.add_argument("--baseline", help="与之前 --json 写出的结果对比")
+    args = parser.parse_args()
+    if args.clients < 1 or not 0 <= args.upload_share <= 1:
+        parser.error("--clients 至少为 1，--upload-share 取 0 ~ 1")
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory(prefix="splazdl-bench-") as tmp:
+        log_path = Path(tmp) / "ui_server.log"
+        server = _start_server(args, port, log_path)
+        try:
+            result = asyncio.run(_run(args, f"http://127.0.0.1:{port}", server))
+        except RuntimeError as e:
+            print(f"✗ {e}")
+            print(log_path.read_text(encoding="utf-8", errors="replace")[-2000:])
+            return 1
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report = {
+        "commit": _git_commit(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "startup_timeout")},
+        **result,
+    }
+    _print_report(report)
+    if args.baseline:
+        _print_comparison(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0 if report["summary"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+离线媒体服务器：给端到端基准提供 MP4 / HLS / DASH，可配置带宽、延迟与错误注入
+
+用法: python benchmarks/media_server.py [--port 8765] [--size-mb 4] [--bandwidth 20M] [--latency-ms 50] [--error-rate 0.02]
+
+链接形如 /<kind>/<name>/<file>，<name> 任意，入口为 /mp4/<name>/<name>.mp4、
+/hls/<name>/<name>.m3u8、/dash/<name>/<name>.mpd。<name> 同时是 yt-dlp 通用解析器给出的
+视频 ID，每个任务用不同的 <name> 就不会命中元数据缓存或去重存储。
+
+媒体内容在启动时生成到临时目录：本机有 ffmpeg 时用 testsrc 编码真实音视频（HLS 会触发
+yt-dlp 的 MPEG-TS 修复，DASH 音视频分开、会触发合并），否则生成按种子固定的合成字节
+（MP4 单文件 / HLS TS 分片 / DASH 单个复用表示，均无需 ffmpeg 后处理）。
+
+- 带宽：每个连接单独限速（字节/秒），0 为不限
+- 延迟：每个请求在返回响应头前等待
+- 错误注入：媒体与分片请求按比例随机返回 503 或在发送一半后断开连接（清单不注入）
+"""
+
+import argparse
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+KINDS = ("mp4", "hls", "dash")
+ENTRY_FILES = {"mp4": "video.mp4", "hls": "index.m3u8", "dash": "manifest.mpd"}
+
+_CONTENT_TYPES = {
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".mpd": "application/dash+xml",
+    ".m4s": "video/iso.segment",
+}
+_MANIFESTS = (".m3u8", ".mpd")
+_CHUNK = 64 * 1024
+_SEGMENT_SECONDS = 4
+_MB = 1024 * 1024
+
+
+def _random_bytes(rng: random.Random, size: int) -> bytes:
+    return rng.getrandbits(size * 8).to_bytes(size, "little") if size else b""
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return (8 + len(payload)).to_bytes(4, "big") + kind + payload
+
+
+def _write_synthetic(root: Path, size: int, duration: int, seed: int) -> None:
+    rng = random.Random(seed)
+    segments = max(1, duration // _SEGMENT_SECONDS)
+    seg_size = max(188, size // segments // 188 * 188)
+
+    mp4 = root / "mp4"
+    mp4.mkdir(parents=True)
+    ftyp = _box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+    (mp4 / "video.mp4").write_bytes(ftyp + _box(b"mdat", _random_bytes(rng, size - len(ftyp) - 8)))
+
+    hls = root / "hls"
+    hls.mkdir()
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{_SEGMENT_SECONDS}",
+             "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD"]
+    for i in range(segments):
+        segment = bytearray(_random_bytes(rng, seg_size))
+        segment[::188] = b"\x47" * len(segment[::188])  # TS 同步字节
+        (hls / f"seg{i}.ts").write_bytes(segment)
+        lines += [f"#EXTINF:{_SEGMENT_SECONDS}.0,", f"seg{i}.ts"]
+    (hls / "index.m3u8").write_text("\n".join(lines + ["#EXT-X-ENDLIST", ""]))
+
+    dash = root / "dash"
+    dash.mkdir()
+    (dash / "init.mp4").write_bytes(ftyp + _box(b"moov", _random_bytes(rng, 1024)))
+    for i in range(1, segments + 1):
+        (dash / f"seg{i}.m4s").write_bytes(_box(b"moof", b"") + _box(b"mdat", _random_bytes(rng, seg_size - 16)))
+    bandwidth = size * 8 // (segments * _SEGMENT_SECONDS)
+    (dash / "manifest.mpd").write_text(f"""<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT2S"
+     mediaPresentationDuration="PT{segments * _SEGMENT_SECONDS}S" profiles="urn:mpeg:dash:profile:isoff-live:2011">
+  <Period id="0" start="PT0S">
+    <AdaptationSet mimeType="video/mp4" segmentAlignment="true">
+      <Representation id="muxed" bandwidth="{bandwidth}" codecs="avc1.4d401f,mp4a.40.2" width="1280" height="720">
+        <SegmentTemplate timescale="1" duration="{_SEGMENT_SECONDS}" startNumber="1"
+                         initialization="init.mp4" media="seg$Number$.m4s"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+""")
+
+
+def _write_ffmpeg(root: Path, size: int, duration: int) -> None:
+    def ffmpeg(*args: str, cwd: Path) -> None:
+        subprocess.run(["ffmpeg", "-v", "error", "-y", *args], cwd=cwd, check=True)
+
+    for kind in KINDS:
+        (root / kind).mkdir(parents=True)
+    video_bitrate = max(100_000, size * 8 // duration - 128_000)
+    ffmpeg(
+        "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration), "-c:v", "mpeg4", "-b:v", str(video_bitrate), "-c:a", "aac", "-b:a", "128k",
+        "video.mp4", cwd=root / "mp4",
+    )
+    source = str(root / "mp4" / "video.mp4")
+    ffmpeg("-i", source, "-c", "copy", "-f", "hls", "-hls_time", str(_SEGMENT_SECONDS),
+           "-hls_playlist_type", "vod", "-hls_segment_filename", "seg%d.ts", "index.m3u8", cwd=root / "hls")
+    ffmpeg("-i", source, "-c", "copy", "-f", "dash", "-seg_duration", str(_SEGMENT_SECONDS),
+           "-adaptation_sets", "id=0,streams=v id=1,streams=a",
+           "-init_seg_name", "init-$RepresentationID$.m4s",
+           "-media_seg_name", "seg-$RepresentationID$-$Number$.m4s", "manifest.mpd", cwd=root / "dash")
+
+
+def generate_media(root: Path, size_mb: float = 4, duration: int = 20, seed: int = 1) -> str:
+    """在 root 下生成三种媒体，返回使用的方式（"ffmpeg" / "synthetic"）"""
+    size = int(size_mb * _MB)
+    if shutil.which("ffmpeg"):
+        _write_ffmpeg(root, size, duration)
+        return "ffmpeg"
+    _write_synthetic(root, size, duration, seed)
+    return "synthetic"
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端中途断开（探测直链只读开头、错误注入截断后重连）属于正常情况
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MediaServer:
+    """在后台线程中运行的媒体服务器"""
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        port: int = 0,
+        bandwidth: float = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 1,
+    ):
+        self.root = root
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes_sent": 0, "errors_503": 0, "errors_truncated": 0}
+        self._httpd = _QuietHTTPServer(("127.0.0.1", port), _make_handler(self))
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="media-server", daemon=True)
+
+    def url(self, kind: str, name: str) -> str:
+        entry = ENTRY_FILES[kind]
+        return f"http://127.0.0.1:{self.port}/{kind}/{name}/{name}{Path(entry).suffix}"
+
+    def start(self) -> "MediaServer":
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def _inject(self) -> str:
+        """本次请求注入的错误：""、"503" 或 "truncated" """
+        if not self.error_rate:
+            return ""
+        with self._lock:
+            if self._rng.random() >= self.error_rate:
+                return ""
+            return "503" if self._rng.random() < 0.5 else "truncated"
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """只支持单段 bytes=start-[end]"""
+    if not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[6:].partition("-")
+    try:
+        start = int(start_text)
+        end = min(int(end_text), size - 1) if end_text else size - 1
+    except ValueError:
+        return None
+    return (start, end) if start <= end else None
+
+
+def _make_handler(server: MediaServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+        def do_GET(self):
+            server._count("requests")
+            if server.latency:
+                time.sleep(server.latency)
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            if len(parts) != 3 or parts[0] not in KINDS or ".." in parts[2]:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            entry = ENTRY_FILES[parts[0]]
+            path = server.root / parts[0] / (entry if parts[2].endswith(Path(entry).suffix) else parts[2])
+            if not path.is_file():
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+
+            injected = "" if path.suffix in _MANIFESTS else server._inject()
+            if injected == "503":
+                server._count("errors_503")
+                self.send_error(HTTPStatus.SERVICE_UNAVAILABLE)
+                return
+
+            size = path.stat().st_size
+            start, end = 0, size - 1
+            status = HTTPStatus.OK
+            if self.headers.get("Range"):
+                byte_range = _parse_range(self.headers["Range"], size)
+                if byte_range is None:
+                    self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    return
+                start, end = byte_range
+                status = HTTPStatus.PARTIAL_CONTENT
+            length = end - start + 1
+
+            self.send_response(status)
+            self.send_header("Content-Type", _CONTENT_TYPES.get(path.suffix, "application/octet-stream"))
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+
+            if injected == "truncated":
+                server._count("errors_truncated")
+                length //= 2
+                self.close_connection = True
+            self._send_body(path, start, length)
+
+        def _send_body(self, path: Path, start: int, length: int) -> None:
+            began = time.monotonic()
+            sent = 0
+            try:
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    while sent < length:
+                        chunk = f.read(min(_CHUNK, length - sent))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if server.bandwidth:
+                            ahead = sent / server.bandwidth - (time.monotonic() - began)
+                            if ahead > 0:
+                                time.sleep(ahead)
+            except ConnectionError:
+                self.close_connection = True
+            finally:
+                server._count("bytes_sent", sent)
+
+    return Handler
+
+
+def parse_bandwidth(text: str) -> float:
+    """"20M" / "512K" / "0" -> 字节/秒"""
+    text = (text or "0").strip().upper()
+    scale = {"K": 1024, "M": _MB, "G": 1024 * _MB}.get(text[-1:], 1)
+    return float(text.rstrip("KMG") or 0) * scale
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--duration", type=int, default=20, help="媒体时长（秒），决定分片数")
+    parser.add_argument("--bandwidth", default="0", help="每个连接的带宽上限，如 20M，0 为不限")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="splazdl-media-") as tmp:
+        mode = generate_media(Path(tmp), args.size_mb, args.duration, args.seed)
+        server = MediaServer(
+            Path(tmp), port=args.port, bandwidth=parse_bandwidth(args.bandwidth),
+            latency=args.latency_ms / 1000, error_rate=args.error_rate, seed=args.seed,
+        ).start()
+        print(f"媒体（{mode}）已生成，服务于 http://127.0.0.1:{server.port}")
+        for kind in KINDS:
+            print(f"  {server.url(kind, 'demo')}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
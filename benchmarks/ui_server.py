@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+页面负载测试用的 SplazDL 服务：预置任务库 + 探针接口，由 bench_ui_load.py 在子进程中启动
+
+用法: python benchmarks/ui_server.py [--port 7861] [--tasks 5000] [--users 5] [--store memory] [--live 8]
+
+与 app.main() 相同地注册 / 和 /upload 页面，但不读 config.yaml、不启动下载，任务库按种子
+预先生成。最早创建的 --live 个任务处于下载中（任务表默认按创建时间升序，首页就是它们），
+探针接口修改这些任务的进度，模拟下载进行时页面定时器要推送的变更。
+
+- GET  /_bench/stats  进程 CPU 时间、RSS、已连接页面数、事件循环延迟分位数（自上次 reset）
+- POST /_bench/reset  清空事件循环延迟样本
+- POST /_bench/touch  推进下载中任务的进度，返回变更时刻（time.time()）
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 先于 app / downloader（及其 load_dotenv）置空，保证压测不会连到 OSS / 飞书
+for _name in ("SPLAZDL_OSS_ENDPOINT", "SPLAZDL_FEISHU_WEBHOOK_URL"):
+    os.environ[_name] = ""
+
+import app as splazdl_app  # noqa: E402, F401  注册页面与路由
+import models  # noqa: E402
+import timings  # noqa: E402
+from config import AppConfig, DownloadConfig, ServerConfig, StorageConfig, UserConfig, set_config  # noqa: E402
+from models import DownloadTask  # noqa: E402
+from nicegui import Client, app, ui  # noqa: E402
+from task_store import MemoryTaskStore, SqliteTaskStore  # noqa: E402
+
+_MB = 1024 * 1024
+_WORDS = ["猫咪", "小狗", "日常", "教程", "合集", "旅行", "美食", "音乐", "直播", "回放", "新闻", "体育",
+          "vlog", "tutorial", "music", "live", "highlights", "python", "review", "trailer"]
+_SITES = ["www.douyin.com/video", "www.bilibili.com/video", "www.youtube.com/watch?v=", "v.qq.com/x/page"]
+# 其余任务的状态分布（权重）
+_STATUSES = {
+    DownloadTask.STATUS_COMPLETED: 70,
+    DownloadTask.STATUS_FAILED: 10,
+    DownloadTask.STATUS_PENDING: 10,
+    DownloadTask.STATUS_PAUSED: 10,
+}
+
+
+def seed_tasks(store, count: int, users: int, live: int, seed: int) -> list[DownloadTask]:
+    """按种子生成 count 个任务写入 store；返回最早的 live 个（下载中）任务"""
+    rng = random.Random(seed)
+    statuses, weights = zip(*_STATUSES.items())
+    origin = datetime.now() - timedelta(seconds=count)
+    live_tasks = []
+    for i in range(count):
+        status = DownloadTask.STATUS_DOWNLOADING if i < live else rng.choices(statuses, weights)[0]
+        total = rng.randint(5, 500) * _MB
+        task = DownloadTask(
+            task_id=f"{i:08x}",
+            username=f"user{i % users}",
+            url=f"https://{rng.choice(_SITES)}{rng.getrandbits(48):012x}",
+            title=" ".join(rng.sample(_WORDS, 3)) + f" #{i}",
+            status=status,
+            total_bytes=total,
+            file_size=total if status == DownloadTask.STATUS_COMPLETED else 0,
+            progress=100.0 if status == DownloadTask.STATUS_COMPLETED else 0.0,
+            error_msg="HTTP Error 403: Forbidden" if status == DownloadTask.STATUS_FAILED else "",
+            created_at=origin + timedelta(seconds=i),
+        )
+        store.add(task)
+        if i < live:
+            live_tasks.append(task)
+    store.flush()
+    return live_tasks
+
+
+class LoopLagProbe:
+    """每 interval 秒醒来一次，记录实际醒来时间比预期晚了多少（毫秒）"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append((time.perf_counter() - start - self.interval) * 1000)
+
+    def summary(self) -> dict:
+        values = sorted(self.samples)
+        if not values:
+            return {"count": 0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "count": len(values),
+            "p50": round(timings.percentile(values, 50), 3),
+            "p99": round(timings.percentile(values, 99), 3),
+            "max": round(values[-1], 3),
+        }
+
+
+def _rss_mib() -> float:
+    """当前 RSS；没有 /proc 时退回峰值"""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / _MB, 1)
+    except (OSError, ValueError, IndexError):
+        unit = 1 if sys.platform == "darwin" else 1024
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / _MB, 1)
+
+
+def install_probes(live_tasks: list[DownloadTask], lag_interval: float) -> None:
+    probe = LoopLagProbe(lag_interval)
+    rng = random.Random(0)
+
+    async def start_probe() -> None:
+        asyncio.create_task(probe.run())
+
+    app.on_startup(start_probe)
+
+    @app.get("/_bench/stats")
+    def bench_stats() -> dict:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return {
+            "cpu_s": usage.ru_utime + usage.ru_stime,
+            "monotonic": time.monotonic(),
+            "rss_mib": _rss_mib(),
+            "clients": sum(1 for c in Client.instances.values() if c.has_socket_connection),
+            "loop_lag_ms": probe.summary(),
+        }
+
+    @app.post("/_bench/reset")
+    def bench_reset() -> dict:
+        probe.samples.clear()
+        return {"ok": True}
+
+    @app.post("/_bench/touch")
+    def bench_touch() -> dict:
+        changed_at = time.time()
+        for task in live_tasks:
+            # 与下载进度回调写入的字段一致
+            task.downloaded_bytes = min(task.total_bytes, task.downloaded_bytes + rng.randint(1, 8) * _MB)
+            task.progress = round(task.downloaded_bytes / task.total_bytes * 100, 1)
+            task.speed = rng.uniform(1, 20) * _MB
+            task.eta = int((task.total_bytes - task.downloaded_bytes) / task.speed)
+            if task.downloaded_bytes >= task.total_bytes:
+                task.downloaded_bytes = 0
+        return {"changed_at": changed_at, "rows": len(live_tasks)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=5, help="任务分属的用户数（页面以管理员身份查看全部）")
+    parser.add_argument("--store", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--live", type=int, default=8, help="下载中的任务数（探针推进它们的进度）")
+    parser.add_argument("--lag-interval", type=float, default=0.05, help="事件循环延迟采样间隔（秒）")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="splazdl-ui-"))
+    set_config(AppConfig(
+        server=ServerConfig(host="127.0.0.1", port=args.port),
+        download=DownloadConfig(base_dir=str(tmp / "downloads")),
+        storage=StorageConfig(backend=args.store, path=str(tmp / "tasks.db")),
+        users=[UserConfig("bench", "bench", "admin")] + [UserConfig(f"user{i}", "bench") for i in range(args.users)],
+    ))
+    models.init_users()
+    store = SqliteTaskStore(str(tmp / "tasks.db")) if args.store == "sqlite" else MemoryTaskStore()
+    models.set_task_store(store)
+
+    start = time.perf_counter()
+    live_tasks = seed_tasks(store, args.tasks, max(1, args.users), min(args.live, args.tasks), args.seed)
+    print(f"已预置 {args.tasks} 个任务（{args.store}），耗时 {time.perf_counter() - start:.2f} s", flush=True)
+    threading.Thread(target=models.load_search_index, name="search-index", daemon=True).start()
+
+    install_probes(live_tasks, args.lag_interval)
+    app.on_shutdown(models.close_task_store)
+    app.on_shutdown(lambda: shutil.rmtree(tmp, ignore_errors=True))
+    ui.run(
+        host="127.0.0.1",
+        port=args.port,
+        reload=False,
+        show=False,
+        show_welcome_message=False,
+        storage_secret="splazdl-ui-bench",
+        title="SplazDL",
+    )
+    return 0
+
+
+if __name__ in {"__main__", "__mp_main__"}:
+    sys.exit(main())
@@ -23,6 +23,34 @@ class DownloadConfig:
     base_dir: str = "./downloads"
     max_concurrent: int = 3
     default_quality: str = "best"
+    info_cache_ttl: int = 300  # 元数据缓存有效期（秒），0 表示关闭
+    info_cache_size: int = 512  # 元数据缓存最大条目数（LRU 淘汰）
+    preview_concurrency: int = 8  # 批量预览并发探测数
+    preview_timeout: int = 30  # 单条链接预览超时（秒）
+    preview_max_urls: int = 500  # 单次批量预览最多链接数
+    bulk_threshold: int = 2  # 一次提交链接数达到该值时按“批量”优先级排队
+    user_weights: dict[str, int] = field(default_factory=dict)  # 公平调度权重，未配置的用户为 1
+    engine: Literal["thread", "process"] = "thread"  # 下载执行方式：线程 / 子进程池（绕开 GIL）
+    upload_concurrency: int = 2  # 上传/通知阶段的并发数，与下载并发互不占用
+    dedup: bool = True  # 相同媒体（任意用户）已下载过时硬链接复用，不再重复下载
+    progress_interval: float = 0.5  # 下载进度采样间隔（秒），yt-dlp 回调再频繁也只按此频率更新任务
+
+
+@dataclass
+class HostLimitConfig:
+    """单站点限流配置（0 表示不限制）"""
+    max_concurrent: int = 0  # 同站点同时下载数
+    max_probes: int = 0  # 同站点同时预览探测数，0 时沿用 max_concurrent
+    rate: float = 0.0  # 每秒允许发起的请求数（令牌桶，预览与下载共用）
+    burst: int = 1  # 令牌桶容量
+
+
+@dataclass
+class StorageConfig:
+    """任务存储配置"""
+    backend: Literal["memory", "sqlite"] = "sqlite"
+    path: str = "./data/tasks.db"
+    flush_interval: float = 1.0  # 进度等高频字段批量落盘间隔（秒）
 
 
 @dataclass
@@ -56,6 +84,9 @@ class AppConfig:
     """应用配置"""
     server: ServerConfig = field(default_factory=ServerConfig)
     download: DownloadConfig = field(default_factory=DownloadConfig)
+    storage: StorageConfig = field(default_factory=StorageConfig)
+    # 按站点限流，key 为域名后缀（如 douyin.com），default 作用于其余站点
+    hosts: dict[str, HostLimitConfig] = field(default_factory=dict)
     logging: LoggingConfig = field(default_factory=LoggingConfig)
     users: list[UserConfig] = field(default_factory=list)
     # Session 密钥，用于 NiceGUI app.storage.user；未设置时从环境变量 VIDEOFETCHER_STORAGE_SECRET 读取
@@ -82,6 +113,11 @@ def load_config(config_path: str = "config.yaml") -> AppConfig:
     # 解析各配置块
     server = ServerConfig(**data.get("server", {}))
     download = DownloadConfig(**data.get("download", {}))
+    storage = StorageConfig(**data.get("storage", {}))
+    hosts = {
+        str(name).lower(): HostLimitConfig(**(cfg or {}))
+        for name, cfg in (data.get("hosts") or {}).items()
+    }
     logging_cfg = LoggingConfig(**data.get("logging", {}))
 
     # 解析用户列表
@@ -90,6 +126,8 @@ def load_config(config_path: str = "config.yaml") -> AppConfig:
     return AppConfig(
         server=server,
         download=download,
+        storage=storage,
+        hosts=hosts,
         logging=logging_cfg,
         users=users,
         storage_secret=data.get("storage_secret"),
@@ -108,6 +146,12 @@ def get_config() -> AppConfig:
     return _config
 
 
+def set_config(config: AppConfig) -> None:
+    """直接替换全局配置（子进程沿用主进程配置时使用）"""
+    global _config
+    _config = config
+
+
 def reload_config() -> AppConfig:
     """重新加载配置"""
     global _config
@@ -1,11 +1,15 @@
 """Download core module."""
 
+import json
+import logging
 import plistlib
 import re
 import subprocess
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable
 from urllib.parse import urlparse, parse_qs
 
 import yt_dlp
@@ -13,10 +17,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from oss_uploader import upload_to_oss
+from oss_uploader import UploadProgress, oss_enabled, upload_to_oss
 from feishu_notify import send_download_complete
 
+import metrics
 from config import get_config
+from host_limits import HostLimiter, KIND_DOWNLOAD, KIND_PROBE
+from info_cache import InfoCache
+from media_store import MediaStore
+from process_engine import ProcessEngine
+from scheduler import FairScheduler, PRIORITY_BULK, PRIORITY_NORMAL, PRIORITY_URGENT
+from timings import StageTimer
 from models import (
     DownloadTask,
     User,
@@ -25,25 +36,204 @@ from models import (
     get_user_tasks,
     get_all_tasks,
     get_completed_tasks,
+    get_task_store,
+    peek_task_store,
     ensure_user_directory,
+    move_to_trash,
 )
 
 
+log = logging.getLogger(__name__)
 
-_task_controls: dict[str, bool] = {}
+_STOP_PAUSE = "pause"
+_STOP_CANCEL = "cancel"
+_CANCELLED_MSG = "Task cancelled by user"
+
+_DOWNLOADS_TOTAL = metrics.Counter(
+    "splazdl_downloads_total", "Finished download jobs by outcome.", ("host", "extractor", "user", "result"),
+)
+_DOWNLOAD_BYTES = metrics.Counter("splazdl_download_bytes_total", "Bytes received by downloads.", ("host", "user"))
+_DOWNLOAD_SECONDS = metrics.Histogram(
+    "splazdl_download_duration_seconds", "Wall time of download jobs that completed.", ("host", "extractor"),
+)
+_PROBES_TOTAL = metrics.Counter("splazdl_probes_total", "Preview probes by outcome.", ("host", "extractor", "result"))
+_PROBE_SECONDS = metrics.Histogram(
+    "splazdl_probe_duration_seconds", "Wall time of preview probes.", ("host",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+class _TaskControl(threading.Event):
+    """Stop flag of one queued or running task.
+
+    Set once with the requested stop (_STOP_PAUSE / _STOP_CANCEL). Progress
+    hooks hold a reference and only call ``is_set()``, so the hot path needs
+    neither ``_task_controls_lock`` nor a dict lookup.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stop = ""
+
+    def request(self, stop: str) -> None:
+        self.stop = stop
+        self.set()
+
+
+# task_id -> stop flag; the lock guards registering and removing entries
+_task_controls: dict[str, _TaskControl] = {}
 _task_controls_lock = threading.Lock()
 
 
-_executor: ThreadPoolExecutor | None = None
+_host_limiter: HostLimiter | None = None
+_host_limiter_lock = threading.Lock()
+_scheduler: FairScheduler | None = None
+_scheduler_lock = threading.Lock()
+_upload_scheduler: FairScheduler | None = None
+_upload_scheduler_lock = threading.Lock()
+_process_engine: ProcessEngine | None = None
+_media_store: MediaStore | None = None
+_media_store_lock = threading.Lock()
+_process_engine_lock = threading.Lock()
+
+
+def get_host_limiter() -> HostLimiter:
+    """Get shared per-host concurrency/rate limiter."""
+    global _host_limiter
+    if _host_limiter is None:
+        with _host_limiter_lock:
+            if _host_limiter is None:
+                _host_limiter = HostLimiter(get_config().hosts)
+    return _host_limiter
+
+
+def get_scheduler() -> FairScheduler:
+    """Get shared fair-share download scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                config = get_config()
+                limiter = get_host_limiter()
+                _scheduler = FairScheduler(
+                    max_workers=config.download.max_concurrent,
+                    name="download",
+                    weights=config.download.user_weights,
+                    admit=lambda host: limiter.try_acquire(host, KIND_DOWNLOAD),
+                    release=lambda host: limiter.release(host, KIND_DOWNLOAD),
+                )
+    return _scheduler
+
+
+def get_upload_scheduler() -> FairScheduler:
+    """Get shared post-download (OSS upload + notification) scheduler."""
+    global _upload_scheduler
+    if _upload_scheduler is None:
+        with _upload_scheduler_lock:
+            if _upload_scheduler is None:
+                config = get_config()
+                _upload_scheduler = FairScheduler(
+                    max_workers=config.download.upload_concurrency,
+                    name="upload",
+                    weights=config.download.user_weights,
+                )
+    return _upload_scheduler
+
+
+def get_process_engine() -> ProcessEngine | None:
+    """Get shared download process pool, or None when downloads run in threads."""
+    global _process_engine
+    config = get_config()
+    if config.download.engine != "process":
+        return None
+    if _process_engine is None:
+        with _process_engine_lock:
+            if _process_engine is None:
+                _process_engine = ProcessEngine(config.download.max_concurrent, config)
+    return _process_engine
+
+
+def close_process_engine() -> None:
+    """Stop download worker processes (app shutdown)."""
+    global _process_engine
+    with _process_engine_lock:
+        if _process_engine is not None:
+            _process_engine.shutdown()
+            _process_engine = None
+
+
+def get_media_store() -> MediaStore:
+    """Get shared content-addressed media store under base_dir/.store."""
+    global _media_store
+    if _media_store is None:
+        with _media_store_lock:
+            if _media_store is None:
+                _media_store = MediaStore(Path(get_config().download.base_dir) / ".store")
+    return _media_store
+
+
+def collect_media_garbage() -> tuple[int, int]:
+    """Reclaim stored media that no task file links to; returns (blobs, bytes) freed."""
+    if _media_store is None and not (Path(get_config().download.base_dir) / ".store").exists():
+        return 0, 0
+    return get_media_store().collect_garbage()
+
 
+def queue_ranks() -> dict[str, int]:
+    """Absolute download queue rank per queued task (computed on demand).
 
-def get_executor() -> ThreadPoolExecutor:
-    """Get shared thread pool executor."""
-    global _executor
-    if _executor is None:
-        config = get_config()
-        _executor = ThreadPoolExecutor(max_workers=config.download.max_concurrent)
-    return _executor
+    A task's 1-based position is its rank minus ``queue_dispatched()``.
+    Ranks are not stored on the tasks and stay put while the head of the
+    queue is dispatched, so only a reorder (``queue_version()``) touches
+    every queued row.
+    """
+    return get_scheduler().ranks()
+
+
+def queue_dispatched() -> int:
+    """Download jobs dispatched so far (the offset between ranks and positions)."""
+    return get_scheduler().dispatched
+
+
+def queue_version() -> int:
+    """Changes whenever ``queue_ranks()`` may have changed."""
+    return get_scheduler().version
+
+
+_probe_executor: ThreadPoolExecutor | None = None
+_probe_executor_lock = threading.Lock()
+
+
+def get_probe_executor() -> ThreadPoolExecutor:
+    """Get bounded thread pool used by batch preview probes."""
+    global _probe_executor
+    if _probe_executor is None:
+        with _probe_executor_lock:
+            if _probe_executor is None:
+                config = get_config()
+                _probe_executor = ThreadPoolExecutor(
+                    max_workers=max(1, config.download.preview_concurrency),
+                    thread_name_prefix="probe",
+                )
+    return _probe_executor
+
+
+_info_cache: InfoCache | None = None
+_info_cache_lock = threading.Lock()
+
+
+def get_info_cache() -> InfoCache:
+    """Get shared metadata cache used by probe_info and the download worker."""
+    global _info_cache
+    if _info_cache is None:
+        with _info_cache_lock:
+            if _info_cache is None:
+                config = get_config()
+                _info_cache = InfoCache(
+                    ttl=config.download.info_cache_ttl,
+                    max_entries=config.download.info_cache_size,
+                )
+    return _info_cache
 
 
 def _preprocess_url(url: str) -> str:
@@ -130,14 +320,62 @@ def _network_candidates(options: dict, url: str) -> list[dict]:
     return [_candidate()]
 
 
-def _extract_info_with_candidates(url: str, base_opts: dict, candidates: list[dict]) -> tuple[dict, dict]:
-    """Try extract_info with multiple network candidates."""
+def _info_cache_key(url: str, base_opts: dict, candidate: dict) -> tuple:
+    """Cache key: normalized URL + network candidate + playlist mode."""
+    return (
+        url,
+        json.dumps(candidate, sort_keys=True, default=str),
+        bool(base_opts.get("noplaylist")),
+    )
+
+
+def _extract_info_with_candidates(
+    url: str,
+    base_opts: dict,
+    candidates: list[dict],
+    task: DownloadTask | None = None,
+    probe_timeout: float | None = None,
+    timer: StageTimer | None = None,
+    refresh: bool = False,
+) -> tuple[dict, dict]:
+    """Try extract_info with multiple network candidates.
+
+    Results are shared through the metadata cache; ``refresh`` drops the
+    cached entry first and extracts again. When ``task`` is given,
+    every extractor round trip (cache misses only) is counted on
+    ``task.extract_calls``. When ``probe_timeout`` is given, each round trip
+    first waits for a probe slot/token of the URL's host. Attempts after the
+    first are timed as the ``cookie_fallback`` stage on ``timer``.
+    """
     last_error: Exception | None = None
 
-    for candidate in candidates:
+    for attempt, candidate in enumerate(candidates):
+        if task is not None:
+            _raise_if_stopped(task.task_id)
+        if timer is not None and attempt:
+            timer.switch("cookie_fallback")
+
+        def _load(candidate=candidate) -> dict:
+            if task is not None:
+                task.extract_calls += 1
+            if probe_timeout is None:
+                with yt_dlp.YoutubeDL({**base_opts, **candidate}) as ydl:
+                    return ydl.extract_info(url, download=False)
+            limiter = get_host_limiter()
+            host = limiter.host_key(url)
+            if not limiter.acquire(host, KIND_PROBE, timeout=probe_timeout):
+                raise RuntimeError(f"Host {host} is rate limited, probe timed out")
+            try:
+                with yt_dlp.YoutubeDL({**base_opts, **candidate}) as ydl:
+                    return ydl.extract_info(url, download=False)
+            finally:
+                limiter.release(host, KIND_PROBE)
+
+        key = _info_cache_key(url, base_opts, candidate)
+        if refresh:
+            get_info_cache().invalidate(key)
         try:
-            with yt_dlp.YoutubeDL({**base_opts, **candidate}) as ydl:
-                info = ydl.extract_info(url, download=False)
+            info = get_info_cache().get_or_load(key, _load)
             return info, candidate
         except Exception as exc:
             last_error = exc
@@ -164,12 +402,23 @@ def probe_info(url: str, options: dict | None = None) -> dict:
         "quiet": True,
         "no_warnings": True,
         "noplaylist": True,
+        "socket_timeout": get_config().download.preview_timeout,
     }
-    info, _ = _extract_info_with_candidates(
-        processed_url,
-        base_opts=base_opts,
-        candidates=_network_candidates(options, processed_url),
-    )
+    host = get_host_limiter().host_key(processed_url)
+    started = time.monotonic()
+    try:
+        info, _ = _extract_info_with_candidates(
+            processed_url,
+            base_opts=base_opts,
+            candidates=_network_candidates(options, processed_url),
+            probe_timeout=get_config().download.preview_timeout,
+        )
+    except Exception:
+        _PROBES_TOTAL.labels(host, "unknown", "error").inc()
+        raise
+    finally:
+        _PROBE_SECONDS.labels(host).observe(time.monotonic() - started)
+    _PROBES_TOTAL.labels(host, info.get("extractor_key") or "unknown", "ok").inc()
 
     formats = info.get("formats", []) or []
     heights = sorted({f.get("height") for f in formats if f.get("height")}, reverse=True)
@@ -200,15 +449,74 @@ def start_download(user: User, url: str, quality: str = "best", options: dict |
     return start_download_for_task(task, quality, options)
 
 
-def start_download_for_task(task: DownloadTask, quality: str = "best", options: dict | None = None) -> str:
-    """Submit an existing task to worker pool."""
+def start_download_for_task(
+    task: DownloadTask,
+    quality: str = "best",
+    options: dict | None = None,
+    priority: int = PRIORITY_NORMAL,
+) -> str:
+    """Enqueue an existing task into the fair-share scheduler."""
     with _task_controls_lock:
-        _task_controls[task.task_id] = False
-
-    get_executor().submit(_download_worker, task, quality, options or {})
+        _task_controls[task.task_id] = _TaskControl()
+    _submit_download(task, quality, options, priority)
     return task.task_id
 
 
+def _submit_download(task: DownloadTask, quality: str, options: dict | None, priority: int) -> None:
+    """Queue a task whose control is already registered."""
+    # Remembered so that a paused task can be resumed with the same settings.
+    task.quality = quality
+    task.options = dict(options or {})
+    task.priority = priority
+    get_scheduler().submit(
+        task.task_id,
+        task.username,
+        _run_download_job,
+        task,
+        task.quality,
+        task.options,
+        priority=priority,
+        resource=get_host_limiter().host_key(task.url),
+    )
+
+
+def resume_task(task_id: str) -> bool:
+    """Resubmit a paused or failed task into its existing task directory.
+
+    yt-dlp picks up the ``.part``/fragment files left there, so the download
+    continues where it stopped instead of starting again from byte zero.
+    Cancelled tasks are not resumed: their files were moved to ``.trash``.
+    """
+    task = get_task(task_id)
+    if not task:
+        return False
+    with _task_controls_lock:
+        # Checked and claimed under one lock, so two resumes cannot both pass.
+        if task_id in _task_controls:
+            # The previous worker has not stopped yet, or it was just resumed.
+            return False
+        if task.status not in (DownloadTask.STATUS_PAUSED, DownloadTask.STATUS_FAILED):
+            return False
+        if task.error_msg == _CANCELLED_MSG:
+            return False
+        _task_controls[task_id] = _TaskControl()
+        task.status = DownloadTask.STATUS_PENDING
+        task.error_msg = ""
+        task.speed = 0.0
+        task.eta = 0
+    _submit_download(task, task.quality, task.options, task.priority)
+    return True
+
+
+def set_task_priority(task_id: str, priority: int) -> bool:
+    """Reprioritize a task that is still waiting in the queue."""
+    task = get_task(task_id)
+    if not task or not get_scheduler().reprioritize(task_id, priority):
+        return False
+    task.priority = priority
+    return True
+
+
 def _sanitize_title_for_filename(title: str) -> str:
     """Sanitize title into safe file name."""
 
@@ -223,18 +531,6 @@ def _sanitize_title_for_filename(title: str) -> str:
     return filename.strip()
 
 
-def _clean_progress_text(value: str | None) -> str:
-    """Strip ANSI control sequences from progress text."""
-    text = (value or "").strip()
-    if not text:
-        return ""
-
-    text = re.sub(r"\x1B\[[0-?]*[ -/]*[@-~]", "", text)
-
-    text = text.replace("\x1b", "").replace("", "")
-    return text.strip()
-
-
 def _select_downloaded_media_file(task_dir: Path) -> Path | None:
     """Pick best media file in task directory."""
     if not task_dir.exists():
@@ -322,136 +618,519 @@ def _collect_output_paths_from_info(info: dict | None) -> list[Path]:
     return deduped
 
 
-def _download_worker(task: DownloadTask, quality: str, options: dict):
-    """Download worker implementation."""
-    task_id = task.task_id
+def _reusable_info(info: dict) -> dict:
+    """Copy of an extracted info dict that can be processed again.
+
+    Private keys are dropped the way ``--load-info-json`` does it, except
+    for a playlist's ``entries``: those are kept and sanitized one by one.
+    """
+    entries = info.get("entries")
+    result = yt_dlp.YoutubeDL.sanitize_info(info, True)
+    if entries is not None:
+        result["entries"] = [_reusable_info(e) if isinstance(e, dict) else e for e in entries]
+    return result
+
+
+def _download_with_info(ydl_opts: dict, info: dict, task: DownloadTask) -> dict:
+    """Run the download phase from an already extracted info dict.
+
+    The info dict is sanitized (see ``_reusable_info``), so format
+    selection is redone with ``ydl_opts`` without resolving the page
+    again. If the extractor asks for a fresh extraction (e.g. expired
+    format URLs), fall back to a full pass.
+    """
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        try:
+            return ydl.process_ie_result(_reusable_info(info), download=True)
+        except yt_dlp.utils.ReExtractInfo:
+            task.extract_calls += 1
+            return ydl.extract_info(task.url, download=True)
+
 
-    def progress_hook(d: dict):
+def _task_control(task_id: str) -> _TaskControl:
+    """The task's stop flag, registered if missing (e.g. in a worker process)."""
+    control = _task_controls.get(task_id)
+    if control is None:
         with _task_controls_lock:
-            if _task_controls.get(task_id, False):
-                raise InterruptedError("Download paused by user")
+            control = _task_controls.setdefault(task_id, _TaskControl())
+    return control
 
-        if d.get("status") == "downloading":
-            total = d.get("total_bytes") or d.get("total_bytes_estimate", 0)
-            downloaded = d.get("downloaded_bytes", 0)
-            task.progress = (downloaded / total * 100) if total > 0 else 0
-            task.status = DownloadTask.STATUS_DOWNLOADING
-            task.speed = _clean_progress_text(d.get("_speed_str"))
-            task.eta = _clean_progress_text(d.get("_eta_str"))
 
-    try:
-        user_dir = ensure_user_directory(task.username)
-        task_dir = user_dir / task_id
-        task_dir.mkdir(parents=True, exist_ok=True)
+def _stop_requested(task_id: str) -> str:
+    control = _task_controls.get(task_id)
+    return control.stop if control is not None else ""
 
 
-        audio_only = bool(options.get("audio_only", False)) or quality == "audio"
-        audio_format = (options.get("audio_format") or "mp3").strip()
-        write_subs = bool(options.get("write_subs", False))
-        sub_langs_raw = (options.get("sub_langs") or "").strip()
-        write_thumbnail = bool(options.get("write_thumbnail", False))
-        embed_thumbnail = bool(options.get("embed_thumbnail", False))
-        embed_metadata = bool(options.get("embed_metadata", False))
-        download_playlist = bool(options.get("download_playlist", False))
-        rate_limit = (options.get("rate_limit") or "").strip()
-        retries = int(options.get("retries") or 10)
-        fragment_retries = int(options.get("fragment_retries") or 10)
-        concurrent_fragments = int(options.get("concurrent_fragments") or 1)
-        use_download_archive = bool(options.get("use_download_archive", False))
-
-
-        base_extract_opts = {
-            "quiet": True,
-            "no_warnings": True,
-        }
-        if not download_playlist:
-            base_extract_opts["noplaylist"] = True
+def _raise_if_stopped(task_id: str) -> None:
+    stop = _stop_requested(task_id)
+    if stop:
+        raise InterruptedError(f"Download {stop} requested by user")
 
-        task.status = DownloadTask.STATUS_DOWNLOADING
 
-        info, selected_network_opts = _extract_info_with_candidates(
+def _finish_stopped(task: DownloadTask, stop: str) -> None:
+    """Settle a task whose worker was stopped by pause_task/cancel_task."""
+    task.speed = 0.0
+    task.eta = 0
+    if stop == _STOP_CANCEL:
+        _mark_cancelled(task)
+    else:
+        task.status = DownloadTask.STATUS_PAUSED
+
+
+def _mark_cancelled(task: DownloadTask) -> None:
+    task.status = DownloadTask.STATUS_FAILED
+    task.error_msg = _CANCELLED_MSG
+    task.progress = 0
+    task_dir = Path(get_config().download.base_dir) / task.username / task.task_id
+    if task_dir.exists():
+        move_to_trash(task_dir)
+        collect_media_garbage()
+
+
+def _run_download_job(task: DownloadTask, quality: str, options: dict):
+    """Scheduler job: run the worker in this thread or in the process pool."""
+    engine = get_process_engine()
+    if engine is None:
+        _download_worker(task, quality, options)
+    else:
+        _run_in_process(engine, task, quality, options)
+    if task.status in (DownloadTask.STATUS_UPLOADING, DownloadTask.STATUS_COMPLETED):
+        # The media file is final: free this download slot right away and let
+        # the upload stage do OSS and notifications.
+        _submit_post_download(task)
+
+
+def _extract_in_parent(task: DownloadTask, quality: str, options: dict) -> tuple[dict, dict, bool] | None:
+    """The worker's extraction step, run in this process for the process engine.
+
+    The metadata cache, and the preview results in it, live here; a worker
+    process would start with an empty cache and extract again. Returns None
+    when the media store already has the URL: the worker links it without
+    extracting.
+    """
+    if _can_dedup(options) and get_media_store().lookup([_url_media_key(task.url, _media_variant(quality, options))]):
+        return None
+    _raise_if_stopped(task.task_id)
+    task.status = DownloadTask.STATUS_DOWNLOADING
+    calls = task.extract_calls
+    timer = StageTimer(task)
+    timer.switch("extract")
+    try:
+        info, network_opts = _extract_info_with_candidates(
             task.url,
-            base_opts=base_extract_opts,
+            base_opts=_extract_opts(options),
             candidates=_network_candidates(options, task.url),
+            task=task,
+            timer=timer,
         )
+    finally:
+        timer.stop()
+    # Sanitized: it is pickled to the worker process.
+    return _reusable_info(info), network_opts, task.extract_calls == calls
 
 
-        video_title = info.get("title", "Untitled Video")
-        safe_filename = _sanitize_title_for_filename(video_title)
-
-        task.title = video_title
-        task.duration = int(info.get("duration") or 0)
-
-
-        ydl_opts = {
-            "format": "bestaudio/best" if audio_only else _get_format_selector(quality),
-            "outtmpl": str(task_dir / f"{safe_filename}.%(ext)s"),
-            "progress_hooks": [progress_hook],
-            "quiet": True,
-            "no_warnings": True,
-            "no_color": True,
-            "merge_output_format": "mp4",
-            "retries": retries,
-            "fragment_retries": fragment_retries,
-            "concurrent_fragment_downloads": concurrent_fragments,
-        }
-        if not download_playlist:
-            ydl_opts["noplaylist"] = True
-        ydl_opts.update(selected_network_opts)
-        if rate_limit:
-            ydl_opts["ratelimit"] = rate_limit
-        if write_subs:
-            ydl_opts["writesubtitles"] = True
-            ydl_opts["writeautomaticsub"] = True
-            if sub_langs_raw:
-                ydl_opts["subtitleslangs"] = [s.strip() for s in sub_langs_raw.split(",") if s.strip()]
-        if write_thumbnail:
-            ydl_opts["writethumbnail"] = True
-        if embed_thumbnail:
-            ydl_opts["embedthumbnail"] = True
-        if embed_metadata:
-            ydl_opts["addmetadata"] = True
-        if audio_only:
-            ydl_opts["postprocessors"] = [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": audio_format,
-                }
-            ]
-        if use_download_archive:
-            archive_path = user_dir / ".download_archive.txt"
-            ydl_opts["download_archive"] = str(archive_path)
-
-        downloaded_info = None
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            downloaded_info = ydl.extract_info(task.url, download=True)
+def _run_in_process(engine: ProcessEngine, task: DownloadTask, quality: str, options: dict) -> None:
+    """Extract here, then download in a worker process."""
+    task_id = task.task_id
+    started = time.monotonic()
+    extracted = None
+    ran = False
+    error: Exception | None = None
+    try:
+        extracted = _extract_in_parent(task, quality, options)
+        engine.controls[task_id] = _stop_requested(task_id)
+        ran = True
+        engine.run(_download_worker, task, quality, options, extracted)
+    except Exception as e:
+        error = e
+    finally:
+        with _task_controls_lock:
+            control = _task_controls.pop(task_id, None)
+            stop = control.stop if control is not None else ""
+    if not ran:
+        # Stopped or failed while extracting; the worker never started.
+        if stop:
+            _finish_stopped(task, stop)
+        else:
+            task.status = DownloadTask.STATUS_FAILED
+            task.error_msg = str(error)
+        _record_download(task, "unknown", time.monotonic() - started)
+        return
+    if error is not None:
+        task.status = DownloadTask.STATUS_FAILED
+        task.error_msg = str(error)
+    if stop == _STOP_CANCEL and task.status in (DownloadTask.STATUS_UPLOADING, DownloadTask.STATUS_COMPLETED):
+        # The cancel reached the worker process only after it had settled.
+        _finish_stopped(task, stop)
+    if extracted is not None and task.status == DownloadTask.STATUS_FAILED and not stop:
+        # The worker can only invalidate its own cache.
+        get_info_cache().invalidate(_info_cache_key(task.url, _extract_opts(options), extracted[1]))
+
+
+def _submit_post_download(task: DownloadTask) -> None:
+    get_upload_scheduler().submit(task.task_id, task.username, _post_download_worker, task, priority=task.priority)
+
+
+def requeue_uploads() -> int:
+    """Resubmit tasks left in the upload stage by a restart; returns how many."""
+    tasks = get_task_store().list_tasks(status=DownloadTask.STATUS_UPLOADING)
+    for task in tasks:
+        _submit_post_download(task)
+    return len(tasks)
+
+
+def _post_download_worker(task: DownloadTask) -> None:
+    """Upload stage: OSS upload (resumable), then the completion notification."""
+    timer = StageTimer(task)
+    if task.status == DownloadTask.STATUS_UPLOADING:
+        filepath = Path(task.file_path)
+        oss_url = ""
+        if filepath.is_file():
+            def _on_upload(percent: float, bytes_per_second: float) -> None:
+                task.upload_progress = percent
+                task.upload_speed = bytes_per_second
+
+            with timer.stage("upload"):
+                oss_url = upload_to_oss(task.task_id, filepath, progress=UploadProgress(_on_upload))
+        task.upload_speed = 0.0
+        if oss_url:
+            task.oss_url = oss_url
+            if task.media_digest:
+                get_media_store().set_oss_url(task.media_digest, oss_url)
+        if task.status != DownloadTask.STATUS_UPLOADING:
+            # Cleared or removed while uploading.
+            return
+        task.status = DownloadTask.STATUS_COMPLETED
 
-        filepath: Path | None = None
+    with timer.stage("notify"):
+        send_download_complete(
+            task_id=task.task_id,
+            title=task.title,
+            url=task.url,
+            oss_url=task.oss_url,
+            file_size=task.file_size,
+            duration=task.duration,
+        )
+
+
+def _can_dedup(options: dict) -> bool:
+    """Only single-file outputs without sidecars are shared through the media store."""
+    if not get_config().download.dedup:
+        return False
+    return not any(
+        options.get(key)
+        for key in ("download_playlist", "write_subs", "write_thumbnail", "use_download_archive")
+    )
+
+
+def _media_variant(quality: str, options: dict) -> str:
+    """Options that change the produced bytes for the same source media.
+
+    The network identity (cookies and proxy) is part of the variant too:
+    media fetched with one user's cookies may be private, so it is only
+    reused by tasks that fetch with the same cookie source.
+    """
+    audio_only = bool(options.get("audio_only", False)) or quality == "audio"
+    return json.dumps(
+        {
+            "quality": "audio" if audio_only else quality,
+            "audio_format": (options.get("audio_format") or "mp3").strip() if audio_only else "",
+            "embed_thumbnail": bool(options.get("embed_thumbnail", False)),
+            "embed_metadata": bool(options.get("embed_metadata", False)),
+            "network": _network_candidates(options, ""),
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+
+def _info_media_keys(info: dict, variant: str) -> list[str]:
+    keys = []
+    if info.get("extractor_key") and info.get("id"):
+        keys.append(f"id:{info['extractor_key']}:{info['id']}#{variant}")
+    if info.get("webpage_url"):
+        keys.append(f"url:{info['webpage_url']}#{variant}")
+    return keys
+
+
+def _fetch_media(
+    task: DownloadTask,
+    task_dir: Path,
+    info: dict,
+    network_opts: dict,
+    quality: str,
+    options: dict,
+    progress_hook: Callable[[dict], None],
+    timer: StageTimer,
+) -> Path:
+    """Download the extracted media into ``task_dir`` and return the media file.
+
+    Time spent in yt-dlp postprocessors (ffmpeg merge, audio extraction, ...)
+    is split off the ``transfer`` stage through ``timer``.
+    """
+    audio_only = bool(options.get("audio_only", False)) or quality == "audio"
+    audio_format = (options.get("audio_format") or "mp3").strip()
+    write_subs = bool(options.get("write_subs", False))
+    sub_langs_raw = (options.get("sub_langs") or "").strip()
+    write_thumbnail = bool(options.get("write_thumbnail", False))
+    embed_thumbnail = bool(options.get("embed_thumbnail", False))
+    embed_metadata = bool(options.get("embed_metadata", False))
+    download_playlist = bool(options.get("download_playlist", False))
+    rate_limit = (options.get("rate_limit") or "").strip()
+    retries = int(options.get("retries") or 10)
+    fragment_retries = int(options.get("fragment_retries") or 10)
+    concurrent_fragments = int(options.get("concurrent_fragments") or 1)
+    use_download_archive = bool(options.get("use_download_archive", False))
+
+    safe_filename = _sanitize_title_for_filename(task.title)
+
+    ydl_opts = {
+        "format": "bestaudio/best" if audio_only else _get_format_selector(quality),
+        "outtmpl": str(task_dir / f"{safe_filename}.%(ext)s"),
+        "progress_hooks": [progress_hook],
+        "postprocessor_hooks": [timer.postprocessor_hook],
+        # Keep and reuse .part files so resume_task continues partial downloads.
+        "continuedl": True,
+        "nopart": False,
+        "quiet": True,
+        "no_warnings": True,
+        "no_color": True,
+        "merge_output_format": "mp4",
+        "retries": retries,
+        "fragment_retries": fragment_retries,
+        "concurrent_fragment_downloads": concurrent_fragments,
+    }
+    if not download_playlist:
+        ydl_opts["noplaylist"] = True
+    ydl_opts.update(network_opts)
+    if rate_limit:
+        # yt-dlp wants bytes/second; the UI accepts values like "2M".
+        ydl_opts["ratelimit"] = yt_dlp.utils.parse_bytes(rate_limit)
+    if write_subs:
+        ydl_opts["writesubtitles"] = True
+        ydl_opts["writeautomaticsub"] = True
+        if sub_langs_raw:
+            ydl_opts["subtitleslangs"] = [s.strip() for s in sub_langs_raw.split(",") if s.strip()]
+    if write_thumbnail:
+        ydl_opts["writethumbnail"] = True
+    if embed_thumbnail:
+        ydl_opts["embedthumbnail"] = True
+    if embed_metadata:
+        ydl_opts["addmetadata"] = True
+    if audio_only:
+        ydl_opts["postprocessors"] = [
+            {
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": audio_format,
+            }
+        ]
+    if use_download_archive:
+        archive_path = task_dir.parent / ".download_archive.txt"
+        ydl_opts["download_archive"] = str(archive_path)
+
+    timer.switch("transfer")
+    downloaded_info = _download_with_info(ydl_opts, info, task)
+
+    filepath: Path | None = None
+    info_paths = _collect_output_paths_from_info(downloaded_info)
+    existing_info_paths = [p for p in info_paths if p.exists() and p.is_file()]
+    if existing_info_paths:
+        filepath = max(existing_info_paths, key=lambda p: p.stat().st_size)
+    if not filepath:
+        filepath = _select_downloaded_media_file(task_dir)
+    if (not filepath or not filepath.exists()) and use_download_archive:
+        filepath = _find_existing_media_for_same_url(task)
+    if (not filepath or not filepath.exists()) and use_download_archive:
+        # Archive may skip actual file writing for known IDs; retry once without archive.
+        retry_opts = dict(ydl_opts)
+        retry_opts.pop("download_archive", None)
+        timer.switch("transfer")
+        downloaded_info = _download_with_info(retry_opts, info, task)
         info_paths = _collect_output_paths_from_info(downloaded_info)
         existing_info_paths = [p for p in info_paths if p.exists() and p.is_file()]
         if existing_info_paths:
             filepath = max(existing_info_paths, key=lambda p: p.stat().st_size)
         if not filepath:
             filepath = _select_downloaded_media_file(task_dir)
-        if (not filepath or not filepath.exists()) and use_download_archive:
-            filepath = _find_existing_media_for_same_url(task)
-        if (not filepath or not filepath.exists()) and use_download_archive:
-            # Archive may skip actual file writing for known IDs; retry once without archive.
-            retry_opts = dict(ydl_opts)
-            retry_opts.pop("download_archive", None)
-            with yt_dlp.YoutubeDL(retry_opts) as ydl:
-                downloaded_info = ydl.extract_info(task.url, download=True)
-            info_paths = _collect_output_paths_from_info(downloaded_info)
-            existing_info_paths = [p for p in info_paths if p.exists() and p.is_file()]
-            if existing_info_paths:
-                filepath = max(existing_info_paths, key=lambda p: p.stat().st_size)
-            if not filepath:
-                filepath = _select_downloaded_media_file(task_dir)
-        if not filepath or not filepath.exists():
-            raise RuntimeError("Download finished but media file not found")
-
-
-        if filepath and filepath.exists():
+    if not filepath or not filepath.exists():
+        raise RuntimeError("Download finished but media file not found")
+    return filepath
+
+
+def _progress_hook(
+    task: DownloadTask, control: _TaskControl, interval: float, task_dir: Path | None = None,
+) -> Callable[[dict], None]:
+    """yt-dlp progress hook that samples into ``task`` at most every ``interval`` seconds per file.
+
+    yt-dlp calls it for every chunk of every fragment, often thousands of
+    times a second with concurrent fragments, so the unsampled path is just
+    a stop-flag check and a clock read. Raises InterruptedError once the
+    task is paused or cancelled.
+
+    Received bytes are counted per file on every sample and on the final
+    ``finished`` call, starting from the size the file's ``.part`` had in
+    ``task_dir`` when the hook was made (the resume offset, 0 for a fresh
+    file), so bytes before the first and after the last sample count too.
+    """
+    last_sample: dict[str, float] = {}
+    received = _DOWNLOAD_BYTES.labels(get_host_limiter().host_key(task.url), task.username)
+    counted: dict[str, int] = {}  # file -> downloaded_bytes already added to ``received``
+    resumed = (
+        {p.name: p.stat().st_size for p in task_dir.glob("*.part")} if task_dir and task_dir.is_dir() else {}
+    )
+
+    def count(d: dict, filename: str, downloaded: int) -> None:
+        previous = counted.get(filename)
+        if previous is None:
+            tmpfilename = d.get("tmpfilename") or f"{filename}.part"
+            previous = resumed.get(Path(tmpfilename).name, 0)
+        if downloaded > previous:
+            received.inc(downloaded - previous)
+        counted[filename] = downloaded
+
+    def hook(d: dict) -> None:
+        if control.is_set():
+            raise InterruptedError(f"Download {control.stop} requested by user")
+        status = d.get("status")
+        filename = d.get("filename") or ""
+        downloaded = d.get("downloaded_bytes") or 0
+        if status == "finished":
+            count(d, filename, downloaded)
+            return
+        if status != "downloading":
+            return
+        total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
+        now = time.monotonic()
+        if now - last_sample.get(filename, 0.0) < interval and not (total and downloaded >= total):
+            return
+        last_sample[filename] = now
+        count(d, filename, downloaded)
+        task.downloaded_bytes = downloaded
+        task.total_bytes = int(total)
+        task.progress = (downloaded / total * 100) if total > 0 else 0
+        task.status = DownloadTask.STATUS_DOWNLOADING
+        task.speed = float(d.get("speed") or 0)
+        task.eta = int(d.get("eta") or 0)
+
+    return hook
+
+
+def _extract_opts(options: dict) -> dict:
+    """Base yt-dlp options of the worker's extraction step (part of the cache key)."""
+    opts = {"quiet": True, "no_warnings": True}
+    if not options.get("download_playlist"):
+        opts["noplaylist"] = True
+    return opts
+
+
+def _url_media_key(url: str, variant: str) -> str:
+    return f"url:{url}#{variant}"
+
+
+def _download_worker(
+    task: DownloadTask,
+    quality: str,
+    options: dict,
+    extracted: tuple[dict, dict, bool] | None = None,
+):
+    """Download worker implementation.
+
+    ``extracted`` is ``(info, network_opts, from_cache)`` from an extraction
+    the caller already ran (process engine, see ``_run_in_process``);
+    otherwise the worker extracts through the metadata cache itself. If
+    downloading from cached info fails, the info is extracted again once and
+    the download retried: a cache hit can be minutes old, and signed format
+    URLs expire.
+    """
+    task_id = task.task_id
+    control = _task_control(task_id)
+    timer = StageTimer(task)
+
+    base_extract_opts: dict = {}
+    selected_network_opts: dict | None = None
+    started = time.monotonic()
+    extractor = "unknown"
+
+    try:
+        timer.switch("prepare")
+        user_dir = ensure_user_directory(task.username)
+        task_dir = user_dir / task_id
+        task_dir.mkdir(parents=True, exist_ok=True)
+        progress_hook = _progress_hook(task, control, get_config().download.progress_interval, task_dir)
+
+        base_extract_opts = _extract_opts(options)
+
+        filepath: Path | None = None
+        media_store = get_media_store() if _can_dedup(options) else None
+        variant = _media_variant(quality, options)
+        media_keys = [_url_media_key(task.url, variant)]
+        blob = media_store.lookup(media_keys) if media_store else None
+
+        if blob is None:
+            _raise_if_stopped(task_id)
+            task.status = DownloadTask.STATUS_DOWNLOADING
+
+            if extracted is None:
+                calls = task.extract_calls
+                timer.switch("extract")
+                info, selected_network_opts = _extract_info_with_candidates(
+                    task.url,
+                    base_opts=base_extract_opts,
+                    candidates=_network_candidates(options, task.url),
+                    task=task,
+                    timer=timer,
+                )
+                extracted = info, selected_network_opts, task.extract_calls == calls
+            info, selected_network_opts, from_cache = extracted
+
+            _raise_if_stopped(task_id)
+            extractor = info.get("extractor_key") or extractor
+            task.title = info.get("title", "Untitled Video")
+            task.duration = int(info.get("duration") or 0)
+
+            media_keys += _info_media_keys(info, variant)
+            blob = media_store.lookup(media_keys) if media_store else None
+            if blob is None:
+                try:
+                    filepath = _fetch_media(
+                        task, task_dir, info, selected_network_opts, quality, options, progress_hook, timer,
+                    )
+                except Exception as e:
+                    if not from_cache or _stop_requested(task_id):
+                        raise
+                    log.info("Task %s failed with cached info (%s); retrying with a fresh extraction", task_id, e)
+                    timer.switch("extract")
+                    info, selected_network_opts = _extract_info_with_candidates(
+                        task.url,
+                        base_opts=base_extract_opts,
+                        candidates=_network_candidates(options, task.url),
+                        task=task,
+                        timer=timer,
+                        refresh=True,
+                    )
+                    _raise_if_stopped(task_id)
+                    filepath = _fetch_media(
+                        task, task_dir, info, selected_network_opts, quality, options, progress_hook, timer,
+                    )
+                if media_store:
+                    blob = media_store.ingest(filepath, media_keys, title=task.title, duration=task.duration)
+
+        if filepath is None:
+            # Same media already fetched (by anyone): hardlink it instead of downloading.
+            timer.switch("link")
+            task.title = task.title or blob.title
+            task.duration = task.duration or blob.duration
+            dest = task_dir / f"{_sanitize_title_for_filename(task.title or blob.digest[:12])}{blob.ext}"
+            filepath = media_store.link(blob, dest, media_keys)
+            task.dedup_bytes = blob.size
+            log.info("Task %s reused stored media %s (%d bytes not downloaded)", task_id, blob.digest[:12], blob.size)
+        _raise_if_stopped(task_id)
+
+
+        if blob is None and filepath and filepath.exists():
+            # Not for stored media: the file shares its inode (and xattrs)
+            # with every task that reuses the blob.
+            timer.switch("xattr")
             try:
                 plist_data = plistlib.dumps([task.url], fmt=plistlib.FMT_BINARY)
                 subprocess.run(
@@ -464,56 +1143,191 @@ def _download_worker(task: DownloadTask, quality: str, options: dict):
             except Exception:
                 pass
 
+        timer.stop()
 
-        task.status = DownloadTask.STATUS_COMPLETED
-        task.progress = 100
-        task.file_path = str(filepath) if filepath and filepath.exists() else ""
-        task.file_size = filepath.stat().st_size if filepath and filepath.exists() else 0
-
-        if filepath and filepath.exists():
-            oss_url = upload_to_oss(task_id, filepath)
-            if oss_url:
-                task.oss_url = oss_url
-
-        send_download_complete(
-            task_id=task_id,
-            title=task.title,
-            url=task.url,
-            oss_url=task.oss_url,
-            file_size=task.file_size,
-            duration=task.duration,
-        )
+        file_size = filepath.stat().st_size
+        with _task_controls_lock:
+            # Settle under the lock that _stop_task flags controls with: a stop
+            # either lands before this check, or finds no control afterwards
+            # and sees the final status.
+            _raise_if_stopped(task_id)
+            _task_controls.pop(task_id, None)
+            task.progress = 100
+            task.speed = 0.0
+            task.eta = 0
+            task.file_path = str(filepath)
+            task.file_size = file_size
+            if blob is not None:
+                task.media_digest = blob.digest
+                task.oss_url = blob.oss_url
+            # Upload and notification run in the upload stage (_post_download_worker).
+            if oss_enabled() and not task.oss_url:
+                task.status = DownloadTask.STATUS_UPLOADING
+            else:
+                task.status = DownloadTask.STATUS_COMPLETED
 
     except InterruptedError:
-        task.status = DownloadTask.STATUS_PAUSED
+        _finish_stopped(task, _stop_requested(task_id))
 
     except Exception as e:
+        stop = _stop_requested(task_id)
+        if stop:
+            # yt-dlp wraps the progress hook's InterruptedError in a DownloadError.
+            _finish_stopped(task, stop)
+            return
         task.status = DownloadTask.STATUS_FAILED
         task.error_msg = str(e)
+        if selected_network_opts is not None:
+            # The cached formats may be what failed; force a fresh probe next time.
+            get_info_cache().invalidate(
+                _info_cache_key(task.url, base_extract_opts, selected_network_opts)
+            )
 
     finally:
+        # Also closes the stage a failed or stopped task was in.
+        timer.stop()
+        log.info(
+            "Task %s finished with %d extractor call(s); info cache %s",
+            task_id, task.extract_calls, get_info_cache().stats(),
+        )
+        _record_download(task, extractor, time.monotonic() - started)
         with _task_controls_lock:
             _task_controls.pop(task_id, None)
 
 
+def _download_result(task: DownloadTask) -> str:
+    if task.status in (DownloadTask.STATUS_COMPLETED, DownloadTask.STATUS_UPLOADING):
+        return "completed"
+    if task.status == DownloadTask.STATUS_PAUSED:
+        return "paused"
+    if task.error_msg == _CANCELLED_MSG:
+        return "cancelled"
+    return "failed"
+
+
+def _record_download(task: DownloadTask, extractor: str, seconds: float) -> None:
+    host = get_host_limiter().host_key(task.url)
+    result = _download_result(task)
+    _DOWNLOADS_TOTAL.labels(host, extractor, task.username, result).inc()
+    if result == "completed":
+        _DOWNLOAD_SECONDS.labels(host, extractor).observe(seconds)
+
+
+def _collect_metrics():
+    """Pipeline state read at scrape time (see metrics.add_collector)."""
+    for name, scheduler in (("download", _scheduler), ("upload", _upload_scheduler)):
+        if scheduler is None:
+            continue
+        stats = scheduler.stats()
+        yield (
+            f"splazdl_{name}_queue_depth", "gauge", f"Jobs waiting in the {name} queue.",
+            [({}, stats["queued"])],
+        )
+        yield (
+            f"splazdl_{name}_workers_active", "gauge", f"Running {name} jobs.",
+            [({}, stats["active"])],
+        )
+        yield (
+            f"splazdl_{name}_workers", "gauge", f"Configured {name} concurrency.",
+            [({}, stats["workers"])],
+        )
+    if _host_limiter is not None:
+        hosts = _host_limiter.stats()
+        yield (
+            "splazdl_host_active", "gauge", "Downloads and probes currently holding a host slot.",
+            [({"host": host, "kind": kind}, s[kind]) for host, s in hosts.items() for kind in ("downloads", "probes")],
+        )
+    store = peek_task_store()
+    if store is not None:
+        # A scrape never opens the task store (and runs its restart recovery).
+        speeds: dict[tuple[str, str], float] = {}
+        for task in store.list_tasks(status=DownloadTask.STATUS_DOWNLOADING):
+            key = (get_host_limiter().host_key(task.url), task.username)
+            speeds[key] = speeds.get(key, 0.0) + task.speed
+        yield (
+            "splazdl_download_speed_bytes", "gauge", "Current download throughput in bytes per second.",
+            [({"host": host, "user": user}, speed) for (host, user), speed in speeds.items()],
+        )
+    cache = get_info_cache().stats()
+    yield "splazdl_info_cache_entries", "gauge", "Cached extractor results.", [({}, cache["size"])]
+    yield (
+        "splazdl_info_cache_requests_total", "counter", "Metadata cache lookups.",
+        [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])],
+    )
+
+
+metrics.add_collector(_collect_metrics)
+
+
+def host_limit_stats() -> dict:
+    """Active downloads/probes per host."""
+    return get_host_limiter().stats()
+
+
+def media_store_stats() -> dict:
+    """Stored blobs and bytes saved by cross-user deduplication."""
+    return get_media_store().stats()
+
+
+def info_cache_stats() -> dict:
+    """Metadata cache size and hit/miss counters."""
+    return get_info_cache().stats()
+
+
 def pause_task(task_id: str) -> bool:
     """Request task pause."""
-    with _task_controls_lock:
-        if task_id in _task_controls:
-            _task_controls[task_id] = True
-            return True
-    return False
+    return _stop_task(task_id, _STOP_PAUSE)
 
 
 def cancel_task(task_id: str) -> bool:
-    """Cancel task and mark failure state."""
-    pause_task(task_id)
+    """Cancel a task at any stage and move its partial files to .trash.
+
+    A queued task is dropped from the scheduler before it ever starts; an
+    extracting or downloading task is stopped by its worker at the next
+    checkpoint, which then cleans up the task directory.
+    """
     task = get_task(task_id)
-    if task:
-        task.status = DownloadTask.STATUS_FAILED
-        task.error_msg = "Task cancelled by user"
+    if not task or task.status in (DownloadTask.STATUS_COMPLETED, DownloadTask.STATUS_UPLOADING):
+        return False
+    if not _stop_task(task_id, _STOP_CANCEL):
+        # Not queued or running (paused/failed): only its leftovers remain.
+        _mark_cancelled(task)
+    return True
+
+
+def cancel_pending_tasks(username: str | None = None) -> int:
+    """Cancel every task still waiting in the queue; returns how many."""
+    cancelled = 0
+    for task in get_task_store().list_tasks(username=username, status=DownloadTask.STATUS_PENDING):
+        if _stop_task(task.task_id, _STOP_CANCEL):
+            cancelled += 1
+    return cancelled
+
+
+def _stop_task(task_id: str, stop: str) -> bool:
+    """Drop a queued task or flag a running one; False if it is neither."""
+    if get_scheduler().cancel(task_id):
+        # Still queued: nothing is running, so it is settled right away.
+        with _task_controls_lock:
+            _task_controls.pop(task_id, None)
+        task = get_task(task_id)
+        if task:
+            _finish_stopped(task, stop)
         return True
-    return False
+    with _task_controls_lock:
+        control = _task_controls.get(task_id)
+        if control is None:
+            return False
+        control.request(stop)
+        if _process_engine is not None:
+            _process_engine.controls[task_id] = stop
+    if stop == _STOP_CANCEL:
+        task = get_task(task_id)
+        if task:
+            # Show the cancellation immediately; the worker cleans up when it stops.
+            task.status = DownloadTask.STATUS_FAILED
+            task.error_msg = _CANCELLED_MSG
+    return True
 
 
 
@@ -521,9 +1335,23 @@ __all__ = [
     "preprocess_url",
     "start_download",
     "start_download_for_task",
+    "set_task_priority",
+    "resume_task",
+    "PRIORITY_URGENT",
+    "PRIORITY_NORMAL",
+    "PRIORITY_BULK",
     "probe_info",
+    "info_cache_stats",
+    "queue_ranks",
+    "queue_dispatched",
+    "queue_version",
+    "media_store_stats",
+    "collect_media_garbage",
+    "host_limit_stats",
     "pause_task",
     "cancel_task",
+    "cancel_pending_tasks",
+    "requeue_uploads",
     "get_task",
     "get_user_tasks",
     "get_all_tasks",
@@ -1,28 +1,67 @@
-"""Send download completion notifications to Feishu (飞书) via webhook."""
+"""Send download completion notifications to Feishu (飞书) via webhook.
 
+Completions go into a SQLite outbox and a background thread posts them as
+digest cards: everything that finished within a short window (or up to a
+batch limit) becomes one card with a summary table. Failed posts stay in
+the outbox and are retried with exponential backoff, also across restarts.
+
+Configured through environment variables:
+
+    SPLAZDL_FEISHU_WEBHOOK_URL      bot webhook; notifications are off when empty
+    SPLAZDL_FEISHU_OUTBOX           outbox database (default "./data/feishu_outbox.db")
+    SPLAZDL_FEISHU_DIGEST_SECONDS   wait this long to coalesce completions (default 10)
+    SPLAZDL_FEISHU_DIGEST_MAX       send at once when this many are pending (default 20)
+"""
+
+import json
 import logging
 import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
 
 log = logging.getLogger(__name__)
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload  TEXT NOT NULL,
+    created  REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL DEFAULT 0
+);
+"""
+
+_NOTIFICATIONS_TOTAL = metrics.Counter(
+    "splazdl_notifications_total", "Completion notifications by outcome (per item).", ("result",),
+)
+_POST_SECONDS = metrics.Histogram(
+    "splazdl_notification_post_seconds", "Latency of Feishu webhook posts.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# Feishu renders at most this many table rows per page.
+_TABLE_PAGE_SIZE = 10
+
+_notifier: "FeishuNotifier | None" = None
+_notifier_lock = threading.Lock()
+
 
 def _webhook_url() -> str:
     return os.environ.get("SPLAZDL_FEISHU_WEBHOOK_URL", "")
 
 
-def _post_card(card: dict) -> None:
-    url = _webhook_url()
-    if not url:
-        return
-    payload = {"msg_type": "interactive", "card": card}
+def _env_float(name: str, default: float) -> float:
     try:
-        resp = requests.post(url, json=payload, timeout=10)
-        resp.raise_for_status()
-        log.info("Feishu notification sent successfully.")
-    except Exception:
-        log.exception("Failed to send Feishu notification")
+        return max(0.0, float(os.environ.get(name, "") or default))
+    except ValueError:
+        return default
 
 
 def _format_size(size_bytes: int) -> str:
@@ -45,26 +84,18 @@ def _format_duration(seconds: int) -> str:
     return f"{m:02d}:{s:02d}"
 
 
-def send_download_complete(
-    *,
-    task_id: str,
-    title: str,
-    url: str,
-    oss_url: str,
-    file_size: int,
-    duration: int,
-) -> None:
-    """Send a download completion card to Feishu."""
+def _single_card(item: dict) -> dict:
+    oss_url = item["oss_url"]
     oss_md = f"[{oss_url}]({oss_url})" if oss_url else "-"
     content_md = (
-        f"**标题**: {title or '未知'}\n\n"
-        f"**原始视频链接**: [{url}]({url})\n\n"
+        f"**标题**: {item['title'] or '未知'}\n\n"
+        f"**原始视频链接**: [{item['url']}]({item['url']})\n\n"
         f"**OSS视频链接**: {oss_md}\n\n"
-        f"**视频大小**: {_format_size(file_size)}\n\n"
-        f"**视频时长**: {_format_duration(duration)}\n\n"
-        f"**任务ID**: {task_id}"
+        f"**视频大小**: {_format_size(item['file_size'])}\n\n"
+        f"**视频时长**: {_format_duration(item['duration'])}\n\n"
+        f"**任务ID**: {item['task_id']}"
     )
-    card = {
+    return {
         "header": {
             "title": {"tag": "plain_text", "content": "SplazDL 下载完成 ✅"},
             "template": "green",
@@ -73,4 +104,278 @@ def send_download_complete(
             {"tag": "markdown", "content": content_md},
         ],
     }
-    _post_card(card)
+
+
+def _md_link(text: str, url: str) -> str:
+    text = (text or "未知").replace("[", "【").replace("]", "】")
+    return f"[{text}]({url})" if url else text
+
+
+def build_card(items: list[dict]) -> dict:
+    """One completion keeps the detailed card; several become a digest table."""
+    if len(items) == 1:
+        return _single_card(items[0])
+    total = sum(item["file_size"] for item in items)
+    rows = [
+        {
+            "title": _md_link(item["title"], item["url"]),
+            "size": _format_size(item["file_size"]),
+            "duration": _format_duration(item["duration"]),
+            "oss": _md_link("链接", item["oss_url"]) if item["oss_url"] else "-",
+        }
+        for item in items
+    ]
+    return {
+        "header": {
+            "title": {"tag": "plain_text", "content": f"SplazDL 下载完成 ✅ × {len(items)}"},
+            "template": "green",
+        },
+        "elements": [
+            {"tag": "markdown", "content": f"**共 {len(items)} 个任务**，合计 {_format_size(total)}"},
+            {
+                "tag": "table",
+                "page_size": min(len(rows), _TABLE_PAGE_SIZE),
+                "row_height": "low",
+                "header_style": {"bold": True},
+                "columns": [
+                    {"name": "title", "display_name": "标题", "data_type": "lark_md"},
+                    {"name": "size", "display_name": "大小", "data_type": "text"},
+                    {"name": "duration", "display_name": "时长", "data_type": "text"},
+                    {"name": "oss", "display_name": "OSS", "data_type": "lark_md"},
+                ],
+                "rows": rows,
+            },
+        ],
+    }
+
+
+class FeishuNotifier:
+    """Background sender draining a durable outbox into digest cards.
+
+    A batch is sent when ``max_batch`` items are pending or the oldest has
+    waited ``window`` seconds. A failed batch is retried after
+    ``backoff * 2**attempts`` seconds (capped at ``max_backoff``) and
+    dropped after ``max_attempts``.
+    """
+
+    def __init__(
+        self,
+        webhook_url: str,
+        outbox_path: str | Path,
+        window: float = 10.0,
+        max_batch: int = 20,
+        backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        max_attempts: int = 8,
+        timeout: float = 10.0,
+    ):
+        self.webhook_url = webhook_url
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max(1, max_attempts)
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        Path(outbox_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(outbox_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        self._cond = threading.Condition()
+        self._flushing = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="feishu-notifier", daemon=True)
+        self._thread.start()
+
+    # ---------- public API ----------
+
+    def enqueue(self, item: dict) -> None:
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO outbox (payload, created) VALUES (?, ?)",
+                (json.dumps(item, ensure_ascii=False), time.time()),
+            )
+        _NOTIFICATIONS_TOTAL.labels("queued").inc()
+        with self._cond:
+            self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._db_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Send without waiting for the digest window, including retries.
+
+        Returns True once the outbox is empty, False on timeout.
+        """
+        return self._drain(timeout, lambda: self.pending() > 0)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Send what is due now; items waiting on a retry stay in the outbox."""
+        self._drain(timeout, self._due)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self._session.close()
+        with self._db_lock:
+            self._conn.close()
+
+    # ---------- sender ----------
+
+    def _drain(self, timeout: float, busy) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+        try:
+            while busy() and time.monotonic() < deadline:
+                with self._cond:
+                    self._cond.wait(0.05)
+            return not busy()
+        finally:
+            with self._cond:
+                self._flushing -= 1
+
+    def _due(self) -> bool:
+        with self._db_lock:
+            row = self._conn.execute("SELECT 1 FROM outbox WHERE next_try <= ? LIMIT 1", (time.time(),)).fetchone()
+        return row is not None
+
+    def _next_batch(self) -> tuple[list[tuple[int, int, dict]], float]:
+        """Due items to send now, or ([], seconds to wait)."""
+        now = time.time()
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT id, attempts, payload, created FROM outbox WHERE next_try <= ? ORDER BY id LIMIT ?",
+                (now, self.max_batch),
+            ).fetchall()
+            if not rows:
+                nxt = self._conn.execute("SELECT MIN(next_try) FROM outbox").fetchone()[0]
+                return [], (nxt - now) if nxt is not None else 60.0
+        wait = rows[0][3] + self.window - now
+        if len(rows) < self.max_batch and wait > 0 and not self._flushing:
+            return [], wait
+        return [(row_id, attempts, json.loads(payload)) for row_id, attempts, payload, _ in rows], 0.0
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+            try:
+                batch, wait = self._next_batch()
+            except sqlite3.ProgrammingError:
+                return  # closed underneath us
+            if not batch:
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(min(max(wait, 0.01), 60.0))
+                continue
+            ok = self._post([item for _, _, item in batch])
+            self._settle(batch, ok)
+            with self._cond:
+                self._cond.notify_all()
+
+    def _post(self, items: list[dict]) -> bool:
+        payload = {"msg_type": "interactive", "card": build_card(items)}
+        started = time.monotonic()
+        try:
+            resp = self._session.post(self.webhook_url, json=payload, timeout=self.timeout)
+            _POST_SECONDS.observe(time.monotonic() - started)
+            resp.raise_for_status()
+            body = resp.json() if resp.content else {}
+            # Feishu answers HTTP 200 with a non-zero code on errors such as rate limits.
+            code = body.get("code", body.get("StatusCode", 0))
+            if code:
+                log.warning("Feishu rejected notification (code %s): %s", code, body.get("msg", ""))
+                return False
+        except Exception:
+            log.exception("Failed to send Feishu notification")
+            return False
+        log.info("Feishu notification sent (%d item(s)).", len(items))
+        return True
+
+    def _settle(self, batch: list[tuple[int, int, dict]], ok: bool) -> None:
+        now = time.time()
+        done = [row_id for row_id, _, _ in batch] if ok else []
+        retry = []
+        _NOTIFICATIONS_TOTAL.labels("sent" if ok else "failed").inc(len(batch))
+        for row_id, attempts, _ in ([] if ok else batch):
+            if attempts + 1 >= self.max_attempts:
+                log.error("Dropping Feishu notification %s after %d attempts", row_id, attempts + 1)
+                _NOTIFICATIONS_TOTAL.labels("dropped").inc()
+                done.append(row_id)
+            else:
+                delay = min(self.backoff * 2 ** attempts, self.max_backoff)
+                retry.append((now + delay, row_id))
+        with self._db_lock, self._conn:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in done])
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_try = ? WHERE id = ?", retry,
+            )
+
+
+def get_notifier() -> FeishuNotifier | None:
+    """Shared notifier, started on first use; None when no webhook is set."""
+    global _notifier
+    url = _webhook_url()
+    if not url:
+        return None
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                _notifier = FeishuNotifier(
+                    url,
+                    os.environ.get("SPLAZDL_FEISHU_OUTBOX", "./data/feishu_outbox.db"),
+                    window=_env_float("SPLAZDL_FEISHU_DIGEST_SECONDS", 10.0),
+                    max_batch=int(_env_float("SPLAZDL_FEISHU_DIGEST_MAX", 20)),
+                )
+    return _notifier
+
+
+def _collect_metrics():
+    notifier = _notifier
+    if notifier is not None:
+        yield "splazdl_notifications_pending", "gauge", "Notifications waiting in the outbox.", [({}, notifier.pending())]
+
+
+metrics.add_collector(_collect_metrics)
+
+
+def close_notifier() -> None:
+    global _notifier
+    with _notifier_lock:
+        if _notifier is not None:
+            _notifier.close()
+            _notifier = None
+
+
+def send_download_complete(
+    *,
+    task_id: str,
+    title: str,
+    url: str,
+    oss_url: str,
+    file_size: int,
+    duration: int,
+) -> None:
+    """Queue a download completion for the next Feishu digest card."""
+    notifier = get_notifier()
+    if notifier is None:
+        return
+    notifier.enqueue({
+        "task_id": task_id,
+        "title": title,
+        "url": url,
+        "oss_url": oss_url,
+        "file_size": file_size,
+        "duration": duration,
+    })
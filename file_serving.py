@@ -0,0 +1,66 @@
+"""Serve downloaded media with Range, strong ETags and conditional GET."""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+# 64 KiB (Starlette's default) means ~16k event-loop round trips per GB.
+CHUNK_SIZE = 1024 * 1024
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse with larger read chunks.
+
+    Range and multipart/byteranges handling comes from Starlette. On ASGI
+    servers that offer the ``http.response.pathsend`` extension, full-file
+    responses are handed to the server, which can use ``sendfile``.
+    """
+
+    chunk_size = CHUNK_SIZE
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong validator from file identity: device, inode, size and mtime."""
+    return f'"{st.st_dev:x}-{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison.
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def _not_modified_since(header: str, st: os.stat_result) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    return int(st.st_mtime) <= since.timestamp()
+
+
+def serve_file(request: Request, path: Path, filename: str) -> Response:
+    """Respond with 304, a (multi-)range, or the whole file."""
+    st = path.stat()
+    headers = {
+        "etag": file_etag(st),
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+        "cache-control": "private, no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, headers["etag"])
+    else:
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, st)
+    if not_modified and request.method in ("GET", "HEAD"):
+        return Response(status_code=304, headers=headers)
+
+    return MediaFileResponse(path=str(path), filename=filename, headers=headers, stat_result=st)
@@ -0,0 +1,167 @@
+"""Per-host concurrency caps and token-bucket request rates."""
+
+import math
+import threading
+import time
+from typing import Callable
+from urllib.parse import urlparse
+
+from config import HostLimitConfig
+
+DEFAULT_HOST = "default"
+
+KIND_DOWNLOAD = "download"
+KIND_PROBE = "probe"
+
+# How often ``release`` drops idle host states (seconds).
+_SWEEP_INTERVAL = 60.0
+
+
+class TokenBucket:
+    """Classic token bucket; ``rate`` tokens/second up to ``burst``. rate <= 0 disables it."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float]):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self._tokens -= 1
+
+    def is_full(self) -> bool:
+        """True when the bucket is indistinguishable from a fresh one."""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        return self._tokens >= self.burst
+
+
+class _HostState:
+    def __init__(self, cfg: HostLimitConfig, clock: Callable[[], float]):
+        self.cfg = cfg
+        self.bucket = TokenBucket(cfg.rate, cfg.burst, clock)
+        self.active = {KIND_DOWNLOAD: 0, KIND_PROBE: 0}
+
+    def is_idle(self) -> bool:
+        return not any(self.active.values()) and self.bucket.is_full()
+
+    def cap(self, kind: str) -> int:
+        if kind == KIND_PROBE:
+            return self.cfg.max_probes if self.cfg.max_probes > 0 else self.cfg.max_concurrent
+        return self.cfg.max_concurrent
+
+
+class HostLimiter:
+    """Non-blocking admission per host; used by the scheduler and by probes.
+
+    Every admitted request takes one token from the host's bucket (shared by
+    probes and downloads) and one slot from the host's per-kind concurrency
+    pool. Hosts are matched by domain suffix against the configured keys
+    (``www.douyin.com`` -> ``douyin.com``); any other host gets its own
+    state using the ``default`` limits. States of hosts with no holders and
+    a full bucket are dropped by a periodic sweep in ``release``, so a
+    long-running server that sees many distinct hosts does not keep them all.
+    """
+
+    def __init__(self, limits: dict[str, HostLimitConfig], clock: Callable[[], float] = time.monotonic):
+        self._limits = dict(limits)
+        self._limits.setdefault(DEFAULT_HOST, HostLimitConfig())
+        self._clock = clock
+        self._states: dict[str, _HostState] = {}
+        self._cond = threading.Condition()
+        self._next_sweep = clock() + _SWEEP_INTERVAL
+
+    def host_key(self, url: str) -> str:
+        hostname = (urlparse(url).hostname or "").lower()
+        host = hostname
+        while host:
+            if host in self._limits:
+                return host
+            _, _, host = host.partition(".")
+        return hostname or DEFAULT_HOST
+
+    def _state(self, key: str) -> _HostState:
+        state = self._states.get(key)
+        if state is None:
+            cfg = self._limits.get(key, self._limits[DEFAULT_HOST])
+            state = self._states[key] = _HostState(cfg, self._clock)
+        return state
+
+    def try_acquire(self, key: str, kind: str = KIND_DOWNLOAD) -> float:
+        """Take a slot and a token if possible.
+
+        Returns 0.0 when admitted; otherwise how long to wait before retrying
+        (``math.inf`` when the host is at its concurrency cap and only a
+        ``release`` can help).
+        """
+        with self._cond:
+            state = self._state(key)
+            cap = state.cap(kind)
+            if cap > 0 and state.active[kind] >= cap:
+                return math.inf
+            wait = state.bucket.wait_time()
+            if wait > 0:
+                return wait
+            state.bucket.take()
+            state.active[kind] += 1
+            return 0.0
+
+    def acquire(self, key: str, kind: str = KIND_PROBE, timeout: float | None = None) -> bool:
+        """Blocking variant of ``try_acquire``."""
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._cond:
+            while True:
+                wait = self.try_acquire(key, kind)
+                if wait == 0:
+                    return True
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(None if math.isinf(wait) else wait)
+
+    def release(self, key: str, kind: str = KIND_DOWNLOAD) -> None:
+        with self._cond:
+            state = self._state(key)
+            state.active[kind] = max(0, state.active[kind] - 1)
+            self._sweep()
+            self._cond.notify_all()
+
+    def _sweep(self) -> None:
+        """Drop idle host states; a new state for the host would be identical."""
+        now = self._clock()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + _SWEEP_INTERVAL
+        for key in [k for k, state in self._states.items() if state.is_idle()]:
+            del self._states[key]
+
+    def stats(self) -> dict[str, dict]:
+        with self._cond:
+            return {
+                key: {
+                    "downloads": state.active[KIND_DOWNLOAD],
+                    "probes": state.active[KIND_PROBE],
+                    "max_concurrent": state.cfg.max_concurrent,
+                    "rate": state.cfg.rate,
+                }
+                for key, state in self._states.items()
+            }
@@ -0,0 +1,208 @@
+"""Content-addressed media blobs shared by all users' task directories."""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+_HASH_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest   TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    ext      TEXT NOT NULL,
+    title    TEXT NOT NULL DEFAULT '',
+    duration INTEGER NOT NULL DEFAULT 0,
+    oss_url  TEXT NOT NULL DEFAULT '',
+    hits     INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS media_keys (
+    key    TEXT PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES blobs(digest)
+);
+"""
+
+
+@dataclass
+class MediaBlob:
+    digest: str
+    size: int
+    ext: str
+    path: Path
+    title: str = ""
+    duration: int = 0
+    oss_url: str = ""
+
+
+def hash_file(path: Path) -> str:
+    """sha256 of a file, read in fixed-size chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Hardlink ``src`` to ``dest`` (replacing it); copy across filesystems."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.link")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+class MediaStore:
+    """Blob store under ``root`` keyed by sha256, plus a media-key index.
+
+    A media key identifies "this media in this output variant", e.g. the
+    task URL or ``extractor:id`` combined with quality/format options. Task
+    files are hardlinks to the blob, so a clip downloaded by five users is
+    stored and fetched once.
+
+    A blob whose only link is the store's own (``st_nlink == 1``) is no
+    longer used by any task and is reclaimed by ``collect_garbage``. Task
+    files moved to ``.trash`` still link their blob until the trash is
+    emptied.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "index.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def _to_blob(self, row: sqlite3.Row) -> MediaBlob:
+        return MediaBlob(
+            digest=row["digest"],
+            size=row["size"],
+            ext=row["ext"],
+            path=self._blob_path(row["digest"]),
+            title=row["title"],
+            duration=row["duration"],
+            oss_url=row["oss_url"],
+        )
+
+    def lookup(self, keys: list[str]) -> MediaBlob | None:
+        """First indexed blob for any of ``keys`` whose file still exists."""
+        if not keys:
+            return None
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT b.* FROM media_keys k JOIN blobs b ON b.digest = k.digest WHERE k.key IN ({marks})",
+                keys,
+            ).fetchall()
+        for row in rows:
+            blob = self._to_blob(row)
+            if blob.path.exists():
+                return blob
+        return None
+
+    def link(self, blob: MediaBlob, dest: Path, keys: list[str] | None = None) -> Path:
+        """Materialize ``blob`` at ``dest`` instead of downloading it again.
+
+        Raises FileNotFoundError if ``collect_garbage`` reclaimed the blob
+        since it was looked up.
+        """
+        with self._lock:
+            # Linked under the lock so that the garbage collector either sees
+            # the new link or has already removed the blob.
+            _link_or_copy(blob.path, dest)
+            with self._conn:
+                self._conn.execute("UPDATE blobs SET hits = hits + 1 WHERE digest = ?", (blob.digest,))
+                self._index(blob.digest, keys or [])
+        return dest
+
+    def ingest(self, path: Path, keys: list[str], title: str = "", duration: int = 0) -> MediaBlob:
+        """Add a freshly downloaded file and index it under ``keys``.
+
+        If identical bytes are already stored (two users fetched the same
+        clip concurrently), ``path`` is replaced by a link to that blob.
+        """
+        digest = hash_file(path)
+        blob_path = self._blob_path(digest)
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and blob_path.exists():
+                _link_or_copy(blob_path, path)
+            else:
+                _link_or_copy(path, blob_path)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO blobs (digest, size, ext, title, duration) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(digest) DO NOTHING",
+                    (digest, path.stat().st_size, path.suffix, title, duration),
+                )
+                self._index(digest, keys)
+            row = self._conn.execute("SELECT * FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return self._to_blob(row)
+
+    def _index(self, digest: str, keys: list[str]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO media_keys (key, digest) VALUES (?, ?)",
+            [(key, digest) for key in keys],
+        )
+
+    def set_oss_url(self, digest: str, oss_url: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE blobs SET oss_url = ? WHERE digest = ?", (oss_url, digest))
+
+    def collect_garbage(self) -> tuple[int, int]:
+        """Remove blobs no task file links to any more; returns (blobs, bytes) freed.
+
+        Blobs copied in from another filesystem (see ``_link_or_copy``) never
+        have a second link and are dropped as well; that only costs a future
+        dedup hit, the task files are separate copies.
+        """
+        blobs = freed = 0
+        with self._lock:
+            for path in self.objects.glob("*/*"):
+                if path.name.startswith("."):
+                    continue
+                try:
+                    st = path.stat()
+                    if st.st_nlink > 1:
+                        continue
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                blobs += 1
+                freed += st.st_size
+            gone = [
+                (row["digest"],)
+                for row in self._conn.execute("SELECT digest FROM blobs").fetchall()
+                if not self._blob_path(row["digest"]).exists()
+            ]
+            with self._conn:
+                self._conn.executemany("DELETE FROM media_keys WHERE digest = ?", gone)
+                self._conn.executemany("DELETE FROM blobs WHERE digest = ?", gone)
+        return blobs, freed
+
+    def stats(self) -> dict:
+        """Blob count, stored bytes, and bytes saved by reusing blobs."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS bytes, "
+                "COALESCE(SUM(size * hits), 0) AS saved_bytes, COALESCE(SUM(hits), 0) AS hits FROM blobs"
+            ).fetchone()
+        return dict(row)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,208 @@
+"""Minimal Prometheus metrics for the download pipeline.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text exposition format by ``render()``. Updates are a lock plus an add on a
+labelled child, so they can sit in hot paths: bind the child once
+(``DOWNLOAD_BYTES.labels(host, user)``) and call ``inc`` on it.
+
+Values that already live elsewhere (queue depth, cache size, ...) are not
+mirrored into gauges; ``add_collector`` registers a function that reads
+them when ``/metrics`` is scraped.
+
+Inside download worker processes ``set_relay`` forwards every update to the
+parent (see process_engine), which applies it with ``apply``.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# (name, type, help, [(labels, value), ...]) produced by a collector at scrape time
+Sample = tuple[str, str, str, list[tuple[dict[str, str], float]]]
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+_metrics: dict[str, "_Metric"] = {}
+_collectors: list[Callable[[], Iterable[Sample]]] = []
+_registry_lock = threading.Lock()
+_relay: Callable[[str, tuple, str, float], None] | None = None
+
+
+def set_relay(relay: Callable[[str, tuple, str, float], None] | None) -> None:
+    """Send updates to ``relay(name, label_values, op, amount)`` instead of recording them."""
+    global _relay
+    _relay = relay
+
+
+def apply(name: str, label_values: tuple, op: str, amount: float) -> None:
+    """Record an update relayed from a worker process."""
+    metric = _metrics.get(name)
+    if metric is not None:
+        getattr(metric.labels(*label_values), op)(amount)
+
+
+def add_collector(collect: Callable[[], Iterable[Sample]]) -> None:
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Child:
+    __slots__ = ("_metric", "_labels", "_lock", "value")
+
+    def __init__(self, metric: "_Metric", label_values: tuple):
+        self._metric = metric
+        self._labels = label_values
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if _relay is not None:
+            _relay(self._metric.name, self._labels, "inc", amount)
+            return
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        if _relay is not None:
+            _relay(self._metric.name, self._labels, "set", value)
+            return
+        self.value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_metric", "_labels", "_lock", "counts", "sum", "count")
+
+    def __init__(self, metric: "Histogram", label_values: tuple):
+        self._metric = metric
+        self._labels = label_values
+        self._lock = threading.Lock()
+        self.counts = [0] * len(metric.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        if _relay is not None:
+            _relay(self._metric.name, self._labels, "observe", value)
+            return
+        index = bisect_left(self._metric.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    type = ""
+    _child_class: type = _Child
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            if name in _metrics:
+                raise ValueError(f"Metric {name} is already registered")
+            _metrics[name] = self
+
+    def labels(self, *label_values: str):
+        """Child for these label values (created on first use)."""
+        key = tuple(str(v) for v in label_values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._child_class(self, key))
+        return child
+
+    def _render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+    _child_class = _HistogramChild
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels((*self.labelnames, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels((*self.labelnames, "le"), (*key, "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render() -> str:
+    """All metrics and collector samples in the Prometheus text format."""
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+    lines: list[str] = []
+    for metric in metrics:
+        lines += metric._render()
+    for collect in collectors:
+        for name, kind, documentation, samples in collect():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -1,13 +1,18 @@
 """
-数据模型模块 - 纯内存存储版本
+数据模型模块
+
+任务的增删查统一走可插拔的存储后端（见 task_store.py），由 config.yaml 的 storage 配置选择。
 """
 
 import hashlib
+import shutil
 import threading
 import uuid
+from array import array
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Iterable, NamedTuple
 
 from config import get_config
 
@@ -31,12 +36,16 @@ class User:
         return self.role == "admin"
 
 
+_MISSING = object()
+
+
 @dataclass
 class DownloadTask:
     """下载任务（内存存储）"""
     STATUS_PENDING = "pending"
     STATUS_DOWNLOADING = "downloading"
     STATUS_PAUSED = "paused"
+    STATUS_UPLOADING = "uploading"  # 文件已就绪，等待/正在上传 OSS
     STATUS_COMPLETED = "completed"
     STATUS_FAILED = "failed"
 
@@ -46,21 +55,327 @@ class DownloadTask:
     title: str = ""
     status: str = STATUS_PENDING
     progress: float = 0.0
-    speed: str = ""
-    eta: str = ""
+    downloaded_bytes: int = 0
+    total_bytes: int = 0  # 未知时为 0（可能是 yt-dlp 的估算值）
+    speed: float = 0.0  # 下载速度（字节/秒），展示时再格式化
+    eta: int = 0  # 预计剩余秒数，0 表示未知
     error_msg: str = ""
     file_path: str = ""
     file_size: int = 0
     duration: int = 0
     oss_url: str = ""
+    extract_calls: int = 0  # 本任务触发的 extractor 调用次数
+    priority: int = 1  # 调度优先级：0 加急 / 1 普通 / 2 批量
+    quality: str = "best"  # 提交时的画质，继续下载时沿用
+    options: dict = field(default_factory=dict)  # 提交时的下载选项，继续下载时沿用
+    dedup_bytes: int = 0  # 命中去重存储、未重新下载的字节数
+    media_digest: str = ""  # 文件在内容存储中的 sha256（未参与去重时为空）
+    upload_progress: float = 0.0  # OSS 上传进度（%），与下载进度分开
+    upload_speed: float = 0.0  # OSS 上传吞吐（字节/秒）
+    timings: list = field(default_factory=list)  # 各阶段耗时 [{"stage", "start", "seconds"}]，见 timings.py
     created_at: datetime = field(default_factory=datetime.now)
 
+    def __setattr__(self, name, value):
+        old = self.__dict__.get(name, _MISSING)
+        object.__setattr__(self, name, value)
+        # 构造阶段（old 为 _MISSING）不触发；之后的字段变更通知存储后端
+        if old is not _MISSING and old != value:
+            _on_task_changed(self, name, old)
+
+    @property
+    def version(self) -> int:
+        """最近一次变更时的全局版本号（见 TaskChangeFeed）"""
+        return task_change_feed.version_of(self.task_id)
+
+
+# 影响筛选 / 排序 / 分页归属的字段；只有这些字段变化才可能让任务换页
+RESHAPE_FIELDS = frozenset({"username", "url", "status", "title", "file_size", "created_at"})
 
-# ============ 内存存储 ============
+
+class TaskChanges(NamedTuple):
+    version: int
+    changed: list[str]  # 任意字段变更过的任务（新的在前）
+    removed: list[str]  # 已删除的任务
+    reshaped: list[str]  # 新建或 RESHAPE_FIELDS 变更过的任务（changed 的子集）
+
+
+def _newer_than(versions: dict[str, int], version: int) -> list[str]:
+    result = []
+    for task_id in reversed(versions):
+        if versions[task_id] <= version:
+            break
+        result.append(task_id)
+    return result
+
+
+class TaskChangeFeed:
+    """任务变更流
+
+    每次任务新增/字段变更/删除都让全局版本号加一，并记下该任务最后变更时的版本。
+    页面保存自己看到的版本，定时用 changes_since 取增量：无变化时只是一次整数比较，
+    有变化时只拿到变更过的任务 ID，开销与变更数量相关而与任务总数无关。
+    """
+
+    def __init__(self, max_removed: int = 10000):
+        self._lock = threading.Lock()
+        self.version = 0
+        # 按版本递增排列（变更时先删后插），可从尾部倒序扫描
+        self._changed: dict[str, int] = {}
+        self._reshaped: dict[str, int] = {}
+        self._removed: dict[str, int] = {}
+        self._max_removed = max_removed
+        # 早于该版本的删除记录已被丢弃，需要全量刷新
+        self._floor = 0
+
+    def touch(self, task_id: str, reshaped: bool = False) -> None:
+        with self._lock:
+            self.version += 1
+            self._changed.pop(task_id, None)
+            self._changed[task_id] = self.version
+            if reshaped:
+                self._reshaped.pop(task_id, None)
+                self._reshaped[task_id] = self.version
+
+    def remove(self, task_ids: list[str]) -> None:
+        with self._lock:
+            for task_id in task_ids:
+                self.version += 1
+                self._changed.pop(task_id, None)
+                self._reshaped.pop(task_id, None)
+                self._removed.pop(task_id, None)
+                self._removed[task_id] = self.version
+            while len(self._removed) > self._max_removed:
+                oldest = next(iter(self._removed))
+                self._floor = self._removed.pop(oldest)
+
+    def reset(self) -> None:
+        """丢弃全部记录（如更换存储后端），所有订阅方下次都会全量刷新"""
+        with self._lock:
+            self.version += 1
+            self._changed.clear()
+            self._reshaped.clear()
+            self._removed.clear()
+            self._floor = self.version
+
+    def version_of(self, task_id: str) -> int:
+        return self._changed.get(task_id, 0)
+
+    def changes_since(self, version: int) -> TaskChanges | None:
+        """version 之后的增量；返回 None 表示记录已不完整，需要全量刷新"""
+        with self._lock:
+            if version < self._floor:
+                return None
+            return TaskChanges(
+                self.version,
+                _newer_than(self._changed, version),
+                _newer_than(self._removed, version),
+                _newer_than(self._reshaped, version),
+            )
+
+
+task_change_feed = TaskChangeFeed()
+
+
+def _bigrams(text: str) -> set[str]:
+    # 各字段以 \0 分隔，跨字段的二元组不计入
+    return {part[i:i + 2] for part in text.split("\0") for i in range(len(part) - 1)}
+
+
+class TaskSearchIndex:
+    """任务关键词搜索索引（二元组倒排索引）
+
+    对 标题 / 链接 / 任务 ID 的 casefold 文本建立二元组 -> 文档号 的倒排表。
+    中文标题以双字词居多，二元组能直接命中；查询时取关键词中最稀有二元组的倒排表作候选，
+    再对候选做一次子串校验，所以任意位置（含前缀）的中英文子串都能匹配，耗时只与候选数相关。
+    单字关键词没有二元组可用，退化为扫描紧凑的文本列表。
+
+    倒排表用 array('I') 只追加：标题改动只补新增的二元组，失效条目由校验过滤，
+    积累过多时整体重建。任务字段变更（_on_task_changed）、新建、删除时增量维护；
+    首次搜索时才从存储后端加载全部任务（ensure）。
+    """
+
+    # 变更后需要更新索引的字段
+    FIELDS = frozenset({"username", "status", "title", "url"})
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self._clear()
+
+    def _clear(self) -> None:
+        self._doc_of: dict[str, int] = {}
+        self._ids: list[str] = []
+        self._texts: list[str | None] = []  # 已删除的文档为 None
+        self._users: list[str] = []
+        self._statuses: list[str] = []
+        self._postings: dict[str, array] = {}
+        self._entries = 0
+        self._stale = 0
+
+    # ---------- 维护（调用方持有锁） ----------
+
+    def _add_postings(self, doc: int, grams: set[str]) -> None:
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = posting = array("I")
+            posting.append(doc)
+        self._entries += len(grams)
+
+    def _upsert(self, task_id: str, username: str, status: str, title: str, url: str) -> None:
+        text = "\0".join((title.casefold(), url.casefold(), task_id.casefold()))
+        doc = self._doc_of.get(task_id)
+        if doc is None:
+            doc = self._doc_of[task_id] = len(self._ids)
+            self._ids.append(task_id)
+            self._texts.append(text)
+            self._users.append(username)
+            self._statuses.append(status)
+            self._add_postings(doc, _bigrams(text))
+            return
+        self._users[doc] = username
+        self._statuses[doc] = status
+        old = self._texts[doc]
+        if old != text:
+            old_grams, grams = _bigrams(old), _bigrams(text)
+            self._texts[doc] = text
+            self._add_postings(doc, grams - old_grams)
+            self._stale += len(old_grams - grams)
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if self._stale <= max(self._entries // 2, 10000):
+            return
+        live = [
+            (task_id, self._users[doc], self._statuses[doc], self._texts[doc])
+            for task_id, doc in self._doc_of.items()
+        ]
+        self._clear()
+        for task_id, username, status, text in live:
+            doc = self._doc_of[task_id] = len(self._ids)
+            self._ids.append(task_id)
+            self._texts.append(text)
+            self._users.append(username)
+            self._statuses.append(status)
+            self._add_postings(doc, _bigrams(text))
+
+    # ---------- 公共接口 ----------
+
+    def ensure(self, load: Callable[[], Iterable[tuple[str, str, str, str, str]]]) -> None:
+        """首次使用时加载全部任务；load 返回 (task_id, username, status, title, url)"""
+        if self.ready:
+            return
+        with self._lock:
+            if self.ready:
+                return
+            self._clear()
+            for row in load():
+                self._upsert(*row)
+            self.ready = True
+
+    def update(self, task: "DownloadTask") -> None:
+        # 加载期间的变更会等待锁，加载完成后再应用，不会丢失
+        with self._lock:
+            if self.ready:
+                self._upsert(task.task_id, task.username, task.status, task.title or "", task.url)
+
+    def remove(self, task_ids: Iterable[str]) -> None:
+        with self._lock:
+            if not self.ready:
+                return
+            for task_id in task_ids:
+                doc = self._doc_of.pop(task_id, None)
+                if doc is not None:
+                    self._stale += len(_bigrams(self._texts[doc]))
+                    self._texts[doc] = None
+            self._maybe_compact()
+
+    def reset(self) -> None:
+        """丢弃索引（如更换存储后端），下次搜索时重新加载"""
+        with self._lock:
+            self.ready = False
+            self._clear()
+
+    def search(self, keyword: str, username: str | None = None, status: str | None = None) -> set[str]:
+        """标题 / 链接 / 任务 ID 中包含 keyword（不区分大小写）的任务 ID"""
+        keyword = keyword.strip().casefold()
+        with self._lock:
+            if len(keyword) < 2:
+                candidates: Iterable[int] = range(len(self._ids))
+            else:
+                postings = [self._postings.get(gram) for gram in _bigrams(keyword)]
+                if not all(postings):
+                    return set()
+                candidates = min(postings, key=len)
+            texts, users, statuses, ids = self._texts, self._users, self._statuses, self._ids
+            return {
+                ids[doc] for doc in candidates
+                if (text := texts[doc]) is not None and keyword in text
+                and (username is None or users[doc] == username)
+                and (status is None or statuses[doc] == status)
+            }
+
+
+task_search_index = TaskSearchIndex()
+
+
+# ============ 存储 ============
 
 _users: dict[str, User] = {}
-_tasks: dict[str, DownloadTask] = {}
-_lock = threading.Lock()
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_task_store():
+    """获取任务存储后端（按配置延迟创建）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from task_store import MemoryTaskStore, SqliteTaskStore
+
+                storage = get_config().storage
+                if storage.backend == "sqlite":
+                    _store = SqliteTaskStore(storage.path, flush_interval=storage.flush_interval)
+                else:
+                    _store = MemoryTaskStore()
+    return _store
+
+
+def peek_task_store():
+    """已创建的任务存储；尚未创建时返回 None，不会按配置去创建"""
+    return _store
+
+
+def set_task_store(store) -> None:
+    """替换任务存储后端（测试/基准用），旧后端会先落盘关闭"""
+    global _store
+    with _store_lock:
+        if _store is not None and _store is not store:
+            _store.close()
+        _store = store
+    task_change_feed.reset()
+    task_search_index.reset()
+
+
+def close_task_store() -> None:
+    """落盘并关闭任务存储"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+    task_search_index.reset()
+
+
+def _on_task_changed(task: "DownloadTask", name: str, old) -> None:
+    store = _store
+    if store is not None:
+        store.on_task_changed(task, name, old)
+    task_change_feed.touch(task.task_id, name in RESHAPE_FIELDS)
+    if name in TaskSearchIndex.FIELDS:
+        task_search_index.update(task)
 
 
 def init_users():
@@ -91,8 +406,9 @@ def create_task(username: str, url: str) -> DownloadTask:
         username=username,
         url=url,
     )
-    with _lock:
-        _tasks[task.task_id] = task
+    task = get_task_store().add(task)
+    task_change_feed.touch(task.task_id, reshaped=True)
+    task_search_index.update(task)
     return task
 
 
@@ -102,40 +418,62 @@ def create_tasks_if_new(username: str, urls: list[str]) -> tuple[list[DownloadTa
     Returns:
         (created_tasks, skipped_count)
     """
-    created: list[DownloadTask] = []
-    skipped_count = 0
-    with _lock:
-        existing_urls = {t.url for t in _tasks.values() if t.username == username}
-        for url in urls:
-            if url in existing_urls:
-                skipped_count += 1
-                continue
-            task = DownloadTask(
-                task_id=generate_task_id(),
-                username=username,
-                url=url,
-            )
-            _tasks[task.task_id] = task
-            created.append(task)
-            existing_urls.add(url)
-    return created, skipped_count
+    created, skipped = get_task_store().add_if_new(username, urls)
+    for task in created:
+        task_change_feed.touch(task.task_id, reshaped=True)
+        task_search_index.update(task)
+    return created, skipped
 
 
 def get_task(task_id: str) -> DownloadTask | None:
     """获取任务"""
-    return _tasks.get(task_id)
+    return get_task_store().get(task_id)
 
 
 def get_user_tasks(username: str) -> list[DownloadTask]:
     """获取用户的所有任务"""
-    with _lock:
-        return [t for t in _tasks.values() if t.username == username]
+    return get_task_store().list_tasks(username=username)
 
 
 def get_all_tasks() -> list[DownloadTask]:
     """获取所有任务"""
-    with _lock:
-        return list(_tasks.values())
+    return get_task_store().list_tasks()
+
+
+def query_tasks(
+    username: str | None = None,
+    status: str | None = None,
+    keyword: str = "",
+    sort: str = "created_at",
+    descending: bool = False,
+    offset: int = 0,
+    limit: int | None = None,
+) -> tuple[list[DownloadTask], int]:
+    """分页查询任务
+
+    Args:
+        keyword: 在标题 / 链接 / 任务 ID 中做不区分大小写的子串匹配（走 task_search_index）
+        sort: created_at / status / file_size
+
+    Returns:
+        (当前页任务, 符合条件的总数)
+    """
+    store = get_task_store()
+    task_ids = None
+    if keyword.strip():
+        load_search_index()
+        task_ids = task_search_index.search(keyword, username=username, status=status)
+        if not task_ids:
+            return [], 0
+    return store.query_tasks(
+        username=username, status=status, task_ids=task_ids,
+        sort=sort, descending=descending, offset=offset, limit=limit,
+    )
+
+
+def load_search_index() -> None:
+    """加载关键词搜索索引（首次搜索时自动进行，也可在启动时提前调用）"""
+    task_search_index.ensure(get_task_store().search_rows)
 
 
 def get_existing_urls(username: str | None = None) -> set[str]:
@@ -144,25 +482,19 @@ def get_existing_urls(username: str | None = None) -> set[str]:
     Args:
         username: 如果指定，只返回该用户的链接；否则返回所有链接
     """
-    with _lock:
-        if username:
-            return {t.url for t in _tasks.values() if t.username == username}
-        return {t.url for t in _tasks.values()}
+    return get_task_store().existing_urls(username)
 
 
 def get_completed_tasks(username: str | None = None) -> list[DownloadTask]:
     """获取已完成的任务"""
-    with _lock:
-        tasks = _tasks.values()
-        if username:
-            tasks = [t for t in tasks if t.username == username]
-        return [t for t in tasks if t.status == DownloadTask.STATUS_COMPLETED]
+    return get_task_store().list_tasks(username=username, status=DownloadTask.STATUS_COMPLETED)
 
 
 def delete_task(task_id: str):
     """删除任务"""
-    with _lock:
-        _tasks.pop(task_id, None)
+    get_task_store().delete(task_id)
+    task_change_feed.remove([task_id])
+    task_search_index.remove([task_id])
 
 
 def clear_tasks(username: str | None = None) -> list[str]:
@@ -177,26 +509,17 @@ def clear_tasks(username: str | None = None) -> list[str]:
     config = get_config()
     base_dir = Path(config.download.base_dir)
 
-    with _lock:
-        if username:
-            # 只清空指定用户的任务
-            tasks_to_remove = [t for t in _tasks.values() if t.username == username]
-        else:
-            # 清空所有任务
-            tasks_to_remove = list(_tasks.values())
-
-        # 收集任务目录路径
-        task_dirs = []
-        for t in tasks_to_remove:
-            task_dir = base_dir / t.username / t.task_id
-            if task_dir.exists():
-                task_dirs.append(str(task_dir))
-
-        # 删除任务
-        for task in tasks_to_remove:
-            _tasks.pop(task.task_id, None)
+    removed = get_task_store().clear(username)
+    task_change_feed.remove([t.task_id for t in removed])
+    task_search_index.remove(t.task_id for t in removed)
 
-        return task_dirs
+    # 收集任务目录路径
+    task_dirs = []
+    for t in removed:
+        task_dir = base_dir / t.username / t.task_id
+        if task_dir.exists():
+            task_dirs.append(str(task_dir))
+    return task_dirs
 
 
 def format_size(size_bytes: int) -> str:
@@ -218,3 +541,16 @@ def ensure_user_directory(username: str) -> Path:
     user_dir = Path(config.download.base_dir) / username
     user_dir.mkdir(parents=True, exist_ok=True)
     return user_dir
+
+
+def move_to_trash(task_dir: Path) -> Path:
+    """将任务目录移动到 .trash/<用户名>/ 下，返回移动后的路径"""
+    config = get_config()
+    user_trash_dir = Path(config.download.base_dir) / ".trash" / task_dir.parent.name
+    user_trash_dir.mkdir(parents=True, exist_ok=True)
+    dest = user_trash_dir / task_dir.name
+    if dest.exists():
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        dest = user_trash_dir / f"{task_dir.name}_{timestamp}"
+    shutil.move(str(task_dir), str(dest))
+    return dest
@@ -1,9 +1,28 @@
-"""OSS upload helper for SplazDL."""
+"""OSS upload helper for SplazDL.
+
+Configured through environment variables:
+
+    SPLAZDL_OSS_ACCESS_KEY_ID / SPLAZDL_OSS_ACCESS_KEY_SECRET
+    SPLAZDL_OSS_BUCKET / SPLAZDL_OSS_ENDPOINT / SPLAZDL_OSS_CDN_DOMAIN
+    SPLAZDL_OSS_PREFIX                 object key prefix (default "splazdl")
+    SPLAZDL_OSS_PART_SIZE_MB           multipart part size (default 8)
+    SPLAZDL_OSS_UPLOAD_THREADS         parallel parts per upload (default 4)
+    SPLAZDL_OSS_MULTIPART_THRESHOLD_MB files at least this large use multipart (default 16)
+    SPLAZDL_OSS_CHECKPOINT_DIR         resumable checkpoints (default "./data/oss_checkpoints")
+"""
+import asyncio
 import logging
+import math
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import AsyncIterable, Callable
 from urllib.parse import quote
 
+import metrics
+
 log = logging.getLogger(__name__)
 
 _CONTENT_TYPES = {
@@ -13,9 +32,58 @@ _CONTENT_TYPES = {
     ".opus": "audio/ogg", ".aac": "audio/aac", ".wav": "audio/wav",
 }
 
+_MB = 1024 * 1024
+# OSS allows at most this many parts per multipart upload.
+_MAX_PARTS = 10000
+
+_UPLOADS_TOTAL = metrics.Counter("splazdl_oss_uploads_total", "OSS uploads by outcome.", ("mode", "result"))
+_UPLOAD_BYTES = metrics.Counter("splazdl_oss_upload_bytes_total", "Bytes stored on OSS by successful uploads.", ("mode",))
+_UPLOAD_SECONDS = metrics.Histogram("splazdl_oss_upload_duration_seconds", "Wall time of OSS uploads.", ("mode",))
+
+# (endpoint, bucket, access key id) -> oss2.Bucket sharing one pooled session
+_buckets: dict[tuple[str, str, str], object] = {}
+_buckets_lock = threading.Lock()
+
 
-def upload_to_oss(task_id: str, filepath: Path) -> str:
-    """Upload file to Aliyun OSS. Returns CDN URL or "" on failure/unconfigured."""
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, "") or default))
+    except ValueError:
+        return default
+
+
+def _get_bucket(endpoint: str, bucket_name: str, access_key_id: str, access_key_secret: str):
+    """Reuse one Bucket (and its HTTP connection pool) per OSS target."""
+    import oss2
+
+    key = (endpoint, bucket_name, access_key_id)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            threads = _env_int("SPLAZDL_OSS_UPLOAD_THREADS", 4)
+            # Room for several concurrent uploads, each with its part threads.
+            session = oss2.Session(pool_size=max(10, threads * 4))
+            bucket = oss2.Bucket(oss2.Auth(access_key_id, access_key_secret), endpoint, bucket_name, session=session)
+            _buckets[key] = bucket
+        return bucket
+
+
+def oss_enabled() -> bool:
+    return bool(os.environ.get("SPLAZDL_OSS_ENDPOINT", ""))
+
+
+def upload_to_oss(
+    task_id: str,
+    filepath: Path,
+    progress: Callable[[int, int], None] | None = None,
+) -> str:
+    """Upload file to Aliyun OSS. Returns CDN URL or "" on failure/unconfigured.
+
+    Large files are sent as a parallel multipart upload with a checkpoint,
+    so a failed upload of the same file continues from the parts already
+    stored. ``progress(uploaded_bytes, total_bytes)`` is called as parts
+    complete.
+    """
     import oss2
 
     access_key_id     = os.environ.get("SPLAZDL_OSS_ACCESS_KEY_ID", "")
@@ -24,21 +92,203 @@ def upload_to_oss(task_id: str, filepath: Path) -> str:
     endpoint          = os.environ.get("SPLAZDL_OSS_ENDPOINT", "")
     cdn_domain        = os.environ.get("SPLAZDL_OSS_CDN_DOMAIN", "")
     prefix            = os.environ.get("SPLAZDL_OSS_PREFIX", "splazdl")
+    checkpoint_dir    = os.environ.get("SPLAZDL_OSS_CHECKPOINT_DIR", "./data/oss_checkpoints")
 
     if not endpoint:
         return ""
 
-    auth = oss2.Auth(access_key_id, access_key_secret)
-    bucket = oss2.Bucket(auth, endpoint, bucket_name)
+    bucket = _get_bucket(endpoint, bucket_name, access_key_id, access_key_secret)
     key = f"{prefix}/{task_id}/{filepath.name}"
     content_type = _CONTENT_TYPES.get(filepath.suffix.lower(), "application/octet-stream")
 
+    started = time.monotonic()
     try:
-        bucket.put_object_from_file(key, str(filepath), headers={"Content-Type": content_type})
-        encoded_key = quote(key, safe="/")
-        if cdn_domain:
-            return f"https://{cdn_domain}/{encoded_key}"
-        return f"{endpoint}/{bucket_name}/{encoded_key}"
+        Path(checkpoint_dir).mkdir(parents=True, exist_ok=True)
+        oss2.resumable_upload(
+            bucket,
+            key,
+            str(filepath),
+            store=oss2.ResumableStore(root=checkpoint_dir),
+            headers={"Content-Type": content_type},
+            multipart_threshold=_env_int("SPLAZDL_OSS_MULTIPART_THRESHOLD_MB", 16) * _MB,
+            part_size=_env_int("SPLAZDL_OSS_PART_SIZE_MB", 8) * _MB,
+            num_threads=_env_int("SPLAZDL_OSS_UPLOAD_THREADS", 4),
+            progress_callback=progress,
+        )
+        _record_upload("file", True, filepath.stat().st_size, started)
+        return _public_url(key, endpoint, bucket_name, cdn_domain)
     except Exception:
         log.exception("OSS upload failed for %s", filepath)
+        _record_upload("file", False, 0, started)
+        return ""
+
+
+def _record_upload(mode: str, ok: bool, size: int, started: float) -> None:
+    _UPLOADS_TOTAL.labels(mode, "ok" if ok else "error").inc()
+    _UPLOAD_SECONDS.labels(mode).observe(time.monotonic() - started)
+    if ok:
+        _UPLOAD_BYTES.labels(mode).inc(size)
+
+
+def _public_url(key: str, endpoint: str, bucket_name: str, cdn_domain: str) -> str:
+    encoded_key = quote(key, safe="/")
+    if cdn_domain:
+        return f"https://{cdn_domain}/{encoded_key}"
+    return f"{endpoint}/{bucket_name}/{encoded_key}"
+
+
+class StreamingUpload:
+    """Multipart upload fed part by part while the data is still arriving.
+
+    ``write_part`` hands a part to a thread pool and only blocks when
+    ``SPLAZDL_OSS_UPLOAD_THREADS`` parts are already in flight, so memory
+    stays at about ``(threads + 1) * part_size``. When ``size`` is known
+    the part size grows as needed to stay within OSS's 10000-part limit.
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        filename: str,
+        size: int = 0,
+        progress: Callable[[int, int], None] | None = None,
+    ):
+        self._endpoint = os.environ.get("SPLAZDL_OSS_ENDPOINT", "")
+        self._bucket_name = os.environ.get("SPLAZDL_OSS_BUCKET", "")
+        self._cdn_domain = os.environ.get("SPLAZDL_OSS_CDN_DOMAIN", "")
+        prefix = os.environ.get("SPLAZDL_OSS_PREFIX", "splazdl")
+        if not self._endpoint:
+            raise RuntimeError("OSS is not configured")
+
+        self._bucket = _get_bucket(
+            self._endpoint,
+            self._bucket_name,
+            os.environ.get("SPLAZDL_OSS_ACCESS_KEY_ID", ""),
+            os.environ.get("SPLAZDL_OSS_ACCESS_KEY_SECRET", ""),
+        )
+        name = Path(filename).name or "upload"
+        self.key = f"{prefix}/{task_id}/{name}"
+        self.size = size
+        self.part_size = max(_env_int("SPLAZDL_OSS_PART_SIZE_MB", 8) * _MB, math.ceil(size / _MAX_PARTS))
+        self.uploaded = 0
+        self._progress = progress
+        threads = _env_int("SPLAZDL_OSS_UPLOAD_THREADS", 4)
+        self._slots = threading.BoundedSemaphore(threads)
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="oss-part")
+        self._futures: list[Future] = []
+        self._parts: list = []
+        self._lock = threading.Lock()
+        self._next_part = 1
+
+        content_type = _CONTENT_TYPES.get(Path(name).suffix.lower(), "application/octet-stream")
+        self.upload_id = self._bucket.init_multipart_upload(
+            self.key, headers={"Content-Type": content_type},
+        ).upload_id
+
+    def write_part(self, data: bytes) -> None:
+        """Queue the next part; blocks while all upload threads are busy."""
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        self._slots.acquire()
+        part_number = self._next_part
+        self._next_part += 1
+        self._futures.append(self._executor.submit(self._upload_part, part_number, data))
+
+    def _upload_part(self, part_number: int, data: bytes) -> None:
+        import oss2
+
+        try:
+            result = self._bucket.upload_part(self.key, self.upload_id, part_number, data)
+            with self._lock:
+                self._parts.append(oss2.models.PartInfo(part_number, result.etag, size=len(data)))
+                self.uploaded += len(data)
+                uploaded = self.uploaded
+            if self._progress:
+                self._progress(uploaded, self.size or uploaded)
+        finally:
+            self._slots.release()
+
+    def complete(self) -> str:
+        """Wait for outstanding parts, complete the upload and return its URL."""
+        if self._next_part == 1:
+            self.write_part(b"")
+        for future in self._futures:
+            future.result()
+        self._executor.shutdown()
+        parts = sorted(self._parts, key=lambda p: p.part_number)
+        self._bucket.complete_multipart_upload(self.key, self.upload_id, parts)
+        return _public_url(self.key, self._endpoint, self._bucket_name, self._cdn_domain)
+
+    def abort(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        try:
+            self._bucket.abort_multipart_upload(self.key, self.upload_id)
+        except Exception:
+            log.warning("Failed to abort OSS multipart upload %s", self.upload_id, exc_info=True)
+
+
+async def stream_to_oss(
+    task_id: str,
+    filename: str,
+    chunks: AsyncIterable[bytes],
+    size: int = 0,
+    progress: Callable[[int, int], None] | None = None,
+) -> str:
+    """Upload an async byte stream (e.g. a request body) without staging it.
+
+    Parts are sent while later bytes are still being received, so the total
+    time approaches the slower of the two transfers. Returns the URL, or ""
+    on failure/unconfigured; a failed upload is aborted on OSS.
+    """
+    if not oss_enabled():
         return ""
+    upload = None
+    oss_url = ""
+    started = time.monotonic()
+    try:
+        upload = await asyncio.to_thread(StreamingUpload, task_id, filename, size, progress)
+        buffer = bytearray()
+        async for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= upload.part_size:
+                part = bytes(buffer[:upload.part_size])
+                del buffer[:upload.part_size]
+                await asyncio.to_thread(upload.write_part, part)
+        if buffer:
+            await asyncio.to_thread(upload.write_part, bytes(buffer))
+        oss_url = await asyncio.to_thread(upload.complete)
+    except Exception:
+        log.exception("Streaming OSS upload failed for %s", filename)
+    finally:
+        # Also covers the request being cancelled (client went away).
+        _record_upload("stream", bool(oss_url), upload.uploaded if upload is not None else 0, started)
+        if upload is not None and not oss_url:
+            await asyncio.to_thread(upload.abort)
+    return oss_url
+
+
+class UploadProgress:
+    """Throttled ``progress`` callback that records percent and throughput.
+
+    ``on_update(percent, bytes_per_second)`` runs at most every ``interval``
+    seconds, plus once at 100%.
+    """
+
+    def __init__(self, on_update: Callable[[float, float], None], interval: float = 0.5):
+        self._on_update = on_update
+        self._interval = interval
+        self._start = time.monotonic()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, uploaded: int, total: int | None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            done = bool(total) and uploaded >= total
+            if not done and now - self._last < self._interval:
+                return
+            self._last = now
+        percent = uploaded / total * 100 if total else 0.0
+        elapsed = now - self._start
+        self._on_update(percent, uploaded / elapsed if elapsed > 0 else 0.0)
@@ -0,0 +1,190 @@
+"""Run download workers in a process pool and mirror task changes back."""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+import metrics
+from config import AppConfig, set_config
+from models import DownloadTask, get_task, set_task_store
+
+log = logging.getLogger(__name__)
+
+_DONE = "__done__"
+# Task id slot of a metrics update relayed from a worker.
+_METRIC = "__metric__"
+# How often a worker process looks at the shared controls dict.
+_CONTROLS_POLL = 0.2
+
+# Child-process side: queue that field changes are relayed through.
+_child_updates = None
+
+
+class _RelayStore:
+    """Task store used inside a worker process.
+
+    The worker only holds a copy of its own task, so reads see nothing;
+    every field change is forwarded to the parent, which applies it to the
+    real ``DownloadTask``.
+    """
+
+    def __init__(self, updates):
+        self._updates = updates
+
+    def on_task_changed(self, task: DownloadTask, name: str, old) -> None:
+        self._updates.put((task.task_id, name, getattr(task, name)))
+
+    def get(self, task_id: str) -> DownloadTask | None:
+        return None
+
+    def list_tasks(self, username: str | None = None, status: str | None = None) -> list[DownloadTask]:
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+def _init_child(updates, controls, config: AppConfig) -> None:
+    global _child_updates
+    _child_updates = updates
+    set_config(config)
+    set_task_store(_RelayStore(updates))
+    metrics.set_relay(lambda name, labels, op, amount: updates.put((_METRIC, (name, labels, op), amount)))
+    # Pause/cancel requests from the parent land in the shared dict; mirror
+    # them into the local per-task events that the progress hooks check, so
+    # the hooks never make a manager round trip themselves.
+    threading.Thread(target=_follow_controls, args=(controls,), name="controls-follower", daemon=True).start()
+
+
+def _follow_controls(controls) -> None:
+    import downloader
+
+    while True:
+        try:
+            remote = dict(controls)
+        except (EOFError, OSError):
+            return  # manager shut down
+        for task_id, stop in remote.items():
+            if stop:
+                control = downloader._task_control(task_id)
+                if not control.is_set():
+                    control.request(stop)
+        with downloader._task_controls_lock:
+            for task_id in [t for t in downloader._task_controls if t not in remote]:
+                del downloader._task_controls[task_id]
+        time.sleep(_CONTROLS_POLL)
+
+
+def _run_in_child(fn: Callable, task: DownloadTask, args: tuple) -> int:
+    try:
+        fn(task, *args)
+    finally:
+        _child_updates.put((task.task_id, _DONE, None))
+    return os.getpid()
+
+
+class ProcessEngine:
+    """Execute ``fn(task, *args)`` in worker processes.
+
+    Field changes made by the worker on its copy of the task flow back over
+    one queue and are applied to the parent's task by a single drain thread.
+    ``controls`` is a manager dict shared with the children; writing
+    ``controls[task_id]`` is how the parent pauses or cancels a running
+    worker.
+    """
+
+    def __init__(self, max_workers: int, config: AppConfig):
+        self.max_workers = max(1, max_workers)
+        self._config = config
+        self._ctx = multiprocessing.get_context("spawn")
+        self._manager = self._ctx.Manager()
+        self.controls = self._manager.dict()
+        self._updates = self._ctx.Queue()
+        self._done: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pool = self._new_pool()
+        self._drain_thread = threading.Thread(target=self._drain, name="process-engine-drain", daemon=True)
+        self._drain_thread.start()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._ctx,
+            initializer=_init_child,
+            initargs=(self._updates, self.controls, self._config),
+        )
+
+    def run(self, fn: Callable, task: DownloadTask, *args) -> None:
+        """Run in a worker process and block until its task updates are applied."""
+        done = threading.Event()
+        with self._lock:
+            self._done[task.task_id] = done
+            pool = self._pool
+        try:
+            pid = pool.submit(_run_in_child, fn, task, args).result()
+            self._wait_relayed(task, done, pid)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = self._new_pool()
+            raise RuntimeError("Download process crashed")
+        finally:
+            with self._lock:
+                self._done.pop(task.task_id, None)
+            self.controls.pop(task.task_id, None)
+
+    def _wait_relayed(self, task: DownloadTask, done: threading.Event, pid: int) -> None:
+        """Wait until the drain thread has applied the worker's last changes.
+
+        The result and the updates travel on different pipes, and under load
+        the drain thread can be far behind. There is no deadline: returning
+        early would hand the caller a task whose status is not final yet.
+        Give up only if the worker process is gone before its marker was
+        flushed, or the engine is shutting down.
+        """
+        while not done.wait(1):
+            if self._closed:
+                return
+            if pid not in {p.pid for p in self._ctx.active_children()}:
+                # The marker may have been queued just before the exit.
+                if not done.wait(1):
+                    log.warning("Worker %s exited before relaying the end of task %s", pid, task.task_id)
+                return
+
+    def _drain(self) -> None:
+        while True:
+            item = self._updates.get()
+            if item is None:
+                return
+            task_id, name, value = item
+            if task_id == _METRIC:
+                metrics.apply(*name, value)
+                continue
+            if name == _DONE:
+                with self._lock:
+                    done = self._done.get(task_id)
+                if done:
+                    done.set()
+                continue
+            task = get_task(task_id)
+            if task is not None:
+                try:
+                    setattr(task, name, value)
+                except Exception:
+                    log.exception("Failed to apply %s to task %s", name, task_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.max_workers, "running": len(self._done)}
+
+    def shutdown(self) -> None:
+        self._closed = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._updates.put(None)
+        self._manager.shutdown()
@@ -0,0 +1,357 @@
+"""Fair-share priority scheduler for background jobs."""
+
+import heapq
+import logging
+import math
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from itertools import count
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+PRIORITY_LABELS = {
+    PRIORITY_URGENT: "加急",
+    PRIORITY_NORMAL: "普通",
+    PRIORITY_BULK: "批量",
+}
+
+
+@dataclass(eq=False)
+class _Job:
+    key: str
+    owner: str
+    priority: int
+    seq: int
+    fn: Callable
+    args: tuple
+    resource: str = ""
+    cancelled: bool = False
+    ticket: int = 0  # enqueue order, set by _enqueue
+
+
+class _OwnerQueue:
+    """One owner's jobs at one priority level, FIFO per resource.
+
+    Jobs for a saturated resource are skipped as a whole sub-queue, so a
+    pick looks at one head per resource instead of walking the backlog.
+    Cancelled jobs stay in their sub-queue until they reach its head.
+    """
+
+    def __init__(self):
+        self._by_resource: dict[str, deque[_Job]] = {}
+        self.size = 0  # live (not cancelled) jobs
+
+    def append(self, job: _Job) -> None:
+        self._by_resource.setdefault(job.resource, deque()).append(job)
+        self.size += 1
+
+    def heads(self) -> list[_Job]:
+        """First live job of every resource, oldest first."""
+        heads = []
+        for resource in list(self._by_resource):
+            jobs = self._by_resource[resource]
+            while jobs and jobs[0].cancelled:
+                jobs.popleft()
+            if jobs:
+                heads.append(jobs[0])
+            else:
+                del self._by_resource[resource]
+        heads.sort(key=lambda job: job.ticket)
+        return heads
+
+    def pop(self, job: _Job) -> None:
+        """Remove ``job``, which must be a head returned by ``heads()``."""
+        self._by_resource[job.resource].popleft()
+        self.size -= 1
+
+    def live(self):
+        """Live jobs in enqueue order."""
+        merged = heapq.merge(*self._by_resource.values(), key=lambda job: job.ticket)
+        return (job for job in merged if not job.cancelled)
+
+
+class FairScheduler:
+    """Run jobs on a fixed worker pool with strict priorities and per-owner fairness.
+
+    Lower priority values run first. Within one priority level, owners are
+    served round-robin, each getting ``weights.get(owner, 1)`` consecutive
+    jobs per turn (weighted fair queueing), so one owner's bulk import cannot
+    starve the others.
+
+    Queue positions are computed on demand. ``ranks()`` numbers queued jobs
+    by their absolute place in the dispatch sequence (``dispatched`` + their
+    position) and is memoized until ``version`` changes. Dispatching the
+    job at the head of the order leaves every other rank as it was, so only
+    changes that reorder the queue (enqueue, cancel, reprioritize, or a job
+    dispatched ahead of its turn because its resource was free) bump the
+    version; readers derive positions as ``rank - dispatched``.
+
+    Jobs may name a ``resource`` (e.g. a host). Before dispatching such a job
+    the scheduler calls ``admit(resource)``, which either takes the resource
+    and returns 0, or returns how long to wait (``math.inf`` = until
+    ``wake``). Jobs that are not admitted stay queued without occupying a
+    worker; ``release(resource)`` is called after the job finishes.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        name: str = "scheduler",
+        weights: dict[str, int] | None = None,
+        admit: Callable[[str], float] | None = None,
+        release: Callable[[str], None] | None = None,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.name = name
+        self.weights = dict(weights or {})
+        self.admit = admit
+        self.release = release
+
+        self._cond = threading.Condition()
+        # priority -> owner -> jobs; owner order is the round-robin rotation.
+        self._levels: dict[int, OrderedDict[str, _OwnerQueue]] = {}
+        self._credit: dict[tuple[int, str], int] = {}
+        self._jobs: dict[str, _Job] = {}
+        self._seq = count()
+        self._tickets = count()
+        self._threads: list[threading.Thread] = []
+        self._active = 0
+        self._shutdown = False
+        # Bumped whenever the relative dispatch order of queued jobs changes.
+        self._version = 0
+        self._dispatched = 0
+        self._ranks: tuple[int, dict[str, int]] = (-1, {})
+
+    # ---------- public API ----------
+
+    def submit(
+        self,
+        key: str,
+        owner: str,
+        fn: Callable,
+        *args,
+        priority: int = PRIORITY_NORMAL,
+        resource: str = "",
+    ) -> None:
+        """Queue ``fn(*args)``; a job with the same key still queued is replaced."""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError(f"{self.name} is shut down")
+            self._drop(key)
+            job = _Job(
+                key=key, owner=owner, priority=priority, seq=next(self._seq),
+                fn=fn, args=args, resource=resource,
+            )
+            self._enqueue(job)
+            self._ensure_workers()
+            self._cond.notify()
+
+    def cancel(self, key: str) -> bool:
+        """Remove a queued job before it starts. Returns False if not queued."""
+        with self._cond:
+            return self._drop(key)
+
+    def reprioritize(self, key: str, priority: int) -> bool:
+        """Move a still-queued job to another priority level."""
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is None:
+                return False
+            if job.priority != priority:
+                self._drop(key)
+                self._enqueue(_Job(
+                    key=job.key, owner=job.owner, priority=priority,
+                    seq=job.seq, fn=job.fn, args=job.args, resource=job.resource,
+                ))
+                self._cond.notify()
+        return True
+
+    def wake(self) -> None:
+        """Re-evaluate waiting jobs, e.g. after an external resource was freed."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def is_queued(self, key: str) -> bool:
+        return key in self._jobs
+
+    @property
+    def version(self) -> int:
+        """Changes whenever ``ranks()`` may have changed."""
+        return self._version
+
+    @property
+    def dispatched(self) -> int:
+        """Jobs dispatched so far; a queued job's position is ``rank - dispatched``."""
+        return self._dispatched
+
+    def ranks(self) -> dict[str, int]:
+        """Absolute dispatch rank of every queued job (shared, do not mutate).
+
+        May still hold jobs dispatched since it was computed; their rank is
+        not above ``dispatched``.
+        """
+        with self._cond:
+            version, ranks = self._ranks
+            if version != self._version:
+                start = self._dispatched + 1
+                ranks = {job.key: i for i, job in enumerate(self._dispatch_order(), start=start)}
+                self._ranks = (self._version, ranks)
+            return ranks
+
+    def positions(self) -> dict[str, int]:
+        """1-based dispatch order of every queued job."""
+        with self._cond:
+            ranks = self.ranks()
+            dispatched = self._dispatched
+            return {key: rank - dispatched for key, rank in ranks.items() if rank > dispatched}
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"queued": len(self._jobs), "active": self._active, "workers": self.max_workers}
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs; queued jobs are dropped, running jobs finish."""
+        with self._cond:
+            self._shutdown = True
+            for job in self._jobs.values():
+                job.cancelled = True
+            self._jobs.clear()
+            self._levels.clear()
+            self._version += 1
+            self._cond.notify_all()
+
+    # ---------- queue internals (caller holds the lock) ----------
+
+    def _enqueue(self, job: _Job) -> None:
+        job.ticket = next(self._tickets)
+        owners = self._levels.setdefault(job.priority, OrderedDict())
+        owners.setdefault(job.owner, _OwnerQueue()).append(job)
+        self._jobs[job.key] = job
+        self._version += 1
+
+    def _drop(self, key: str) -> bool:
+        # Lazy deletion: the stale entry is skipped when it reaches the queue head.
+        job = self._jobs.pop(key, None)
+        if job is None:
+            return False
+        job.cancelled = True
+        self._levels[job.priority][job.owner].size -= 1
+        # Even dropping the head reorders the rest: its owner keeps the turn.
+        self._version += 1
+        return True
+
+    def _weight(self, owner: str) -> int:
+        return max(1, int(self.weights.get(owner, 1)))
+
+    def _admit(self, job: _Job) -> float:
+        if not job.resource or self.admit is None:
+            return 0.0
+        return self.admit(job.resource)
+
+    def _pick(self) -> tuple[_Job | None, float]:
+        """Pop the next admissible job; otherwise return how long to wait."""
+        retry_after = math.inf
+        denied: set[str] = set()
+        # Whether every candidate so far was admitted, i.e. the job picked
+        # is the head of ``_dispatch_order``.
+        in_order = True
+        for priority in sorted(self._levels):
+            owners = self._levels[priority]
+            for owner in list(owners):
+                queue = owners[owner]
+                if not queue.size:
+                    del owners[owner]
+                    self._credit.pop((priority, owner), None)
+                    continue
+                # Oldest job of this owner whose resource can be admitted now;
+                # jobs for a saturated host are skipped, not dequeued.
+                job = None
+                for candidate in queue.heads():
+                    if candidate.resource in denied:
+                        in_order = False
+                        continue
+                    wait = self._admit(candidate)
+                    if wait == 0:
+                        job = candidate
+                        break
+                    in_order = False
+                    denied.add(candidate.resource)
+                    retry_after = min(retry_after, wait)
+                if job is None:
+                    continue
+                queue.pop(job)
+                credit = self._credit.get((priority, owner), self._weight(owner)) - 1
+                if credit <= 0 or not queue.size:
+                    owners.move_to_end(owner)
+                    self._credit[(priority, owner)] = self._weight(owner)
+                else:
+                    self._credit[(priority, owner)] = credit
+                self._jobs.pop(job.key, None)
+                self._dispatched += 1
+                if not in_order:
+                    self._version += 1
+                return job, 0.0
+            if not owners:
+                del self._levels[priority]
+        return None, retry_after
+
+    def _dispatch_order(self):
+        """Simulate ``_pick`` over a snapshot without mutating the queues."""
+        for priority in sorted(self._levels):
+            rotation = deque()
+            for owner, queue in self._levels[priority].items():
+                live = deque(queue.live()) if queue.size else None
+                if live:
+                    credit = self._credit.get((priority, owner), self._weight(owner))
+                    rotation.append([owner, live, credit])
+            while rotation:
+                entry = rotation[0]
+                owner, live, credit = entry
+                yield live.popleft()
+                credit -= 1
+                if not live:
+                    rotation.popleft()
+                elif credit <= 0:
+                    entry[2] = self._weight(owner)
+                    rotation.rotate(-1)
+                else:
+                    entry[2] = credit
+
+    def _ensure_workers(self) -> None:
+        while len(self._threads) < self.max_workers:
+            t = threading.Thread(
+                target=self._worker_loop,
+                name=f"{self.name}-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(t)
+            t.start()
+
+    # ---------- workers ----------
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                job, retry_after = self._pick()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait(None if math.isinf(retry_after) else retry_after)
+                    job, retry_after = self._pick()
+                self._active += 1
+            try:
+                job.fn(*job.args)
+            except Exception:
+                log.exception("%s job %s failed", self.name, job.key)
+            finally:
+                if job.resource and self.release is not None:
+                    self.release(job.resource)
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify_all()
@@ -0,0 +1,570 @@
+"""
+任务存储后端
+
+models 模块的任务函数都委托给这里的后端：
+- MemoryTaskStore: 纯内存，重启即丢失（测试/基准用）
+- SqliteTaskStore: SQLite WAL 持久化，进度等高频字段批量落盘
+"""
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import weakref
+from dataclasses import MISSING, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Collection
+
+from models import DownloadTask, generate_task_id
+
+logger = logging.getLogger(__name__)
+
+# 单独成列（用于索引/查询）的字段，其余字段序列化进 data 列
+_COLUMN_FIELDS = ("task_id", "username", "url", "status", "created_at", "file_size")
+# 变更后需要在查询前落盘的字段（影响 WHERE / ORDER BY 结果）
+_QUERY_FIELDS = frozenset(_COLUMN_FIELDS)
+# query_tasks 支持的排序字段 -> SQLite 排序表达式
+SORT_FIELDS = {
+    "created_at": "created_at",
+    "status": "status",
+    "file_size": "file_size",
+}
+# 旧版本把速度/剩余时间存成格式化字符串，加载时丢弃
+_LEGACY_TEXT_FIELDS = ("speed", "eta", "upload_speed")
+
+
+def _matches_keyword(task: DownloadTask, keyword: str) -> bool:
+    return keyword in (task.title or "").lower() or keyword in (task.url or "").lower() or keyword in task.task_id.lower()
+
+
+def _data_fields() -> list[str]:
+    return [f.name for f in fields(DownloadTask) if f.name not in _COLUMN_FIELDS]
+
+
+class MemoryTaskStore:
+    """纯内存任务存储
+
+    除主表外维护按用户、按状态、按（用户, 状态）、按（用户, URL）的二级索引，
+    任务状态变化时由 on_task_changed 增量更新，按用户/状态的查询只与结果集大小相关。
+    """
+
+    _INDEXED_FIELDS = frozenset({"username", "url", "status"})
+
+    def __init__(self):
+        self._tasks: dict[str, DownloadTask] = {}
+        self._by_user: dict[str, dict[str, DownloadTask]] = {}
+        self._by_status: dict[str, dict[str, DownloadTask]] = {}
+        self._by_user_status: dict[tuple[str, str], dict[str, DownloadTask]] = {}
+        self._user_urls: dict[str, dict[str, set[str]]] = {}
+        self._lock = threading.Lock()
+
+    # ---------- 索引维护（调用方持有锁） ----------
+
+    def _index(self, task: DownloadTask) -> None:
+        tid = task.task_id
+        self._by_user.setdefault(task.username, {})[tid] = task
+        self._by_status.setdefault(task.status, {})[tid] = task
+        self._by_user_status.setdefault((task.username, task.status), {})[tid] = task
+        self._user_urls.setdefault(task.username, {}).setdefault(task.url, set()).add(tid)
+
+    def _unindex(self, task: DownloadTask, username: str, url: str, status: str) -> None:
+        tid = task.task_id
+        for index, key in (
+            (self._by_user, username),
+            (self._by_status, status),
+            (self._by_user_status, (username, status)),
+        ):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(tid, None)
+                if not bucket:
+                    del index[key]
+        urls = self._user_urls.get(username)
+        if urls is not None:
+            ids = urls.get(url)
+            if ids is not None:
+                ids.discard(tid)
+                if not ids:
+                    del urls[url]
+            if not urls:
+                del self._user_urls[username]
+
+    def on_task_changed(self, task: DownloadTask, name: str, old) -> None:
+        """索引字段变更时增量更新二级索引（进度等其他字段直接返回）"""
+        if name not in self._INDEXED_FIELDS:
+            return
+        with self._lock:
+            if self._tasks.get(task.task_id) is not task:
+                return
+            prev = {"username": task.username, "url": task.url, "status": task.status, name: old}
+            self._unindex(task, prev["username"], prev["url"], prev["status"])
+            self._index(task)
+
+    # ---------- 存储接口 ----------
+
+    def add(self, task: DownloadTask) -> DownloadTask:
+        with self._lock:
+            self._tasks[task.task_id] = task
+            self._index(task)
+        return task
+
+    def add_if_new(self, username: str, urls: list[str]) -> tuple[list[DownloadTask], int]:
+        created: list[DownloadTask] = []
+        skipped_count = 0
+        with self._lock:
+            existing_urls = self._user_urls.get(username, {})
+            seen: set[str] = set()
+            for url in urls:
+                if url in existing_urls or url in seen:
+                    skipped_count += 1
+                    continue
+                task = DownloadTask(
+                    task_id=generate_task_id(),
+                    username=username,
+                    url=url,
+                )
+                self._tasks[task.task_id] = task
+                self._index(task)
+                created.append(task)
+                seen.add(url)
+        return created, skipped_count
+
+    def get(self, task_id: str) -> DownloadTask | None:
+        return self._tasks.get(task_id)
+
+    def list_tasks(self, username: str | None = None, status: str | None = None) -> list[DownloadTask]:
+        with self._lock:
+            if username and status:
+                tasks = list(self._by_user_status.get((username, status), {}).values())
+            elif status:
+                tasks = list(self._by_status.get(status, {}).values())
+            elif username:
+                tasks = list(self._by_user.get(username, {}).values())
+            else:
+                return list(self._tasks.values())
+        # 二级索引在状态变化时会重新插入（按用户索引也一样），这里恢复为创建顺序
+        tasks.sort(key=lambda t: t.created_at)
+        return tasks
+
+    def query_tasks(
+        self,
+        username: str | None = None,
+        status: str | None = None,
+        keyword: str = "",
+        sort: str = "created_at",
+        descending: bool = False,
+        offset: int = 0,
+        limit: int | None = None,
+        task_ids: Collection[str] | None = None,
+    ) -> tuple[list[DownloadTask], int]:
+        if task_ids is not None:
+            with self._lock:
+                tasks = [t for t in map(self._tasks.get, task_ids) if t is not None]
+            tasks = [t for t in tasks if (not username or t.username == username) and (not status or t.status == status)]
+        else:
+            tasks = self.list_tasks(username, status)
+        keyword = keyword.strip().lower()
+        if keyword:
+            tasks = [t for t in tasks if _matches_keyword(t, keyword)]
+        # 按用户索引在状态变化时会重新插入，先恢复创建顺序；稳定排序保证同值按创建顺序
+        tasks.sort(key=lambda t: t.created_at, reverse=descending)
+        if sort != "created_at":
+            tasks.sort(key=lambda t: getattr(t, sort), reverse=descending)
+        end = None if limit is None else offset + limit
+        return tasks[offset:end], len(tasks)
+
+    def search_rows(self) -> list[tuple[str, str, str, str, str]]:
+        """(task_id, username, status, title, url)，供 TaskSearchIndex 首次加载"""
+        with self._lock:
+            return [(t.task_id, t.username, t.status, t.title or "", t.url) for t in self._tasks.values()]
+
+    def existing_urls(self, username: str | None = None) -> set[str]:
+        with self._lock:
+            if username:
+                return set(self._user_urls.get(username, ()))
+            return {url for urls in self._user_urls.values() for url in urls}
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is not None:
+                self._unindex(task, task.username, task.url, task.status)
+
+    def clear(self, username: str | None = None) -> list[DownloadTask]:
+        with self._lock:
+            if username:
+                removed = list(self._by_user.get(username, {}).values())
+                for task in removed:
+                    self._tasks.pop(task.task_id, None)
+                    self._unindex(task, task.username, task.url, task.status)
+            else:
+                removed = list(self._tasks.values())
+                self._tasks.clear()
+                self._by_user.clear()
+                self._by_status.clear()
+                self._by_user_status.clear()
+                self._user_urls.clear()
+            return removed
+
+    def flush(self) -> None:
+        """内存后端无需落盘"""
+
+    def close(self) -> None:
+        """内存后端无需关闭"""
+
+
+class SqliteTaskStore:
+    """SQLite（WAL）持久化任务存储
+
+    - 已加载的任务对象通过弱引用身份映射复用，下载线程修改的就是查询返回的同一个对象
+    - 字段变更只记入脏集合，由后台线程每 flush_interval 秒批量 UPDATE 一次；
+      影响查询条件的字段（如 status）变更后，下一次查询前会先同步落盘
+    - 启动时把上次未结束的任务（pending/downloading）标记为已暂停
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._identity: weakref.WeakValueDictionary[str, DownloadTask] = weakref.WeakValueDictionary()
+        self._dirty: dict[str, DownloadTask] = {}
+        # 只保护脏集合的写入与整体换出；不与 _lock 共用，进度回调不必等落盘的 SQL 执行完
+        self._dirty_lock = threading.Lock()
+        self._query_dirty = False
+        self._data_fields = _data_fields()
+        self._defaults = {
+            f.name: f.default for f in fields(DownloadTask) if f.default is not MISSING
+        }
+        self._factories = [
+            (f.name, f.default_factory) for f in fields(DownloadTask)
+            if f.default_factory is not MISSING and f.name not in _COLUMN_FIELDS
+        ]
+        self._closed = threading.Event()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id    TEXT PRIMARY KEY,
+                    username   TEXT NOT NULL,
+                    url        TEXT NOT NULL,
+                    status     TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    file_size  INTEGER NOT NULL DEFAULT 0,
+                    data       TEXT NOT NULL DEFAULT '{}'
+                );
+            """)
+            self._migrate()
+            self._conn.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_tasks_user_status_created
+                    ON tasks (username, status, created_at);
+                CREATE INDEX IF NOT EXISTS idx_tasks_user_created
+                    ON tasks (username, created_at);
+                CREATE INDEX IF NOT EXISTS idx_tasks_url ON tasks (url);
+                CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at);
+                CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status, created_at);
+                CREATE INDEX IF NOT EXISTS idx_tasks_user_status_size
+                    ON tasks (username, status, file_size);
+                CREATE INDEX IF NOT EXISTS idx_tasks_status_size ON tasks (status, file_size);
+            """)
+            recovered = self._conn.execute(
+                "UPDATE tasks SET status = ?, data = json_set(data, '$.error_msg', ?) "
+                "WHERE status IN (?, ?)",
+                (
+                    DownloadTask.STATUS_PAUSED,
+                    "服务重启，任务已中断",
+                    DownloadTask.STATUS_PENDING,
+                    DownloadTask.STATUS_DOWNLOADING,
+                ),
+            ).rowcount
+        if recovered:
+            logger.info("已将 %s 个中断任务标记为暂停", recovered)
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="task-store-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _migrate(self) -> None:
+        """旧库的 file_size 存在 data 列里，迁移成独立列以便按大小排序走索引"""
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "file_size" in columns:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN file_size INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "UPDATE tasks SET file_size = COALESCE(CAST(json_extract(data, '$.file_size') AS INTEGER), 0), "
+                "data = json_remove(data, '$.file_size')"
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    # ---------- 序列化 ----------
+
+    def _to_row(self, task: DownloadTask) -> tuple:
+        data = {name: getattr(task, name) for name in self._data_fields}
+        return (
+            task.task_id,
+            task.username,
+            task.url,
+            task.status,
+            task.created_at.isoformat(),
+            task.file_size,
+            json.dumps(data, ensure_ascii=False, default=str),
+        )
+
+    def _materialize(self, row: sqlite3.Row) -> DownloadTask:
+        task = self._identity.get(row["task_id"])
+        if task is not None:
+            return task
+        # 绕过逐字段 __setattr__ 直接填充 __dict__，大批量加载历史任务时明显更快
+        values = dict(self._defaults)
+        for name, factory in self._factories:
+            values[name] = factory()
+        data = json.loads(row["data"] or "{}")
+        values.update((k, v) for k, v in data.items() if k in values)
+        for name in _LEGACY_TEXT_FIELDS:
+            if isinstance(values[name], str):
+                values[name] = self._defaults[name]
+        values.update(
+            task_id=row["task_id"],
+            username=row["username"],
+            url=row["url"],
+            status=row["status"],
+            created_at=datetime.fromisoformat(row["created_at"]),
+            file_size=row["file_size"],
+        )
+        task = DownloadTask.__new__(DownloadTask)
+        task.__dict__.update(values)
+        self._identity[task.task_id] = task
+        return task
+
+    # ---------- 脏数据落盘 ----------
+
+    def on_task_changed(self, task: DownloadTask, name: str, old) -> None:
+        """记录变更，等待批量落盘（热路径，只做字典写入）"""
+        with self._dirty_lock:
+            self._dirty[task.task_id] = task
+            if name in _QUERY_FIELDS:
+                self._query_dirty = True
+
+    def flush(self) -> None:
+        """把所有脏任务一次性写入数据库"""
+        with self._lock:
+            # 整体换出：换出之后到达的变更进入新集合，留给下一次落盘
+            with self._dirty_lock:
+                pending, self._dirty = self._dirty, {}
+                self._query_dirty = False
+            if not pending:
+                return
+            dirty = list(pending.values())
+            # 只 UPDATE 不 INSERT：已被删除/清空的任务即使仍在下载也不会被写回
+            rows = [(*self._to_row(t)[1:], t.task_id) for t in dirty]
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "UPDATE tasks SET username = ?, url = ?, status = ?, created_at = ?, file_size = ?, data = ? "
+                    "WHERE task_id = ?",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                with self._dirty_lock:
+                    for t in dirty:
+                        self._dirty.setdefault(t.task_id, t)
+                raise
+
+    def _flush_for_query(self) -> None:
+        if self._query_dirty:
+            self.flush()
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("任务批量落盘失败")
+
+    # ---------- 存储接口 ----------
+
+    def _insert(self, task: DownloadTask) -> None:
+        """插入新任务，task_id 冲突时重新生成"""
+        while True:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (task_id, username, url, status, created_at, file_size, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._to_row(task),
+            )
+            if cur.rowcount:
+                break
+            task.task_id = generate_task_id()
+        self._identity[task.task_id] = task
+        self._dirty.pop(task.task_id, None)
+
+    def add(self, task: DownloadTask) -> DownloadTask:
+        with self._lock:
+            self._insert(task)
+        return task
+
+    def add_if_new(self, username: str, urls: list[str]) -> tuple[list[DownloadTask], int]:
+        created: list[DownloadTask] = []
+        skipped_count = 0
+        with self._lock:
+            self._flush_for_query()
+            existing_urls: set[str] = set()
+            unique_urls = list(dict.fromkeys(urls))
+            for i in range(0, len(unique_urls), 500):
+                chunk = unique_urls[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing_urls.update(
+                    r[0] for r in self._conn.execute(
+                        f"SELECT url FROM tasks WHERE username = ? AND url IN ({placeholders})",
+                        (username, *chunk),
+                    )
+                )
+            self._conn.execute("BEGIN")
+            try:
+                for url in urls:
+                    if url in existing_urls:
+                        skipped_count += 1
+                        continue
+                    task = DownloadTask(
+                        task_id=generate_task_id(),
+                        username=username,
+                        url=url,
+                    )
+                    self._insert(task)
+                    created.append(task)
+                    existing_urls.add(url)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return created, skipped_count
+
+    def get(self, task_id: str) -> DownloadTask | None:
+        task = self._identity.get(task_id)
+        if task is not None:
+            return task
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            return self._materialize(row) if row else None
+
+    def list_tasks(self, username: str | None = None, status: str | None = None) -> list[DownloadTask]:
+        clauses, params = [], []
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._flush_for_query()
+            rows = self._conn.execute(
+                f"SELECT * FROM tasks {where} ORDER BY created_at, rowid", params
+            ).fetchall()
+            return [self._materialize(r) for r in rows]
+
+    def query_tasks(
+        self,
+        username: str | None = None,
+        status: str | None = None,
+        keyword: str = "",
+        sort: str = "created_at",
+        descending: bool = False,
+        offset: int = 0,
+        limit: int | None = None,
+        task_ids: Collection[str] | None = None,
+    ) -> tuple[list[DownloadTask], int]:
+        """筛选 + 排序 + 分页都在 SQL 里完成，只物化当前页
+
+        task_ids 为搜索索引给出的候选集合；keyword 则直接在 SQL 里做 LIKE 全表扫描。
+        """
+        clauses, params = [], []
+        if task_ids is not None:
+            clauses.append("task_id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(task_ids)))
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        keyword = keyword.strip()
+        if keyword:
+            pattern = "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append(
+                "(task_id LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\' "
+                "OR json_extract(data, '$.title') LIKE ? ESCAPE '\\')"
+            )
+            params += [pattern] * 3
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = "DESC" if descending else ""
+        order = f"{SORT_FIELDS[sort]} {direction}, created_at {direction}, rowid {direction}"
+        with self._lock:
+            if keyword:
+                # 标题存在 data 列里，其变更不会触发查询前落盘
+                self.flush()
+            else:
+                self._flush_for_query()
+            total = self._conn.execute(f"SELECT COUNT(*) FROM tasks {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM tasks {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                (*params, -1 if limit is None else limit, offset),
+            ).fetchall()
+            return [self._materialize(r) for r in rows], total
+
+    def search_rows(self) -> list[tuple[str, str, str, str, str]]:
+        """(task_id, username, status, title, url)，供 TaskSearchIndex 首次加载"""
+        with self._lock:
+            self.flush()
+            return self._conn.execute(
+                "SELECT task_id, username, status, COALESCE(json_extract(data, '$.title'), ''), url FROM tasks"
+            ).fetchall()
+
+    def existing_urls(self, username: str | None = None) -> set[str]:
+        with self._lock:
+            if username:
+                rows = self._conn.execute("SELECT url FROM tasks WHERE username = ?", (username,))
+            else:
+                rows = self._conn.execute("SELECT url FROM tasks")
+            return {r[0] for r in rows}
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            self._identity.pop(task_id, None)
+            self._dirty.pop(task_id, None)
+
+    def clear(self, username: str | None = None) -> list[DownloadTask]:
+        removed = self.list_tasks(username)
+        with self._lock:
+            if username:
+                self._conn.execute("DELETE FROM tasks WHERE username = ?", (username,))
+            else:
+                self._conn.execute("DELETE FROM tasks")
+            for task in removed:
+                self._identity.pop(task.task_id, None)
+                self._dirty.pop(task.task_id, None)
+        return removed
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._conn.close()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+测试飞书通知（摘要合并 / 失败重试 / 重启后补发）
+"""
+
+import json
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from feishu_notify import FeishuNotifier, build_card
+
+
+class _Webhook:
+    """本地假 webhook：记录收到的卡片，前 fail 次返回限流错误"""
+
+    def __init__(self, fail: int = 0):
+        self.cards: list[dict] = []
+        self.fail = fail
+        hook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if hook.fail > 0:
+                    hook.fail -= 1
+                    reply = {"code": 9499, "msg": "too many request"}
+                else:
+                    hook.cards.append(body["card"])
+                    reply = {"code": 0, "msg": "success"}
+                data = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _item(i: int) -> dict:
+    return {
+        "task_id": f"t{i}", "title": f"视频 {i}", "url": f"https://example.com/v/{i}",
+        "oss_url": f"https://cdn.example.com/{i}.mp4", "file_size": 1024 * 1024, "duration": 61,
+    }
+
+
+def test_completions_are_coalesced_into_one_digest():
+    hook = _Webhook()
+    with tempfile.TemporaryDirectory() as tmp:
+        notifier = FeishuNotifier(hook.url, Path(tmp) / "outbox.db", window=60, max_batch=50)
+        try:
+            for i in range(30):
+                notifier.enqueue(_item(i))
+            assert notifier.flush(5)
+            assert len(hook.cards) == 1
+            table = hook.cards[0]["elements"][1]
+            assert table["tag"] == "table"
+            assert len(table["rows"]) == 30
+            assert notifier.pending() == 0
+        finally:
+            notifier.close()
+            hook.close()
+
+
+def test_failed_posts_are_retried_with_backoff():
+    hook = _Webhook(fail=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        notifier = FeishuNotifier(hook.url, Path(tmp) / "outbox.db", window=0, backoff=0.05)
+        try:
+            notifier.enqueue(_item(1))
+            assert notifier.flush(5)
+            assert hook.fail == 0
+            assert len(hook.cards) == 1
+            assert hook.cards[0] == build_card([_item(1)])
+        finally:
+            notifier.close()
+            hook.close()
+
+
+def test_outbox_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Path(tmp) / "outbox.db"
+        # webhook 不可达：消息留在 outbox
+        notifier = FeishuNotifier("http://127.0.0.1:9/hook", outbox, window=0, backoff=60, timeout=1)
+        notifier.enqueue(_item(1))
+        notifier.enqueue(_item(2))
+        notifier.flush(0.5)
+        notifier.close(timeout=1)
+
+        hook = _Webhook()
+        notifier = FeishuNotifier(hook.url, outbox, window=0, backoff=60)
+        try:
+            assert notifier.pending() == 2
+            # 退避未到期，不会立即重发
+            assert not notifier.flush(0.2)
+            with notifier._db_lock, notifier._conn:
+                notifier._conn.execute("UPDATE outbox SET next_try = 0")
+            assert notifier.flush(5)
+            assert len(hook.cards) == 1
+            assert len(hook.cards[0]["elements"][1]["rows"]) == 2
+        finally:
+            notifier.close()
+            hook.close()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_completions_are_coalesced_into_one_digest,
+        test_failed_posts_are_retried_with_backoff,
+        test_outbox_survives_restart,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
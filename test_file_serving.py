@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试文件下载接口（Range / 多段 Range / ETag / 304）
+"""
+
+import sys
+import tempfile
+from email.utils import formatdate
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from file_serving import serve_file
+
+
+def _client(path: Path) -> TestClient:
+    app = Starlette(routes=[Route("/f", lambda request: serve_file(request, path, "视频.mp4"))])
+    return TestClient(app)
+
+
+def test_full_and_conditional_get():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "clip.mp4"
+        path.write_bytes(bytes(range(256)) * 40)
+        client = _client(path)
+
+        resp = client.get("/f")
+        assert resp.status_code == 200
+        assert resp.content == path.read_bytes()
+        assert resp.headers["accept-ranges"] == "bytes"
+        etag = resp.headers["etag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        assert "filename*=utf-8''" in resp.headers["content-disposition"]
+
+        assert client.get("/f", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get("/f", headers={"If-None-Match": f'"x", W/{etag}'}).status_code == 304
+        assert client.get("/f", headers={"If-None-Match": '"other"'}).status_code == 200
+        lm = resp.headers["last-modified"]
+        assert client.get("/f", headers={"If-Modified-Since": lm}).status_code == 304
+        old = formatdate(path.stat().st_mtime - 3600, usegmt=True)
+        assert client.get("/f", headers={"If-Modified-Since": old}).status_code == 200
+
+        # 文件被替换后 ETag 随之变化
+        path.write_bytes(b"new content")
+        assert client.get("/f", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_single_and_multi_range():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "clip.mp4"
+        data = bytes(range(256)) * 40
+        path.write_bytes(data)
+        client = _client(path)
+        etag = client.get("/f").headers["etag"]
+
+        resp = client.get("/f", headers={"Range": "bytes=100-199"})
+        assert resp.status_code == 206
+        assert resp.content == data[100:200]
+        assert resp.headers["content-range"] == f"bytes 100-199/{len(data)}"
+
+        resp = client.get("/f", headers={"Range": "bytes=-10", "If-Range": etag})
+        assert resp.status_code == 206 and resp.content == data[-10:]
+        # If-Range 不匹配时返回完整文件
+        resp = client.get("/f", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert resp.status_code == 200 and len(resp.content) == len(data)
+
+        resp = client.get("/f", headers={"Range": "bytes=0-9,20-29"})
+        assert resp.status_code == 206
+        assert resp.headers["content-type"].startswith("multipart/byteranges")
+        assert data[0:10] in resp.content and data[20:30] in resp.content
+
+        assert client.get("/f", headers={"Range": f"bytes={len(data) + 5}-"}).status_code == 416
+
+
+if __name__ == "__main__":
+    tests = [
+        test_full_and_conditional_get,
+        test_single_and_multi_range,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
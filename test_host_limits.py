@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试按站点限流（域名匹配 / 并发上限 / 令牌桶）
+"""
+
+import math
+import sys
+
+from config import HostLimitConfig
+from host_limits import HostLimiter, KIND_DOWNLOAD, KIND_PROBE
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_host_key_suffix_match():
+    limiter = HostLimiter({"douyin.com": HostLimitConfig(max_concurrent=1)})
+    assert limiter.host_key("https://www.douyin.com/video/1") == "douyin.com"
+    assert limiter.host_key("https://v.douyin.com/abc") == "douyin.com"
+    assert limiter.host_key("https://notdouyin.com/x") == "notdouyin.com"
+    assert limiter.host_key("not a url") == "default"
+
+
+def test_concurrency_cap_per_kind():
+    limiter = HostLimiter({"douyin.com": HostLimitConfig(max_concurrent=1, max_probes=2)})
+    assert limiter.try_acquire("douyin.com", KIND_DOWNLOAD) == 0
+    assert math.isinf(limiter.try_acquire("douyin.com", KIND_DOWNLOAD))
+    # 预览探测使用独立的并发池
+    assert limiter.try_acquire("douyin.com", KIND_PROBE) == 0
+    assert limiter.try_acquire("douyin.com", KIND_PROBE) == 0
+    assert math.isinf(limiter.try_acquire("douyin.com", KIND_PROBE))
+    limiter.release("douyin.com", KIND_DOWNLOAD)
+    assert limiter.try_acquire("douyin.com", KIND_DOWNLOAD) == 0
+    # 未配置的站点走 default（默认不限制）
+    for _ in range(10):
+        assert limiter.try_acquire("youtube.com", KIND_DOWNLOAD) == 0
+
+
+def test_token_bucket_rate():
+    clock = _FakeClock()
+    limiter = HostLimiter({"tiktok.com": HostLimitConfig(rate=0.5, burst=2)}, clock=clock)
+    assert limiter.try_acquire("tiktok.com") == 0
+    assert limiter.try_acquire("tiktok.com") == 0
+    assert limiter.try_acquire("tiktok.com") == 2.0
+    clock.now += 1
+    assert limiter.try_acquire("tiktok.com") == 1.0
+    clock.now += 1
+    assert limiter.try_acquire("tiktok.com") == 0
+    # 预览与下载共用令牌
+    assert limiter.try_acquire("tiktok.com", KIND_PROBE) == 2.0
+
+
+def test_blocking_acquire_timeout():
+    limiter = HostLimiter({"douyin.com": HostLimitConfig(max_concurrent=1)})
+    assert limiter.acquire("douyin.com", KIND_DOWNLOAD, timeout=0.1)
+    assert not limiter.acquire("douyin.com", KIND_DOWNLOAD, timeout=0.1)
+
+
+def test_idle_hosts_are_evicted():
+    clock = _FakeClock()
+    limiter = HostLimiter({"tiktok.com": HostLimitConfig(rate=0.5, burst=1)}, clock=clock)
+    for i in range(100):
+        host = f"cdn{i}.example.com"
+        assert limiter.try_acquire(host) == 0
+        limiter.release(host)
+    assert limiter.try_acquire("tiktok.com") == 0
+    limiter.release("tiktok.com")
+    assert limiter.try_acquire("busy.example.com") == 0
+    assert len(limiter.stats()) == 102
+
+    # 清理最多每分钟一次：只留下仍有占用的站点和令牌未回满的站点
+    clock.now += 61
+    assert limiter.try_acquire("tiktok.com") == 0
+    limiter.release("tiktok.com")
+    assert set(limiter.stats()) == {"tiktok.com", "busy.example.com"}
+    # 被清掉的站点再出现时按全新状态处理
+    assert limiter.try_acquire("cdn0.example.com") == 0
+    clock.now += 61
+    limiter.release("busy.example.com")
+    assert set(limiter.stats()) == {"cdn0.example.com"}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_host_key_suffix_match,
+        test_concurrency_cap_per_kind,
+        test_token_bucket_rate,
+        test_blocking_acquire_timeout,
+        test_idle_hosts_are_evicted,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
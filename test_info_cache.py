@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+测试元数据缓存（TTL / LRU / 并发合并）
+"""
+
+import functools
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import yt_dlp
+
+import downloader
+import models
+from config import get_config
+from info_cache import InfoCache
+from models import DownloadTask
+from task_store import MemoryTaskStore
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_expiry():
+    clock = _FakeClock()
+    cache = InfoCache(ttl=10, max_entries=8, clock=clock)
+    calls = []
+    loader = lambda: calls.append(1) or {"title": "a"}
+
+    assert cache.get_or_load("k", loader) == {"title": "a"}
+    assert cache.get_or_load("k", loader) == {"title": "a"}
+    assert len(calls) == 1
+    clock.now = 11
+    cache.get_or_load("k", loader)
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction():
+    cache = InfoCache(ttl=60, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a 变为最近使用
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_errors_not_cached():
+    cache = InfoCache(ttl=60, max_entries=8)
+
+    def _fail():
+        raise RuntimeError("boom")
+
+    for _ in range(2):
+        try:
+            cache.get_or_load("k", _fail)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("loader error should propagate")
+    assert cache.get_or_load("k", lambda: 42) == 42
+
+
+def test_concurrent_single_flight():
+    cache = InfoCache(ttl=60, max_entries=8)
+    calls = []
+    release = threading.Event()
+
+    def _slow():
+        calls.append(1)
+        release.wait(2)
+        return "info"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", _slow)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ["info"] * 5
+    assert len(calls) == 1
+
+
+def test_cached_playlist_info_downloads_entries():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for name in ("a", "b"):
+            (root / f"{name}.mp4").write_bytes(name.encode() * 1000)
+        raw = {
+            "_type": "playlist", "id": "pl", "title": "pl", "webpage_url": "https://example.com/pl",
+            "extractor": "generic", "extractor_key": "Generic",
+            "entries": [
+                {"id": name, "title": name, "ext": "mp4", "url": (root / f"{name}.mp4").as_uri()}
+                for name in ("a", "b")
+            ],
+        }
+        opts = {"quiet": True, "no_warnings": True, "noprogress": True, "enable_file_urls": True}
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.process_ie_result(raw, download=False)
+
+        # 缓存里的同一份结果会被多个任务复用
+        for run in ("first", "second"):
+            task = DownloadTask(task_id=run, username="alice", url="https://example.com/pl")
+            out = root / run
+            downloader._download_with_info({**opts, "outtmpl": str(out / "%(id)s.%(ext)s")}, info, task)
+            assert sorted(p.name for p in out.iterdir()) == ["a.mp4", "b.mp4"]
+            assert task.extract_calls == 0
+        assert len(info["entries"]) == 2
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def test_stale_cached_info_is_extracted_again_once():
+    """缓存里的格式链接已过期（404）时，重新提取一次再下载，而不是直接失败"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "media").mkdir()
+        (root / "media" / "clip.mp4").write_bytes(b"clip" * 1000)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=root / "media"))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        config = get_config()
+        saved = (config.download.base_dir, config.download.dedup)
+        config.download.base_dir = str(root / "downloads")
+        config.download.dedup = False
+        models.set_task_store(MemoryTaskStore())
+        try:
+            url = f"{base}/clip.mp4"
+            stale = {
+                "id": "clip", "title": "clip", "ext": "mp4", "webpage_url": url,
+                "extractor": "generic", "extractor_key": "Generic", "url": f"{base}/expired.mp4",
+            }
+            with yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True}) as ydl:
+                stale = ydl.process_ie_result(stale, download=False)
+            key = downloader._info_cache_key(url, downloader._extract_opts({}), {})
+            downloader.get_info_cache().put(key, stale)
+
+            task = models.create_task("alice", url)
+            downloader._download_worker(task, "best", {})
+            assert task.status == DownloadTask.STATUS_COMPLETED, task.error_msg
+            assert task.extract_calls == 1
+            assert Path(task.file_path).read_bytes() == b"clip" * 1000
+            # 新提取的结果替换了缓存里的旧条目
+            assert downloader.get_info_cache().get(key)["url"] == url
+        finally:
+            server.shutdown()
+            models.close_task_store()
+            downloader.get_info_cache().clear()
+            config.download.base_dir, config.download.dedup = saved
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ttl_expiry,
+        test_lru_eviction,
+        test_errors_not_cached,
+        test_concurrent_single_flight,
+        test_cached_playlist_info_downloads_entries,
+        test_stale_cached_info_is_extracted_again_once,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
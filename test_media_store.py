@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试内容寻址媒体存储（去重 / 硬链接复用 / 节省统计）
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import downloader
+from media_store import MediaStore, hash_file
+
+
+def test_ingest_lookup_and_link():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = MediaStore(root / ".store")
+        try:
+            first = root / "alice" / "t1" / "clip.mp4"
+            first.parent.mkdir(parents=True)
+            first.write_bytes(b"video" * 1000)
+            keys = ["url:https://example.com/v#best", "id:Generic:v#best"]
+
+            assert store.lookup(keys) is None
+            blob = store.ingest(first, keys, title="clip", duration=12)
+            assert blob.digest == hash_file(first)
+            assert (blob.size, blob.ext, blob.title) == (5000, ".mp4", "clip")
+            assert blob.path.stat().st_ino == first.stat().st_ino
+
+            # 其他用户通过媒体 ID 命中，且新的 URL 键也被记录
+            found = store.lookup(["url:https://m.example.com/v#best", "id:Generic:v#best"])
+            assert found is not None and found.digest == blob.digest
+            second = store.link(found, root / "bob" / "t2" / "clip.mp4", ["url:https://m.example.com/v#best"])
+            assert second.read_bytes() == first.read_bytes()
+            assert second.stat().st_ino == first.stat().st_ino
+            assert store.lookup(["url:https://m.example.com/v#best"]).digest == blob.digest
+            # 其他输出规格不会误命中
+            assert store.lookup(["url:https://example.com/v#audio"]) is None
+
+            assert store.stats() == {"blobs": 1, "bytes": 5000, "saved_bytes": 5000, "hits": 1}
+        finally:
+            store.close()
+
+
+def test_concurrent_duplicate_is_folded_into_existing_blob():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = MediaStore(root / ".store")
+        try:
+            a = root / "a.mp4"
+            b = root / "b.mp4"
+            a.write_bytes(b"same bytes")
+            b.write_bytes(b"same bytes")
+            blob_a = store.ingest(a, ["url:a#best"])
+            blob_b = store.ingest(b, ["url:b#best"])
+            assert blob_a.digest == blob_b.digest
+            assert a.stat().st_ino == b.stat().st_ino
+            assert store.stats()["blobs"] == 1
+
+            # 存储文件丢失时不再命中
+            blob_a.path.unlink()
+            a.unlink()
+            b.unlink()
+            assert store.lookup(["url:a#best"]) is None
+        finally:
+            store.close()
+
+
+def test_garbage_collection_frees_unlinked_blobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = MediaStore(root / ".store")
+        try:
+            first = root / "alice" / "t1" / "clip.mp4"
+            first.parent.mkdir(parents=True)
+            first.write_bytes(b"clip" * 100)
+            blob = store.ingest(first, ["url:a#best"])
+            second = store.link(blob, root / "bob" / "t2" / "clip.mp4")
+            assert store.collect_garbage() == (0, 0)
+
+            # 还有任务文件引用时保留
+            first.unlink()
+            assert store.collect_garbage() == (0, 0)
+            assert store.lookup(["url:a#best"]) is not None
+
+            second.unlink()
+            assert store.collect_garbage() == (1, 400)
+            assert not blob.path.exists()
+            assert store.lookup(["url:a#best"]) is None
+            assert store.stats()["blobs"] == 0
+            try:
+                store.link(blob, root / "carol" / "t3" / "clip.mp4")
+                raise AssertionError("linking a reclaimed blob should fail")
+            except FileNotFoundError:
+                pass
+        finally:
+            store.close()
+
+
+def test_media_variant_scoped_to_network_identity():
+    """带 cookies 下载的媒体可能是私有内容，只复用给相同 cookies / 代理的任务"""
+    public = downloader._media_variant("best", {})
+    alice = downloader._media_variant("best", {"cookie_file": "/home/alice/cookies.txt"})
+    bob = downloader._media_variant("best", {"cookie_file": "/home/bob/cookies.txt"})
+    proxied = downloader._media_variant("best", {"cookie_file": "/home/alice/cookies.txt", "proxy": "socks5://p:1080"})
+    assert len({public, alice, bob, proxied}) == 4
+    assert alice == downloader._media_variant("best", {"cookie_file": "/home/alice/cookies.txt", "rate_limit": "2M"})
+
+
+if __name__ == "__main__":
+    tests = [
+        test_ingest_lookup_and_link,
+        test_concurrent_duplicate_is_folded_into_existing_blob,
+        test_garbage_collection_frees_unlinked_blobs,
+        test_media_variant_scoped_to_network_identity,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
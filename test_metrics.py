@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试 Prometheus 指标（文本格式 / 子进程转发 / 抓取时采集）
+"""
+
+import sys
+
+import metrics
+
+_JOBS = metrics.Counter("test_jobs_total", "Jobs.", ("host", "result"))
+_LATENCY = metrics.Histogram("test_latency_seconds", "Latency.", ("host",), buckets=(0.1, 1, 10))
+
+
+def test_render_counters_and_histograms():
+    ok = _JOBS.labels("a.example", "ok")
+    ok.inc()
+    ok.inc(2)
+    _JOBS.labels('b"x', "error").inc()
+    for value in (0.05, 0.1, 0.5, 20):
+        _LATENCY.labels("a.example").observe(value)
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE test_jobs_total counter" in lines
+    assert 'test_jobs_total{host="a.example",result="ok"} 3' in lines
+    assert 'test_jobs_total{host="b\\"x",result="error"} 1' in lines
+    assert 'test_latency_seconds_bucket{host="a.example",le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{host="a.example",le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{host="a.example",le="10"} 3' in lines
+    assert 'test_latency_seconds_bucket{host="a.example",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{host="a.example"} 4' in lines
+    assert 'test_latency_seconds_sum{host="a.example"} 20.65' in lines
+
+
+def test_relay_forwards_updates_to_parent():
+    relayed = []
+    metrics.set_relay(lambda *update: relayed.append(update))
+    try:
+        _JOBS.labels("relay.example", "ok").inc(5)
+        _LATENCY.labels("relay.example").observe(0.5)
+    finally:
+        metrics.set_relay(None)
+    # 子进程里只转发，不在本地记账
+    assert _JOBS.labels("relay.example", "ok").value == 0
+    assert relayed == [
+        ("test_jobs_total", ("relay.example", "ok"), "inc", 5),
+        ("test_latency_seconds", ("relay.example",), "observe", 0.5),
+    ]
+    for update in relayed:
+        metrics.apply(*update)
+    assert _JOBS.labels("relay.example", "ok").value == 5
+    assert _LATENCY.labels("relay.example").count == 1
+
+
+def test_collectors_and_pipeline_metrics_are_exposed():
+    import downloader  # noqa: F401  注册下载 / 预览指标与采集函数
+    import models
+    from task_store import MemoryTaskStore
+
+    metrics.add_collector(lambda: [("test_queue_depth", "gauge", "Queue.", [({"name": "q"}, 7)])])
+    models.close_task_store()
+    # 抓取不会按配置打开任务库（./data/tasks.db）
+    text = metrics.render()
+    assert models.peek_task_store() is None
+    assert "splazdl_download_speed_bytes" not in text
+
+    models.set_task_store(MemoryTaskStore())
+    try:
+        text = metrics.render()
+    finally:
+        models.close_task_store()
+    assert 'test_queue_depth{name="q"} 7' in text
+    for name in (
+        "splazdl_downloads_total",
+        "splazdl_download_bytes_total",
+        "splazdl_probe_duration_seconds",
+        "splazdl_oss_uploads_total",
+        "splazdl_notifications_total",
+        "splazdl_info_cache_entries",
+        "splazdl_download_speed_bytes",
+    ):
+        assert f"# TYPE {name} " in text, name
+
+
+if __name__ == "__main__":
+    tests = [
+        test_render_counters_and_histograms,
+        test_relay_forwards_updates_to_parent,
+        test_collectors_and_pipeline_metrics_are_exposed,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
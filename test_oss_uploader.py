@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+测试 OSS 上传辅助（Bucket 复用 / 进度节流）
+"""
+
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import oss_uploader
+from oss_uploader import UploadProgress, stream_to_oss
+
+
+class _FakeOss:
+    """本地假 OSS：只实现分片上传（初始化 / 上传分片 / 完成 / 取消）"""
+
+    def __init__(self):
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.objects: dict[str, bytes] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        oss = self
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: bytes = b"", headers: dict | None = None):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query, keep_blank_values=True)
+                body = self._body()
+                if "uploads" in query:
+                    upload_id = f"u{len(oss.uploads) + 1}"
+                    oss.uploads[upload_id] = {}
+                    xml = f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                    return self._reply(200, xml.encode())
+                parts = oss.uploads.pop(query["uploadId"][0])
+                numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+                oss.objects[unquote(url.path)] = b"".join(parts[n] for n in numbers)
+                return self._reply(200, b"<CompleteMultipartUploadResult></CompleteMultipartUploadResult>")
+
+            def do_PUT(self):
+                with lock:
+                    oss.in_flight += 1
+                    oss.max_in_flight = max(oss.max_in_flight, oss.in_flight)
+                query = parse_qs(urlparse(self.path).query)
+                data = self._body()
+                time.sleep(0.02)
+                oss.uploads[query["uploadId"][0]][int(query["partNumber"][0])] = data
+                with lock:
+                    oss.in_flight -= 1
+                self._reply(200, headers={"ETag": f'"{len(data)}"'})
+
+            def do_DELETE(self):
+                oss.uploads.pop(parse_qs(urlparse(self.path).query)["uploadId"][0], None)
+                self._reply(204)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _oss_env(endpoint: str) -> dict:
+    env = {
+        "SPLAZDL_OSS_ENDPOINT": endpoint, "SPLAZDL_OSS_BUCKET": "splazdl-test",
+        "SPLAZDL_OSS_ACCESS_KEY_ID": "ak", "SPLAZDL_OSS_ACCESS_KEY_SECRET": "sk",
+        "SPLAZDL_OSS_CDN_DOMAIN": "", "SPLAZDL_OSS_PART_SIZE_MB": "1", "SPLAZDL_OSS_UPLOAD_THREADS": "2",
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    return saved
+
+
+def _restore_env(saved: dict) -> None:
+    for k, v in saved.items():
+        if v is None:
+            os.environ.pop(k, None)
+        else:
+            os.environ[k] = v
+
+
+async def _chunks(data: bytes, size: int = 64 * 1024, fail_at: int = -1):
+    for i in range(0, len(data), size):
+        if i == fail_at:
+            raise ConnectionError("client went away")
+        await asyncio.sleep(0)
+        yield data[i:i + size]
+
+
+def test_bucket_is_reused_per_target():
+    a = oss_uploader._get_bucket("https://oss-cn-hangzhou.aliyuncs.com", "splazdl-a", "ak", "sk")
+    b = oss_uploader._get_bucket("https://oss-cn-hangzhou.aliyuncs.com", "splazdl-a", "ak", "sk")
+    c = oss_uploader._get_bucket("https://oss-cn-hangzhou.aliyuncs.com", "splazdl-b", "ak", "sk")
+    assert a is b
+    assert c is not a
+    assert oss_uploader._buckets[("https://oss-cn-hangzhou.aliyuncs.com", "splazdl-a", "ak")] is a
+
+
+def test_upload_progress_is_throttled():
+    updates: list[tuple[float, float]] = []
+    progress = UploadProgress(lambda pct, rate: updates.append((pct, rate)), interval=10)
+    for uploaded in range(0, 100, 10):
+        progress(uploaded, 100)
+    assert len(updates) == 1
+    time.sleep(0.01)
+    progress(100, 100)
+    assert len(updates) == 2
+    assert updates[-1][0] == 100
+    assert updates[-1][1] > 0
+
+
+def test_stream_upload_sends_parts_while_receiving():
+    oss = _FakeOss()
+    saved = _oss_env(oss.endpoint)
+    try:
+        data = os.urandom(5 * 1024 * 1024 + 123)
+        url = asyncio.run(stream_to_oss("t1", "../clip.mp4", _chunks(data), size=len(data)))
+        assert url == f"{oss.endpoint}/splazdl-test/splazdl/t1/clip.mp4"
+        assert oss.objects["/splazdl-test/splazdl/t1/clip.mp4"] == data
+        assert 1 < oss.max_in_flight <= 2
+        assert oss.uploads == {}
+    finally:
+        _restore_env(saved)
+        oss.close()
+
+
+def test_stream_upload_is_aborted_on_failure():
+    oss = _FakeOss()
+    saved = _oss_env(oss.endpoint)
+    try:
+        data = os.urandom(3 * 1024 * 1024)
+        url = asyncio.run(stream_to_oss("t2", "clip.mp4", _chunks(data, fail_at=2 * 1024 * 1024)))
+        assert url == ""
+        assert oss.objects == {}
+        assert oss.uploads == {}
+    finally:
+        _restore_env(saved)
+        oss.close()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_bucket_is_reused_per_target,
+        test_upload_progress_is_throttled,
+        test_stream_upload_sends_parts_while_receiving,
+        test_stream_upload_is_aborted_on_failure,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
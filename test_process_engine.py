@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+测试子进程下载引擎（字段变更回传 / 暂停取消信号）
+"""
+
+import functools
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import yt_dlp
+
+from config import get_config
+from models import DownloadTask
+from process_engine import ProcessEngine
+from task_store import MemoryTaskStore
+import models
+
+
+def _fake_worker(task: DownloadTask, total: int) -> None:
+    """在子进程中运行：模拟下载进度，直到收到取消信号"""
+    import downloader
+
+    task.status = DownloadTask.STATUS_DOWNLOADING
+    task.title = "子进程标题"
+    for i in range(1, total + 1):
+        if downloader._stop_requested(task.task_id):
+            task.status = DownloadTask.STATUS_PAUSED
+            return
+        task.progress = i * 100 / total
+        time.sleep(0.02)
+    task.status = DownloadTask.STATUS_COMPLETED
+
+
+def test_changes_flow_back_and_controls_reach_child():
+    models.set_task_store(MemoryTaskStore())
+    engine = ProcessEngine(2, get_config())
+    try:
+        done = models.create_task("alice", "https://example.com/a")
+        engine.run(_fake_worker, done, 5)
+        assert done.status == DownloadTask.STATUS_COMPLETED
+        assert done.title == "子进程标题"
+        assert done.progress == 100
+
+        stopped = models.create_task("alice", "https://example.com/b")
+        engine.controls[stopped.task_id] = ""
+        runner = threading.Thread(target=engine.run, args=(_fake_worker, stopped, 10_000))
+        runner.start()
+        deadline = time.time() + 30
+        while stopped.progress == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        engine.controls[stopped.task_id] = "pause"
+        runner.join(30)
+        assert not runner.is_alive()
+        assert stopped.status == DownloadTask.STATUS_PAUSED
+        assert 0 < stopped.progress < 100
+        assert stopped.task_id not in engine.controls
+    finally:
+        engine.shutdown()
+        models.close_task_store()
+
+
+class _SlowStore(MemoryTaskStore):
+    """回传的第一条进度变更卡住，直到测试放行（模拟积压的回传线程）"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def on_task_changed(self, task: DownloadTask, name: str, old) -> None:
+        if name == "progress":
+            self.release.wait(30)
+        super().on_task_changed(task, name, old)
+
+
+def test_run_waits_for_backlogged_updates():
+    store = _SlowStore()
+    models.set_task_store(store)
+    engine = ProcessEngine(1, get_config())
+    try:
+        task = models.create_task("alice", "https://example.com/a")
+        runner = threading.Thread(target=engine.run, args=(_fake_worker, task, 3))
+        runner.start()
+        # 子进程早已结束，回传线程还没应用完；run 不能提前返回
+        runner.join(6)
+        assert runner.is_alive()
+        assert task.status == DownloadTask.STATUS_DOWNLOADING
+        store.release.set()
+        runner.join(30)
+        assert not runner.is_alive()
+        assert task.status == DownloadTask.STATUS_COMPLETED
+    finally:
+        store.release.set()
+        engine.shutdown()
+        models.close_task_store()
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def test_process_mode_reuses_parent_info_cache():
+    """子进程模式在主进程提取（命中预览写入的元数据缓存），子进程只负责下载"""
+    import downloader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "clip.mp4").write_bytes(b"clip" * 1000)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=tmp))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        config = get_config()
+        saved = (config.download.base_dir, config.download.dedup)
+        config.download.base_dir = str(root / "downloads")
+        config.download.dedup = False
+        models.set_task_store(MemoryTaskStore())
+        engine = ProcessEngine(1, config)
+        try:
+            url = "https://example.com/watch/clip"
+            raw = {
+                "id": "clip", "title": "clip", "ext": "mp4", "webpage_url": url,
+                "extractor": "generic", "extractor_key": "Generic",
+                "url": f"http://127.0.0.1:{server.server_address[1]}/clip.mp4",
+            }
+            with yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True}) as ydl:
+                info = ydl.process_ie_result(raw, download=False)
+            # 预览阶段已把结果写入主进程的缓存
+            downloader.get_info_cache().put(downloader._info_cache_key(url, downloader._extract_opts({}), {}), info)
+
+            task = models.create_task("alice", url)
+            downloader._task_control(task.task_id)
+            downloader._run_in_process(engine, task, "best", {})
+            assert task.status == DownloadTask.STATUS_COMPLETED, task.error_msg
+            assert task.extract_calls == 0
+            assert Path(task.file_path).read_bytes() == b"clip" * 1000
+            assert [span["stage"] for span in task.timings][:2] == ["extract", "prepare"]
+        finally:
+            engine.shutdown()
+            server.shutdown()
+            models.close_task_store()
+            downloader.get_info_cache().clear()
+            config.download.base_dir, config.download.dedup = saved
+
+
+if __name__ == "__main__":
+    tests = [
+        test_changes_flow_back_and_controls_reach_child,
+        test_run_waits_for_backlogged_updates,
+        test_process_mode_reuses_parent_info_cache,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+测试公平调度器（优先级 / 用户轮转 / 权重 / 取消 / 调整优先级）
+"""
+
+import sys
+import threading
+import time
+
+from scheduler import FairScheduler, PRIORITY_BULK, PRIORITY_NORMAL, PRIORITY_URGENT
+
+
+def _blocked_scheduler(**kwargs) -> tuple[FairScheduler, threading.Event, list[str]]:
+    """单 worker 调度器，先提交一个阻塞任务占住 worker，后续任务都留在队列里"""
+    sched = FairScheduler(max_workers=1, **kwargs)
+    gate = threading.Event()
+    ran: list[str] = []
+    started = threading.Event()
+
+    def _block():
+        started.set()
+        gate.wait(5)
+
+    sched.submit("blocker", "system", _block)
+    started.wait(5)
+    return sched, gate, ran
+
+
+def _drain(sched: FairScheduler, gate: threading.Event, ran: list[str], expected: int):
+    gate.set()
+    deadline = time.time() + 5
+    while len(ran) < expected and time.time() < deadline:
+        time.sleep(0.01)
+    sched.shutdown()
+
+
+def test_round_robin_across_users():
+    sched, gate, ran = _blocked_scheduler()
+    for i in range(4):
+        sched.submit(f"a{i}", "alice", ran.append, f"a{i}")
+    for i in range(2):
+        sched.submit(f"b{i}", "bob", ran.append, f"b{i}")
+    assert list(sched.positions()) == ["a0", "b0", "a1", "b1", "a2", "a3"]
+    _drain(sched, gate, ran, 6)
+    assert ran == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+def test_priority_and_weights():
+    sched, gate, ran = _blocked_scheduler(weights={"alice": 2})
+    for i in range(4):
+        sched.submit(f"a{i}", "alice", ran.append, f"a{i}", priority=PRIORITY_BULK)
+    for i in range(2):
+        sched.submit(f"b{i}", "bob", ran.append, f"b{i}", priority=PRIORITY_BULK)
+    sched.submit("c0", "carol", ran.append, "c0", priority=PRIORITY_NORMAL)
+    assert list(sched.positions()) == ["c0", "a0", "a1", "b0", "a2", "a3", "b1"]
+    _drain(sched, gate, ran, 7)
+    assert ran == ["c0", "a0", "a1", "b0", "a2", "a3", "b1"]
+
+
+def test_cancel_and_reprioritize():
+    sched, gate, ran = _blocked_scheduler()
+    for i in range(3):
+        sched.submit(f"a{i}", "alice", ran.append, f"a{i}", priority=PRIORITY_BULK)
+    assert sched.cancel("a1")
+    assert not sched.cancel("a1")
+    assert sched.reprioritize("a2", PRIORITY_URGENT)
+    assert not sched.reprioritize("missing", PRIORITY_URGENT)
+    assert sched.positions() == {"a2": 1, "a0": 2}
+    _drain(sched, gate, ran, 2)
+    assert ran == ["a2", "a0"]
+
+
+def test_positions_memoized_until_queue_changes():
+    sched, gate, ran = _blocked_scheduler()
+    for i in range(3):
+        sched.submit(f"a{i}", "alice", ran.append, f"a{i}")
+    version = sched.version
+    ranks = sched.ranks()
+    # 队列不变时重复读取不重新计算
+    assert sched.ranks() is ranks
+    assert not sched.cancel("missing")
+    assert sched.version == version
+
+    sched.cancel("a0")
+    assert sched.version != version
+    assert sched.positions() == {"a1": 1, "a2": 2}
+    dispatched = sched.dispatched
+    _drain(sched, gate, ran, 2)
+    # 按顺序派发队首不改变其余任务的相对顺序：排名不变，位置 = 排名 - 已派发数
+    assert ran == ["a1", "a2"]
+    assert sched.dispatched == dispatched + 2
+    assert sched.positions() == {}
+
+
+def test_in_order_dispatch_keeps_ranks():
+    sched, gate, ran = _blocked_scheduler()
+    hold = threading.Event()
+    for i in range(3):
+        sched.submit(f"a{i}", "alice", hold.wait, 5)
+    version = sched.version
+    ranks = dict(sched.ranks())
+    gate.set()
+    deadline = time.time() + 5
+    while sched.dispatched < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    # 阻塞任务结束后 a0 按顺序被派发：版本不变，a1、a2 的排名不变、位置前移
+    assert sched.version == version
+    assert sched.ranks() == ranks
+    assert sched.positions() == {"a1": 1, "a2": 2}
+    hold.set()
+    sched.shutdown()
+
+
+def test_out_of_order_dispatch_bumps_version():
+    busy = {"douyin.com"}
+    sched = FairScheduler(
+        max_workers=1,
+        admit=lambda resource: float("inf") if resource in busy else 0.0,
+    )
+    hold = threading.Event()
+    sched.submit("d0", "alice", hold.wait, 5, resource="douyin.com")
+    sched.submit("d1", "alice", hold.wait, 5, resource="douyin.com")
+    sched.submit("b0", "bob", hold.wait, 5, resource="douyin.com")
+    # 只有 y0 的站点有空位，它跳过前面的任务先派发，排在它后面的任务位置不再连续
+    version = sched.version
+    sched.submit("y0", "bob", hold.wait, 5, resource="youtube.com")
+    deadline = time.time() + 5
+    while sched.dispatched < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    # 入队一次 + 越过队首派发一次
+    assert sched.version == version + 2
+    assert sched.positions() == {"d0": 1, "b0": 2, "d1": 3}
+    hold.set()
+    sched.shutdown()
+
+
+def test_saturated_resource_does_not_block_others():
+    limiter_slots = {"douyin.com": 1}
+    active = {"douyin.com": 0}
+
+    def admit(resource: str) -> float:
+        if active.get(resource, 0) >= limiter_slots.get(resource, 99):
+            return float("inf")
+        active[resource] = active.get(resource, 0) + 1
+        return 0.0
+
+    def release(resource: str) -> None:
+        active[resource] -= 1
+
+    sched = FairScheduler(max_workers=2, admit=admit, release=release)
+    gate = threading.Event()
+    ran: list[str] = []
+
+    def _job(name: str):
+        ran.append(name)
+        if name == "d0":
+            gate.wait(5)
+
+    sched.submit("d0", "alice", _job, "d0", resource="douyin.com")
+    sched.submit("d1", "alice", _job, "d1", resource="douyin.com")
+    sched.submit("y0", "alice", _job, "y0", resource="youtube.com")
+    time.sleep(0.3)
+    # d1 排在 y0 前面，但 douyin 已满，y0 先占用空闲 worker，d1 留在队列里
+    assert ran == ["d0", "y0"]
+    assert sched.is_queued("d1")
+    gate.set()
+    time.sleep(0.3)
+    assert ran == ["d0", "y0", "d1"]
+    sched.shutdown()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_round_robin_across_users,
+        test_priority_and_weights,
+        test_cancel_and_reprioritize,
+        test_positions_memoized_until_queue_changes,
+        test_in_order_dispatch_keeps_ranks,
+        test_out_of_order_dispatch_bumps_version,
+        test_saturated_resource_does_not_block_others,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
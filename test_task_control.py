@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+测试任务控制（排队中暂停 / 继续 / 取消 / 批量取消）
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from config import HostLimitConfig, get_config
+from models import DownloadTask
+from task_store import MemoryTaskStore
+import downloader
+import models
+
+HOST = "media.example.com"
+
+
+def _setup(tmp: str) -> None:
+    """所有任务都因站点令牌耗尽而停留在队列里，不会真正发起网络请求"""
+    config = get_config()
+    config.download.base_dir = tmp
+    config.hosts = {HOST: HostLimitConfig(rate=0.0001, burst=1)}
+    models.set_task_store(MemoryTaskStore())
+    downloader._host_limiter = None
+    downloader._scheduler = None
+    assert downloader.get_host_limiter().try_acquire(HOST) == 0
+
+
+def _teardown() -> None:
+    downloader.get_scheduler().shutdown()
+    downloader.get_upload_scheduler().shutdown()
+    downloader._host_limiter = None
+    downloader._scheduler = None
+    downloader._upload_scheduler = None
+    models.close_task_store()
+
+
+def test_pause_resume_and_cancel_queued_task():
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(tmp)
+        try:
+            task = models.create_task("alice", f"https://{HOST}/v/1")
+            downloader.start_download_for_task(task, "720p", {"rate_limit": "2M"})
+            assert downloader.get_scheduler().is_queued(task.task_id)
+
+            assert downloader.pause_task(task.task_id)
+            assert task.status == DownloadTask.STATUS_PAUSED
+            assert not downloader.get_scheduler().is_queued(task.task_id)
+
+            # 暂停期间留下的部分文件
+            task_dir = Path(tmp) / "alice" / task.task_id
+            task_dir.mkdir(parents=True)
+            (task_dir / "video.mp4.part").write_bytes(b"x" * 10)
+
+            assert downloader.resume_task(task.task_id)
+            assert task.status == DownloadTask.STATUS_PENDING
+            assert (task.quality, task.options) == ("720p", {"rate_limit": "2M"})
+            assert downloader.get_scheduler().is_queued(task.task_id)
+            assert not downloader.resume_task(task.task_id)
+
+            assert downloader.cancel_task(task.task_id)
+            assert task.status == DownloadTask.STATUS_FAILED
+            assert not downloader.get_scheduler().is_queued(task.task_id)
+            assert not task_dir.exists()
+            assert (Path(tmp) / ".trash" / "alice" / task.task_id / "video.mp4.part").exists()
+            # 已取消任务的文件在 .trash 里，不能再继续
+            assert not downloader.resume_task(task.task_id)
+            assert task.status == DownloadTask.STATUS_FAILED
+        finally:
+            _teardown()
+
+
+def test_concurrent_resume_submits_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(tmp)
+        try:
+            task = models.create_task("alice", f"https://{HOST}/v/twice")
+            downloader.start_download_for_task(task)
+            assert downloader.pause_task(task.task_id)
+            barrier = threading.Barrier(8)
+            results: list[bool] = []
+
+            def _resume():
+                barrier.wait()
+                results.append(downloader.resume_task(task.task_id))
+
+            threads = [threading.Thread(target=_resume) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert sorted(results) == [False] * 7 + [True]
+            assert downloader.get_scheduler().is_queued(task.task_id)
+        finally:
+            _teardown()
+
+
+def test_cancel_pending_tasks_for_user():
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(tmp)
+        try:
+            alice, _ = models.create_tasks_if_new("alice", [f"https://{HOST}/v/{i}" for i in range(50)])
+            bob = models.create_task("bob", f"https://{HOST}/v/bob")
+            for task in [*alice, bob]:
+                downloader.start_download_for_task(task)
+
+            assert downloader.cancel_pending_tasks("alice") == 50
+            assert all(t.status == DownloadTask.STATUS_FAILED for t in alice)
+            assert downloader.get_scheduler().positions() == {bob.task_id: 1}
+            assert bob.status == DownloadTask.STATUS_PENDING
+            assert downloader.cancel_pending_tasks("alice") == 0
+        finally:
+            _teardown()
+
+
+def test_requeued_upload_stage_completes_task():
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(tmp)
+        try:
+            task = models.create_task("alice", f"https://{HOST}/v/up")
+            media = Path(tmp) / "alice" / task.task_id / "video.mp4"
+            media.parent.mkdir(parents=True)
+            media.write_bytes(b"x" * 10)
+            task.file_path = str(media)
+            task.file_size = 10
+            task.status = DownloadTask.STATUS_UPLOADING
+            # 上传中的任务不能再取消（文件已就绪）
+            assert not downloader.cancel_task(task.task_id)
+
+            # 未配置 OSS：上传阶段直接完成，不占用下载槽位
+            assert downloader.requeue_uploads() == 1
+            deadline = time.monotonic() + 5
+            while task.status == DownloadTask.STATUS_UPLOADING and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert task.status == DownloadTask.STATUS_COMPLETED
+            assert task.oss_url == ""
+            assert downloader.get_scheduler().stats()["active"] == 0
+        finally:
+            _teardown()
+
+
+def test_progress_hook_samples_and_stops():
+    models.set_task_store(MemoryTaskStore())
+    try:
+        task = models.create_task("alice", f"https://{HOST}/v/hook")
+        control = downloader._TaskControl()
+        hook = downloader._progress_hook(task, control, interval=60)
+        total = 10_000 * 1024
+        for i in range(1, 10_000):
+            hook({"status": "downloading", "downloaded_bytes": i * 1024, "total_bytes": total,
+                  "speed": 2048.0, "eta": 10_000 - i})
+        # 间隔内只采样第一次回调，不会逐次改写任务
+        assert task.downloaded_bytes == 1024
+        assert (task.speed, task.eta) == (2048.0, 9999)
+        assert task.status == DownloadTask.STATUS_DOWNLOADING
+
+        # 下载完成的那次回调总会记录
+        hook({"status": "downloading", "downloaded_bytes": total, "total_bytes": total, "speed": 4096.0, "eta": 0})
+        assert (task.downloaded_bytes, task.total_bytes, task.progress) == (total, total, 100)
+
+        control.request("pause")
+        try:
+            hook({"status": "downloading", "downloaded_bytes": 1, "total_bytes": total})
+            raise AssertionError("hook should stop a paused download")
+        except InterruptedError:
+            pass
+    finally:
+        models.close_task_store()
+
+
+def test_progress_hook_counts_every_byte_from_resume_offset():
+    models.set_task_store(MemoryTaskStore())
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            task_dir = Path(tmp)
+            # 视频上次下到 3000 字节，本次从断点续传；音频是新文件
+            (task_dir / "v.f1.mp4.part").write_bytes(b"x" * 3000)
+            task = models.create_task("alice", f"https://{HOST}/v/bytes")
+            received = downloader._DOWNLOAD_BYTES.labels(HOST, "alice")
+            before = received.value
+            hook = downloader._progress_hook(task, downloader._TaskControl(), interval=60, task_dir=task_dir)
+            video = {"filename": str(task_dir / "v.f1.mp4"), "tmpfilename": str(task_dir / "v.f1.mp4.part")}
+            audio = {"filename": str(task_dir / "v.f2.m4a"), "tmpfilename": str(task_dir / "v.f2.m4a.part")}
+            for downloaded in (4000, 5000, 6000):
+                hook({**video, "status": "downloading", "downloaded_bytes": downloaded})
+            hook({**video, "status": "finished", "downloaded_bytes": 7000})
+            # 音频的第一次回调不受视频采样间隔影响
+            hook({**audio, "status": "downloading", "downloaded_bytes": 500})
+            assert task.downloaded_bytes == 500
+            hook({**audio, "status": "finished", "downloaded_bytes": 800})
+            # 续传部分不计入本次接收量，首次采样前与最后一次采样后的字节都要计入
+            assert received.value - before == (7000 - 3000) + 800
+    finally:
+        models.close_task_store()
+
+
+def test_cancel_during_post_processing_wins():
+    """取消在最后一个检查点之后（写 xattr 时）到达，不能被随后的完成状态覆盖"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(tmp)
+        dedup = get_config().download.dedup
+        get_config().download.dedup = False
+        patched = {
+            name: getattr(downloader, name)
+            for name in ("_extract_info_with_candidates", "_fetch_media", "subprocess")
+        }
+
+        def _fetch(task, task_dir, *args):
+            media = task_dir / "video.mp4"
+            media.write_bytes(b"x" * 10)
+            return media
+
+        try:
+            task = models.create_task("alice", f"https://{HOST}/v/late-cancel")
+            downloader._extract_info_with_candidates = lambda *args, **kwargs: ({"title": "视频"}, {})
+            downloader._fetch_media = _fetch
+            downloader.subprocess = SimpleNamespace(run=lambda *args, **kwargs: downloader.cancel_task(task.task_id))
+            downloader._download_worker(task, "best", {})
+
+            assert task.status == DownloadTask.STATUS_FAILED
+            assert task.error_msg == downloader._CANCELLED_MSG
+            assert not (Path(tmp) / "alice" / task.task_id).exists()
+            assert (Path(tmp) / ".trash" / "alice" / task.task_id / "video.mp4").exists()
+            assert task.task_id not in downloader._task_controls
+        finally:
+            for name, value in patched.items():
+                setattr(downloader, name, value)
+            get_config().download.dedup = dedup
+            _teardown()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_pause_resume_and_cancel_queued_task,
+        test_concurrent_resume_submits_once,
+        test_cancel_pending_tasks_for_user,
+        test_requeued_upload_stage_completes_task,
+        test_progress_hook_samples_and_stops,
+        test_progress_hook_counts_every_byte_from_resume_offset,
+        test_cancel_during_post_processing_wins,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+测试任务存储后端（内存 / SQLite）
+"""
+
+import json
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+from models import DownloadTask
+from task_store import MemoryTaskStore, SqliteTaskStore
+import models
+
+
+def _check_basic_api(store):
+    models.set_task_store(store)
+    try:
+        created, skipped = models.create_tasks_if_new("alice", ["u1", "u2", "u1"])
+        assert [t.url for t in created] == ["u1", "u2"]
+        assert skipped == 1
+        created, skipped = models.create_tasks_if_new("alice", ["u2", "u3"])
+        assert [t.url for t in created] == ["u3"] and skipped == 1
+        models.create_task("bob", "u1")
+
+        assert [t.url for t in models.get_user_tasks("alice")] == ["u1", "u2", "u3"]
+        assert len(models.get_all_tasks()) == 4
+        assert models.get_existing_urls("bob") == {"u1"}
+
+        task = models.get_user_tasks("alice")[0]
+        assert models.get_task(task.task_id) is task
+        task.status = DownloadTask.STATUS_COMPLETED
+        assert [t.task_id for t in models.get_completed_tasks("alice")] == [task.task_id]
+        assert models.get_completed_tasks("bob") == []
+
+        models.delete_task(task.task_id)
+        assert models.get_task(task.task_id) is None
+        models.clear_tasks("alice")
+        assert models.get_user_tasks("alice") == []
+        assert len(models.get_all_tasks()) == 1
+    finally:
+        models.set_task_store(None)
+        store.close()
+
+
+def _check_query(store):
+    models.set_task_store(store)
+    try:
+        created, _ = models.create_tasks_if_new("alice", [f"https://example.com/v/{i}" for i in range(25)])
+        models.create_task("bob", "https://example.com/v/bob")
+        for i, task in enumerate(created):
+            task.title = f"Clip {i:02d}" if i % 5 else f"Special_{i}"
+            task.file_size = (i * 7) % 25
+            if i % 3 == 0:
+                task.status = DownloadTask.STATUS_COMPLETED
+
+        page, total = models.query_tasks(username="alice", offset=20, limit=10)
+        assert total == 25
+        assert [t.task_id for t in page] == [t.task_id for t in created[20:]]
+
+        page, total = models.query_tasks(username="alice", descending=True, limit=3)
+        assert [t.task_id for t in page] == [t.task_id for t in created[:-4:-1]]
+
+        page, total = models.query_tasks(username="alice", status=DownloadTask.STATUS_COMPLETED, limit=2)
+        assert total == 9 and [t.task_id for t in page] == [created[0].task_id, created[3].task_id]
+
+        # 关键字不区分大小写；"_" 按字面匹配
+        page, total = models.query_tasks(username="alice", keyword="special_")
+        assert total == 5 and all(t.title.startswith("Special_") for t in page)
+        assert models.query_tasks(username="alice", keyword="clip_")[1] == 0
+        assert models.query_tasks(keyword="v/bob")[1] == 1
+
+        page, _ = models.query_tasks(username="alice", sort="file_size", descending=True, limit=5)
+        assert [t.file_size for t in page] == [24, 23, 22, 21, 20]
+    finally:
+        models.set_task_store(None)
+        store.close()
+
+
+def test_memory_store():
+    _check_basic_api(MemoryTaskStore())
+
+
+def test_memory_query():
+    _check_query(MemoryTaskStore())
+
+
+def test_memory_indexes_follow_status_changes():
+    store = MemoryTaskStore()
+    models.set_task_store(store)
+    try:
+        created, _ = models.create_tasks_if_new("alice", ["u1", "u2", "u3"])
+        bob = models.create_task("bob", "u1")
+        created[2].status = DownloadTask.STATUS_COMPLETED
+        created[0].status = DownloadTask.STATUS_DOWNLOADING
+        created[0].status = DownloadTask.STATUS_COMPLETED
+        bob.status = DownloadTask.STATUS_COMPLETED
+
+        # 结果保持创建顺序，而不是进入 completed 的先后
+        assert models.get_completed_tasks("alice") == [created[0], created[2]]
+        assert len(models.get_completed_tasks()) == 3
+        assert store.list_tasks(status=DownloadTask.STATUS_PENDING) == [created[1]]
+        assert store.list_tasks(status=DownloadTask.STATUS_DOWNLOADING) == []
+        # 按用户查询同样按创建顺序，不受状态变化时重新插入索引的影响
+        assert models.get_user_tasks("alice") == created
+
+        created[1].url = "u9"
+        assert models.get_existing_urls("alice") == {"u1", "u3", "u9"}
+        models.delete_task(created[0].task_id)
+        assert models.get_existing_urls("alice") == {"u3", "u9"}
+        assert models.get_completed_tasks("alice") == [created[2]]
+        # 已删除任务后续的状态变化不会重新进入索引
+        created[0].status = DownloadTask.STATUS_FAILED
+        assert store.list_tasks(status=DownloadTask.STATUS_FAILED) == []
+    finally:
+        models.close_task_store()
+
+
+def test_sqlite_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        _check_basic_api(SqliteTaskStore(str(Path(tmp) / "tasks.db")))
+
+
+def test_sqlite_query():
+    with tempfile.TemporaryDirectory() as tmp:
+        _check_query(SqliteTaskStore(str(Path(tmp) / "tasks.db"), flush_interval=60))
+
+
+def test_sqlite_persists_across_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "tasks.db")
+        store = SqliteTaskStore(db, flush_interval=60)
+        models.set_task_store(store)
+        done = models.create_task("alice", "https://example.com/a")
+        running = models.create_task("alice", "https://example.com/b")
+        done.title = "标题"
+        done.status = DownloadTask.STATUS_COMPLETED
+        done.oss_url = "https://cdn.example.com/a.mp4"
+        running.status = DownloadTask.STATUS_DOWNLOADING
+        running.progress = 42.0
+        running.quality = "720p"
+        running.options = {"audio_only": False, "rate_limit": "2M"}
+        models.close_task_store()
+
+        store = SqliteTaskStore(db)
+        models.set_task_store(store)
+        try:
+            reloaded = models.get_task(done.task_id)
+            assert reloaded is not done
+            assert reloaded.title == "标题"
+            assert reloaded.oss_url == "https://cdn.example.com/a.mp4"
+            assert reloaded.created_at == done.created_at
+            interrupted = models.get_task(running.task_id)
+            assert interrupted.status == DownloadTask.STATUS_PAUSED
+            assert interrupted.progress == 42.0
+            # 继续下载沿用原画质和选项
+            assert interrupted.quality == "720p"
+            assert interrupted.options == {"audio_only": False, "rate_limit": "2M"}
+        finally:
+            models.close_task_store()
+
+
+def test_sqlite_migrates_file_size_to_indexed_column():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "tasks.db")
+        # 旧版本的库：file_size 存在 data 列里
+        conn = sqlite3.connect(db)
+        conn.execute(
+            "CREATE TABLE tasks (task_id TEXT PRIMARY KEY, username TEXT NOT NULL, url TEXT NOT NULL, "
+            "status TEXT NOT NULL, created_at TEXT NOT NULL, data TEXT NOT NULL DEFAULT '{}')"
+        )
+        for i, size in enumerate((300, 100, 200)):
+            conn.execute(
+                "INSERT INTO tasks VALUES (?, 'alice', ?, ?, ?, ?)",
+                (f"t{i}", f"u{i}", DownloadTask.STATUS_COMPLETED, f"2024-01-0{i + 1}T00:00:00",
+                 json.dumps({"title": f"v{i}", "file_size": size})),
+            )
+        conn.commit()
+        conn.close()
+
+        store = SqliteTaskStore(db, flush_interval=60)
+        models.set_task_store(store)
+        try:
+            page, total = models.query_tasks(
+                username="alice", status=DownloadTask.STATUS_COMPLETED, sort="file_size", descending=True,
+            )
+            assert total == 3 and [t.file_size for t in page] == [300, 200, 100]
+            assert page[0].title == "v0"
+            # 大小变化在下一次按大小排序的查询前落盘
+            page[2].file_size = 999
+            page, _ = models.query_tasks(username="alice", sort="file_size", descending=True, limit=1)
+            assert page[0].task_id == "t1"
+            plan = " ".join(
+                r[-1] for r in store._conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT * FROM tasks WHERE username = ? AND status = ? ORDER BY file_size",
+                    ("alice", DownloadTask.STATUS_COMPLETED),
+                )
+            )
+            assert "idx_tasks_user_status_size" in plan, plan
+        finally:
+            models.close_task_store()
+
+
+def test_sqlite_cleared_task_not_written_back():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteTaskStore(str(Path(tmp) / "tasks.db"), flush_interval=60)
+        models.set_task_store(store)
+        try:
+            task = models.create_task("alice", "https://example.com/a")
+            models.clear_tasks("alice")
+            # 下载线程仍持有对象并继续更新进度
+            task.progress = 50.0
+            store.flush()
+            assert models.get_all_tasks() == []
+        finally:
+            models.close_task_store()
+
+
+class _RacingDirty(dict):
+    """取完待落盘任务之后，模拟下载线程紧接着写入另一个任务的最终状态"""
+
+    def __init__(self, race):
+        super().__init__()
+        self.race = race
+
+    def values(self):
+        yield from super().values()
+        race, self.race = self.race, None
+        if race:
+            race()
+
+
+def test_sqlite_flush_keeps_concurrent_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "tasks.db")
+        store = SqliteTaskStore(db, flush_interval=60)
+        models.set_task_store(store)
+        other = models.create_task("alice", "https://example.com/b")
+        task = models.create_task("alice", "https://example.com/a")
+
+        def _finish():
+            task.file_path = "/downloads/a.mp4"
+            task.status = DownloadTask.STATUS_COMPLETED
+
+        store.flush()
+        store._dirty = _RacingDirty(_finish)
+        other.progress = 10.0
+        store.flush()
+        models.close_task_store()
+
+        models.set_task_store(SqliteTaskStore(db))
+        try:
+            reloaded = models.get_task(task.task_id)
+            assert reloaded.status == DownloadTask.STATUS_COMPLETED
+            assert reloaded.file_path == "/downloads/a.mp4"
+            assert models.get_task(other.task_id).progress == 10.0
+        finally:
+            models.close_task_store()
+
+
+def test_change_feed_reports_only_changed_tasks():
+    models.set_task_store(MemoryTaskStore())
+    feed = models.task_change_feed
+    try:
+        created, _ = models.create_tasks_if_new("alice", [f"u{i}" for i in range(100)])
+        seen = feed.version
+        assert feed.changes_since(seen) == (seen, [], [], [])
+
+        created[3].progress = 10.0
+        created[3].progress = 20.0
+        created[7].status = DownloadTask.STATUS_DOWNLOADING
+        created[7].status = DownloadTask.STATUS_DOWNLOADING  # 值未变，不算变更
+        version, changed, removed, reshaped = feed.changes_since(seen)
+        assert version == seen + 3
+        assert changed == [created[7].task_id, created[3].task_id]
+        assert removed == []
+        # 只有状态变化可能让任务换页，进度变化不会
+        assert reshaped == [created[7].task_id]
+        assert created[3].version == seen + 2
+
+        models.delete_task(created[3].task_id)
+        assert feed.changes_since(version) == (version + 1, [], [created[3].task_id], [])
+
+        # 更换存储后端后旧版本号失效，订阅方需要全量刷新
+        models.set_task_store(MemoryTaskStore())
+        assert feed.changes_since(version) is None
+    finally:
+        models.close_task_store()
+
+
+def test_search_index_matches_cjk_and_follows_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "tasks.db")
+        models.set_task_store(SqliteTaskStore(path, flush_interval=60))
+        index = models.task_search_index
+        try:
+            titles = ["猫咪视频合集", "小狗日常 Vlog", "猫和老鼠", "Python 教程"]
+            tasks = [models.create_task("alice", f"https://example.com/v/{i}") for i in range(4)]
+            for task, title in zip(tasks, titles):
+                task.title = title
+            tasks[1].status = DownloadTask.STATUS_COMPLETED
+            # 落盘前重启索引：首次搜索从存储加载，未落盘的标题也要能搜到
+            index.reset()
+
+            def ids(keyword, **kw):
+                return {t.task_id for t in models.query_tasks(keyword=keyword, **kw)[0]}
+
+            assert ids("视频") == {tasks[0].task_id}
+            assert ids("猫") == {tasks[0].task_id, tasks[2].task_id}
+            assert ids("猫咪视") == {tasks[0].task_id}
+            assert ids("PYTH") == {tasks[3].task_id}
+            assert ids("vlog", status=DownloadTask.STATUS_COMPLETED) == {tasks[1].task_id}
+            assert ids("vlog", status=DownloadTask.STATUS_PENDING) == set()
+            assert ids(tasks[2].task_id) == {tasks[2].task_id}
+            assert ids("v/3") == {tasks[3].task_id}
+            assert ids("狗猫") == set()
+
+            # 标题由下载线程改写后，旧词不再命中，新词立即可搜
+            tasks[0].title = "Rust 入门"
+            assert ids("视频") == set()
+            assert ids("入门") == {tasks[0].task_id}
+
+            models.delete_task(tasks[2].task_id)
+            assert ids("猫") == set()
+            new = models.create_task("bob", "https://example.com/猫")
+            assert ids("猫") == {new.task_id}
+            assert ids("猫", username="alice") == set()
+        finally:
+            models.close_task_store()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_memory_store,
+        test_memory_query,
+        test_memory_indexes_follow_status_changes,
+        test_sqlite_store,
+        test_sqlite_query,
+        test_sqlite_persists_across_restart,
+        test_sqlite_migrates_file_size_to_indexed_column,
+        test_sqlite_cleared_task_not_written_back,
+        test_sqlite_flush_keeps_concurrent_changes,
+        test_change_feed_reports_only_changed_tasks,
+        test_search_index_matches_cjk_and_follows_changes,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
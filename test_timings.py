@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试分阶段耗时（阶段切换 / 后处理钩子 / 瀑布图 / 分位数 / JSON 导出）
+"""
+
+import json
+import sys
+
+from models import DownloadTask
+from timings import StageTimer, export, stage_percentiles, waterfall
+
+
+def _task(task_id: str = "t1") -> DownloadTask:
+    return DownloadTask(task_id=task_id, username="alice", url="https://example.com/v")
+
+
+def test_stage_timer_switches_and_splits_postprocessing():
+    task = _task()
+    timer = StageTimer(task)
+    timer.switch("extract")
+    timer.switch("transfer")
+    # yt-dlp 的合并在传输过程中触发，结束后回到传输阶段（播放列表的下一条）
+    timer.postprocessor_hook({"status": "started", "postprocessor": "Merger"})
+    timer.postprocessor_hook({"status": "finished", "postprocessor": "Merger"})
+    timer.postprocessor_hook({"status": "started", "postprocessor": "MoveFiles"})
+    timer.postprocessor_hook({"status": "finished", "postprocessor": "MoveFiles"})
+    timer.stop()
+    timer.stop()
+    with timer.stage("upload"):
+        pass
+    try:
+        with timer.stage("notify"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    stages = [span["stage"] for span in task.timings]
+    assert stages == ["extract", "transfer", "merge", "transfer", "upload", "notify"]
+    assert all(span["seconds"] >= 0 for span in task.timings)
+
+    spans = waterfall(task.timings)
+    assert spans[0]["offset"] == 0
+    assert [s["offset"] for s in spans] == sorted(s["offset"] for s in spans)
+
+
+def test_percentiles_use_per_task_stage_totals():
+    tasks = []
+    for i in range(1, 11):
+        task = _task(f"t{i}")
+        # 同一阶段多段（继续下载 / 播放列表）按任务累计
+        task.timings = [
+            {"stage": "transfer", "start": 100.0, "seconds": i / 2},
+            {"stage": "transfer", "start": 200.0, "seconds": i / 2},
+            {"stage": "extract", "start": 99.0, "seconds": 0.5},
+        ]
+        tasks.append(task)
+    tasks.append(_task("untimed"))
+
+    stats = stage_percentiles(tasks)
+    assert list(stats) == ["extract", "transfer"]
+    assert stats["transfer"] == {"count": 10, "p50": 5.0, "p90": 9.0, "p99": 10.0, "max": 10.0}
+    assert stats["extract"]["count"] == 10
+
+    exported = json.loads(json.dumps(export(tasks[:1])))
+    assert exported[0]["totals"] == {"transfer": 1.0, "extract": 0.5}
+    assert [s["stage"] for s in exported[0]["timings"]] == ["extract", "transfer", "transfer"]
+    assert exported[0]["timings"][1]["offset"] == 1.0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_stage_timer_switches_and_splits_postprocessing,
+        test_percentiles_use_per_task_stage_totals,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+测试流式 ZIP 打包（STORED / 分块输出 / 可被标准工具解压）
+"""
+
+import io
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+from zip_stream import iter_zip
+
+
+def test_stream_is_valid_stored_zip():
+    with tempfile.TemporaryDirectory() as tmp:
+        video = Path(tmp) / "视频.mp4"
+        video.write_bytes(bytes(range(256)) * 4096)  # 1 MiB
+        other = Path(tmp) / "b.m4a"
+        other.write_bytes(b"audio")
+
+        chunks = list(iter_zip(
+            [("视频.mp4", video), ("b.m4a", other), ("README.txt", "说明".encode("utf-8"))],
+            chunk_size=64 * 1024,
+        ))
+        # 分块输出：任何一块都不超过一个读取块加上头部
+        assert max(len(c) for c in chunks) < 64 * 1024 + 1024
+        assert len(chunks) > 16
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == ["视频.mp4", "b.m4a", "README.txt"]
+            assert all(i.compress_type == zipfile.ZIP_STORED for i in zf.infolist())
+            assert zf.read("视频.mp4") == video.read_bytes()
+            assert zf.read("README.txt").decode("utf-8") == "说明"
+
+
+if __name__ == "__main__":
+    tests = [
+        test_stream_is_valid_stored_zip,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"✓ {fn.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {fn.__name__}: {e}")
+    sys.exit(1 if failed else 0)
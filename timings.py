@@ -0,0 +1,163 @@
+"""Per-stage timing spans for download tasks.
+
+Every stage a task goes through (info extraction, the media transfer, the
+ffmpeg merge, the OSS upload, ...) is measured with the monotonic clock and
+appended to ``DownloadTask.timings`` as ``{"stage", "start", "seconds"}``.
+``start`` is the wall-clock time the stage began, only used to line spans up
+on one timeline: spans recorded in a worker process, in the upload stage or
+by a resumed run all end up on the same task.
+
+``waterfall`` lays one task's spans out for display, ``stage_percentiles``
+aggregates them across tasks and ``export`` turns tasks into plain JSON for
+offline analysis.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from typing import Iterable
+
+# Display order.
+STAGES = (
+    "prepare",          # task directory, media store lookup
+    "extract",          # yt-dlp info extraction
+    "cookie_fallback",  # extraction retried with the next cookie candidate
+    "transfer",         # media bytes over the network
+    "merge",            # ffmpeg merge of separate video/audio streams
+    "postprocess",      # other yt-dlp postprocessors (audio extraction, embedding, ...)
+    "link",             # same media already stored: hardlink instead of download
+    "xattr",            # "where from" metadata on the file
+    "upload",           # OSS upload
+    "notify",           # Feishu completion notification
+)
+
+# yt-dlp postprocessor key -> stage ("" keeps the running stage); anything
+# else counts as "postprocess"
+_POSTPROCESSOR_STAGES = {"Merger": "merge", "MoveFiles": ""}
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+class StageTimer:
+    """Times consecutive stages of one task.
+
+    ``switch`` closes the running stage and opens the next one, which fits
+    callbacks such as yt-dlp's postprocessor hooks; ``stage`` is the
+    context-manager form for a single block. A closed span is appended by
+    reassigning ``task.timings``, so it reaches the task store (and, from a
+    worker process, the parent) like any other field change.
+    """
+
+    def __init__(self, task):
+        self._task = task
+        self._stage = ""
+        self._wall = 0.0
+        self._start = 0.0
+        self._resume = ""  # stage to go back to when a postprocessor finishes
+
+    def switch(self, stage: str) -> None:
+        self.stop()
+        self._stage = stage
+        self._wall = time.time()
+        self._start = time.monotonic()
+
+    def stop(self) -> None:
+        if not self._stage:
+            return
+        span = {
+            "stage": self._stage,
+            "start": round(self._wall, 3),
+            "seconds": round(time.monotonic() - self._start, 4),
+        }
+        self._stage = ""
+        self._task.timings = [*self._task.timings, span]
+
+    @contextmanager
+    def stage(self, stage: str):
+        self.switch(stage)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def postprocessor_hook(self, d: dict) -> None:
+        """yt-dlp ``postprocessor_hooks`` entry that splits ffmpeg work off the transfer."""
+        stage = _POSTPROCESSOR_STAGES.get(d.get("postprocessor"), "postprocess")
+        if not stage:
+            return
+        if d.get("status") == "started":
+            self._resume = self._stage
+            self.switch(stage)
+        elif d.get("status") == "finished":
+            # A playlist goes on with the next entry's transfer.
+            resume, self._resume = self._resume, ""
+            if resume:
+                self.switch(resume)
+            else:
+                self.stop()
+
+
+def stage_totals(timings: Iterable[dict]) -> dict[str, float]:
+    """Seconds per stage; repeated spans (resume, playlist entries) are summed."""
+    totals: dict[str, float] = {}
+    for span in timings:
+        totals[span["stage"]] = totals.get(span["stage"], 0.0) + span["seconds"]
+    return totals
+
+
+def _stage_order(stage: str) -> int:
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+def waterfall(timings: list[dict]) -> list[dict]:
+    """Spans with ``offset`` seconds from the first one, in the order they started."""
+    if not timings:
+        return []
+    origin = min(span["start"] for span in timings)
+    return [
+        {**span, "offset": round(span["start"] - origin, 3)}
+        for span in sorted(timings, key=lambda s: s["start"])
+    ]
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def stage_percentiles(tasks: Iterable, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> dict[str, dict]:
+    """Per-stage distribution of per-task totals.
+
+    Returns ``{stage: {"count": n, "p50": s, "p90": s, ..., "max": s}}`` in
+    ``STAGES`` order, counting only tasks that went through the stage.
+    """
+    samples: dict[str, list[float]] = {}
+    for task in tasks:
+        for stage, seconds in stage_totals(task.timings).items():
+            samples.setdefault(stage, []).append(seconds)
+    result = {}
+    for stage in sorted(samples, key=_stage_order):
+        values = sorted(samples[stage])
+        row = {"count": len(values)}
+        for p in percentiles:
+            row[f"p{p:g}"] = round(percentile(values, p), 4)
+        row["max"] = round(values[-1], 4)
+        result[stage] = row
+    return result
+
+
+def export(tasks: Iterable) -> list[dict]:
+    """Tasks with their spans as JSON-serializable dicts."""
+    return [
+        {
+            "task_id": task.task_id,
+            "username": task.username,
+            "url": task.url,
+            "status": task.status,
+            "created_at": task.created_at.isoformat(),
+            "file_size": task.file_size,
+            "timings": waterfall(task.timings),
+            "totals": {stage: round(seconds, 4) for stage, seconds in stage_totals(task.timings).items()},
+        }
+        for task in tasks
+    ]
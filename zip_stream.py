@@ -0,0 +1,51 @@
+"""Stream a ZIP64 archive of existing files without temp copies."""
+
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Sink:
+    """Write-only, non-seekable target; zipfile then emits data descriptors."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[tuple[str, Path | bytes]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a STORED (uncompressed) ZIP64 archive of ``(arcname, source)`` pairs.
+
+    ``source`` is a file path, read in ``chunk_size`` pieces, or in-memory
+    bytes. Media is already compressed, so nothing is deflated; memory use
+    stays at about one chunk regardless of archive size, and the first
+    bytes are available immediately.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for arcname, source in entries:
+            if isinstance(source, bytes):
+                zf.writestr(arcname, source)
+                yield sink.drain()
+                continue
+            info = zipfile.ZipInfo.from_file(source, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(source, "rb") as src, zf.open(info, "w") as dest:
+                for chunk in iter(lambda: src.read(chunk_size), b""):
+                    dest.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()